@@ -1,13 +1,30 @@
 # backend/app.py
 
 import os
+import time
+
+# Start of the cold start, before the framework imports; /ready reports time since here
+STARTED = time.monotonic()
+
 from flask import Flask
 from flask_cors import CORS
-from models import db, User
+from models import db
+from cache import init_cache
+from snapshots import init_snapshots
+from metrics import init_metrics
+from dbconfig import database_uri, engine_options, install_sqlite_pragmas
+from identity import init_identity, load_identity
+from similarity import init_similarity
+from linkcheck import init_linkcheck
+from ratelimit import init_rate_limiting
 import routes.challenges as challenge_routes
 import routes.auth as auth_routes
 import routes.completion as completion_routes
 import routes.admin as admin_routes
+import routes.assets as asset_routes
+import routes.metrics as metrics_routes
+import routes.health as health_routes
+import routes.stats as stats_routes
 from flask_login import LoginManager
 
 
@@ -18,42 +35,69 @@ def create_app():
     """
     app = Flask(__name__)
     # Use environment variable for DB URI, fallback to SQLite
-    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///instance/challenges.db")
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_uri()
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # Connection pooling for file-backed SQLite and server databases (see dbconfig.py)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
     app.config['SECRET_KEY'] = '5553698f87140fcbc77a8192e1acce32'
+    # Optional werkzeug hashing method, e.g. "pbkdf2:sha256:260000", to bound /api/login cost
+    app.config["PASSWORD_HASH_METHOD"] = os.environ.get("PASSWORD_HASH_METHOD")
+    app.config["LOGIN_HASH_CONCURRENCY"] = int(os.environ.get("LOGIN_HASH_CONCURRENCY", 2))
+    # Where uploaded/extracted challenge images are stored (default: instance/assets)
+    app.config["ASSET_DIR"] = os.environ.get("ASSET_DIR")
+    # Seconds after process start by which /ready should first succeed (e.g. the host's startup probe)
+    app.config["READY_BUDGET_SECONDS"] = float(os.environ.get("READY_BUDGET_SECONDS", 10))
+    app.extensions["startup"] = {"started": STARTED, "ready_after": None}
 
     # Initialize DB
     db.init_app(app)
+    with app.app_context():
+        # WAL, busy_timeout, synchronous, mmap_size and foreign_keys on every new connection
+        install_sqlite_pragmas(db.engine)
+    # In-process response cache for the catalogue endpoints
+    init_cache(app)
+    # Pre-serialized, precompressed full-catalogue responses per catalogue version
+    init_snapshots(app)
+    # Per-endpoint latency/size/SQL metrics, JSON request logs and the opt-in profiler (see metrics.py)
+    init_metrics(app)
+    # Debounced background rebuilds of the similar-challenges index
+    init_similarity(app)
+    # Background dataset link checks (see linkcheck.py)
+    init_linkcheck(app)
     # Flask-Login setup
     login_manager = LoginManager()
     login_manager.init_app(app)
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        return db.session.get(User, int(user_id))
+    # Resolve current_user from the signed session claim / identity cache (see identity.py)
+    init_identity(app)
+    login_manager.user_loader(load_identity)
+    # Token-bucket rate limits per client and the global concurrency cap (see ratelimit.py)
+    init_rate_limiting(app)
 
 
     # Use env var for CORS origins, fallback to localhost:3000
     cors_origins = os.environ.get("CORS_ORIGINS", "http://localhost:3000")
-    CORS(app, origins=[cors_origins], supports_credentials=True)
+    CORS(app, origins=[cors_origins], supports_credentials=True,
+         expose_headers=["ETag", "X-Next-After-Id", "X-Missing-Ids", "Retry-After"])
 
     # Register blueprints / route groups
     app.register_blueprint(challenge_routes.bp, url_prefix="/api")
     app.register_blueprint(auth_routes.bp, url_prefix="/api")
     app.register_blueprint(completion_routes.bp, url_prefix="/api")
     app.register_blueprint(admin_routes.bp, url_prefix="/api/admin")
+    app.register_blueprint(asset_routes.bp, url_prefix="/api")
+    app.register_blueprint(stats_routes.bp, url_prefix="/api")
+    app.register_blueprint(metrics_routes.bp)
+    app.register_blueprint(health_routes.bp)
 
     return app
 
 if __name__ == "__main__":
     app = create_app()
-    # Always create tables if they don't exist - ensures users table is created
+    # Apply pending migrations; a single schema_version check when already up to date
     with app.app_context():
-        db.create_all()
-        
-        # Create the completed_challenges table if it doesn't exist
-        from routes.completion import setup_completed_challenges_table
-        setup_completed_challenges_table()
+        from migrations import run_migrations
+        run_migrations()
         
     port = int(os.environ.get("PORT", 5000))
     # Run the Flask app
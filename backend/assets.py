@@ -0,0 +1,195 @@
+# backend/assets.py
+
+"""
+Content-addressed asset store for challenge images.
+
+Image bytes live on disk under ASSET_DIR, named by their SHA-256 hash, with
+one row per asset in the assets table. Challenge.image_1 / image_2 hold a
+reference ("/api/assets/<hash>") instead of an inline data URI, so list and
+detail responses stay small and the bytes are served (and cached forever)
+by routes/assets.py.
+
+Only raster formats are accepted (ALLOWED_CONTENT_TYPES): an SVG is a
+document that can carry script, and would run with the site's origin when
+opened directly. routes/assets.py also serves every asset with nosniff and
+a sandboxing CSP, and anything outside the allowlist (e.g. stored before it
+existed) as an attachment.
+
+Thumbnails are generated lazily with Pillow when it is installed; without
+it the original image is served for every variant.
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from collections import namedtuple
+from urllib.parse import unquote_to_bytes
+from flask import current_app
+from sqlalchemy import text
+from models import db
+
+# URL prefix stored in the image columns for stored assets
+ASSET_URL_PREFIX = "/api/assets/"
+# Largest image accepted from an admin, in bytes
+MAX_ASSET_BYTES = 10 * 1024 * 1024
+# Image types that may be stored and served inline (no SVG: it can embed script)
+ALLOWED_CONTENT_TYPES = frozenset({"image/png", "image/jpeg", "image/gif", "image/webp", "image/avif"})
+# Bounding box (pixels) for ?variant=thumb
+THUMBNAIL_SIZE = (320, 320)
+
+_DATA_URI = re.compile(r"^data:(?P<type>image/[\w.+-]+)?(?P<params>(;[\w-]+=[^;,]*)*)(?P<b64>;base64)?,(?P<data>.*)$", re.S)
+_HASH = re.compile(r"^[0-9a-f]{64}$")
+
+
+def asset_dir():
+    """Directory holding asset files (ASSET_DIR config, default instance/assets)."""
+    return current_app.config.get("ASSET_DIR") or os.path.join(current_app.instance_path, "assets")
+
+
+def is_asset_hash(value):
+    return bool(_HASH.match(value or ""))
+
+
+def asset_path(asset_hash, variant=None):
+    """Path of an asset file; files are sharded by the first two hex digits."""
+    name = asset_hash if variant is None else f"{asset_hash}.{variant}"
+    return os.path.join(asset_dir(), asset_hash[:2], name)
+
+
+def _write_atomic(path, data):
+    """Write data to path via a temp file + rename, so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def check_asset(data, content_type):
+    """Raise ValueError for oversized data or a type outside ALLOWED_CONTENT_TYPES."""
+    if content_type not in ALLOWED_CONTENT_TYPES:
+        raise ValueError(f"Unsupported image type {content_type}; use PNG, JPEG, GIF, WebP or AVIF")
+    if len(data) > MAX_ASSET_BYTES:
+        raise ValueError(f"Image is larger than {MAX_ASSET_BYTES // (1024 * 1024)} MB")
+
+
+def store_asset(data, content_type, conn=None):
+    """
+    Store bytes in the asset store and return their hash.
+    Identical content is stored once. conn defaults to the current session.
+    Raises ValueError as check_asset() does.
+    """
+    check_asset(data, content_type)
+    asset_hash = hashlib.sha256(data).hexdigest()
+    path = asset_path(asset_hash)
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+    executor = conn if conn is not None else db.session
+    exists = executor.execute(text("SELECT 1 FROM assets WHERE hash = :h"), {"h": asset_hash}).first()
+    if not exists:
+        executor.execute(
+            text("INSERT INTO assets (hash, content_type, size) VALUES (:h, :t, :s)"),
+            {"h": asset_hash, "t": content_type, "s": len(data)},
+        )
+    return asset_hash
+
+
+class InlineImage(namedtuple("InlineImage", "reference data content_type")):
+    """A decoded data: URI image and the reference it gets once stored; nothing is on disk yet."""
+
+
+def decode_image(value):
+    """
+    If value is an inline data: URI, decode and check it and return an
+    InlineImage without writing anything; any other value (URL, empty) is
+    returned as-is. Raises ValueError for malformed, non-image or unsupported
+    (e.g. SVG) data URIs.
+    """
+    if not value or not value.startswith("data:"):
+        return value
+    match = _DATA_URI.match(value)
+    if not match or not match.group("type"):
+        raise ValueError("Inline images must be data:image/... URIs")
+    payload = match.group("data")
+    try:
+        if match.group("b64"):
+            data = base64.b64decode(payload, validate=True)
+        else:
+            data = unquote_to_bytes(payload)
+    except (binascii.Error, ValueError):
+        raise ValueError("Inline image is not valid base64")
+    check_asset(data, match.group("type"))
+    return InlineImage(ASSET_URL_PREFIX + hashlib.sha256(data).hexdigest(), data, match.group("type"))
+
+
+def image_reference(value):
+    """The column value for a decode_image() result: the asset reference of an InlineImage."""
+    return value.reference if isinstance(value, InlineImage) else value
+
+
+def store_image(value, conn=None):
+    """Write a decode_image() result to the asset store (if it is an InlineImage) and return its column value."""
+    if isinstance(value, InlineImage):
+        store_asset(value.data, value.content_type, conn)
+    return image_reference(value)
+
+
+def externalize_image(value, conn=None):
+    """
+    If value is an inline data: URI, move its bytes into the asset store and
+    return the asset reference; any other value (URL, empty) is returned as-is.
+    Raises ValueError as decode_image() does.
+    """
+    return store_image(decode_image(value), conn)
+
+
+def _pillow_image():
+    """
+    Pillow's Image module, or None when Pillow is not installed. Imported on
+    the first thumbnail rather than at startup, as it is slow to import.
+    """
+    try:
+        from PIL import Image
+    except ImportError:  # Pillow is optional; thumbnails fall back to the original
+        return None
+    return Image
+
+
+def thumbnail_path(asset_hash):
+    """
+    Return the path of the thumbnail for an asset, generating it on first use.
+    Returns None when Pillow is unavailable or the image cannot be decoded
+    (or is too large to decode safely); the original is served instead.
+    """
+    Image = _pillow_image()
+    if Image is None:
+        return None
+    path = asset_path(asset_hash, "thumb")
+    if os.path.exists(path):
+        return path
+    tmp = None
+    try:
+        with Image.open(asset_path(asset_hash)) as im:
+            image_format = im.format or "PNG"
+            im.thumbnail(THUMBNAIL_SIZE)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                im.save(f, format=image_format)
+        os.replace(tmp, path)
+        tmp = None
+    # DecompressionBombError (images over Pillow's pixel limit) is not an OSError
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        print(f"Could not build thumbnail for {asset_hash}: {e}")
+        return None
+    finally:
+        # A failed save or rename must not leave its temp file in the asset directory
+        if tmp is not None and os.path.exists(tmp):
+            os.unlink(tmp)
+    return path
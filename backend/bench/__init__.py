@@ -0,0 +1,11 @@
+"""
+Performance harnesses for the DSCL backend.
+
+These are scripts, not tests: they build throwaway databases and servers and
+print measurements. Run them from the backend directory, e.g.
+
+    python -m bench.api run --target client,gunicorn -o results.json
+    python -m bench.loadtest --workers 1,2,4
+
+bench.datagen builds the synthetic databases both of them use.
+"""
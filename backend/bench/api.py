@@ -0,0 +1,298 @@
+# backend/bench/api.py
+
+"""
+Reproducible per-endpoint API benchmark.
+
+Builds a synthetic database (bench.datagen, fixed seed), then times each
+scenario below through the in-process Flask test client and/or a real local
+gunicorn, and prints p50/p95/p99 latency and throughput per endpoint as JSON.
+Save the output per commit and compare runs to catch regressions:
+
+    python -m bench.api run --challenges 10000 --target client,gunicorn -o after.json
+    python -m bench.api compare before.json after.json --threshold 0.15
+
+compare exits with status 1 when any endpoint's metric (p95 by default) got
+worse by more than the threshold; `run --baseline before.json` does the same
+straight after a run.
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from bench.datagen import ADMIN_PASSWORD, ADMIN_USERNAME, LEARNER_PASSWORD, build_database, learner_name
+from bench.loadtest import BACKEND_DIR, free_port, percentile, start_gunicorn, stop
+
+TARGETS = ("client", "gunicorn")
+METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+class Scenario:
+    """A named endpoint workload: who to log in as and how to build the next request."""
+
+    def __init__(self, name, build, login=None):
+        self.name = name
+        self.build = build  # (rng, dataset summary) -> (method, path, json body or None)
+        self.login = login  # (username, password) or None for anonymous
+
+
+def _toggle_completion(rng, dataset):
+    challenge_id = rng.randint(1, dataset["challenges"])
+    return rng.choice(["POST", "DELETE"]), f"/api/completed-challenges/{challenge_id}", None
+
+
+SCENARIOS = (
+    Scenario("list", lambda rng, d: ("GET", "/api/challenges?view=summary", None)),
+    Scenario("list_full", lambda rng, d: ("GET", "/api/challenges", None)),
+    Scenario("filtered_list", lambda rng, d: (
+        "GET", f"/api/challenges?view=summary&difficulty={rng.choice(['Easy', 'Medium', 'Hard'])}&technology=pandas", None)),
+    Scenario("detail", lambda rng, d: ("GET", f"/api/challenges/{rng.randint(1, d['challenges'])}", None)),
+    Scenario("pathways", lambda rng, d: ("GET", "/api/pathways?embed=challenges", None)),
+    Scenario("completion_write", _toggle_completion, login=(learner_name(0), LEARNER_PASSWORD)),
+    Scenario("login", lambda rng, d: ("POST", "/api/login", {"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})),
+)
+
+
+def summarize(latencies, errors, elapsed):
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "requests_per_s": round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+
+# ── Targets ──────────────────────────────
+
+
+def run_client(scenarios, dataset, requests, warmup, seed):
+    """Time each scenario sequentially through the Flask test client."""
+    from app import create_app
+
+    app = create_app()
+    results = {}
+    for scenario in scenarios:
+        rng = random.Random(seed)
+        client = app.test_client()
+        if scenario.login:
+            client.post("/api/login", json={"username": scenario.login[0], "password": scenario.login[1]})
+        latencies, errors = [], 0
+        started = None
+        for i in range(warmup + requests):
+            if i == warmup:
+                started = time.perf_counter()
+            method, path, body = scenario.build(rng, dataset)
+            t0 = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            elapsed = time.perf_counter() - t0
+            if i >= warmup:
+                if response.status_code >= 500:
+                    errors += 1
+                else:
+                    latencies.append(elapsed)
+        results[scenario.name] = summarize(latencies, errors, time.perf_counter() - started)
+    return results
+
+
+def _http_worker(base, scenario, dataset, count, seed, latencies, errors, lock):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def send(method, path, body):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(base + path, data=data, method=method, headers={"Content-Type": "application/json"})
+        try:
+            with opener.open(req, timeout=30) as response:
+                response.read()
+            return True
+        except urllib.error.HTTPError as e:
+            return e.code < 500
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            return False
+
+    if scenario.login:
+        send("POST", "/api/login", {"username": scenario.login[0], "password": scenario.login[1]})
+    rng = random.Random(seed)
+    local, failed = [], 0
+    for _ in range(count):
+        method, path, body = scenario.build(rng, dataset)
+        t0 = time.perf_counter()
+        ok = send(method, path, body)
+        if ok:
+            local.append(time.perf_counter() - t0)
+        else:
+            failed += 1
+    with lock:
+        latencies.extend(local)
+        errors[0] += failed
+
+
+def run_gunicorn(scenarios, dataset, requests, warmup, seed, env, workers, threads, clients):
+    """Time each scenario against a local gunicorn with concurrent client threads."""
+    port = free_port()
+    proc = start_gunicorn(port, workers, threads, env)
+    base = f"http://127.0.0.1:{port}"
+    results = {}
+    try:
+        for scenario in scenarios:
+            lock = threading.Lock()
+            for count, keep in ((warmup, False), (requests, True)):
+                latencies, errors = [], [0]
+                per_client = max(1, count // clients) if count else 0
+                pool = [threading.Thread(target=_http_worker, daemon=True,
+                                         args=(base, scenario, dataset, per_client, seed + c, latencies, errors, lock))
+                        for c in range(clients)]
+                started = time.perf_counter()
+                for t in pool:
+                    t.start()
+                for t in pool:
+                    t.join()
+                if keep:
+                    results[scenario.name] = summarize(latencies, errors[0], time.perf_counter() - started)
+    finally:
+        stop(proc)
+    return results
+
+
+# ── Comparison ──────────────────────────────
+
+
+def compare(baseline, current, threshold, metric="p95_ms"):
+    """
+    Compare two run outputs. Returns (rows, regressed) where each row is
+    (target, scenario, old, new, relative change) and regressed is True when
+    any change exceeds threshold (e.g. 0.15 for +15%).
+    """
+    rows, regressed = [], False
+    for target, scenarios in current["results"].items():
+        for name, stats in scenarios.items():
+            old = baseline.get("results", {}).get(target, {}).get(name, {}).get(metric)
+            new = stats.get(metric)
+            if not old or new is None:
+                continue
+            change = new / old - 1
+            rows.append((target, name, old, new, round(change, 3)))
+            regressed = regressed or change > threshold
+    return rows, regressed
+
+
+def print_comparison(rows, threshold, metric):
+    print(f"{'target':<10} {'scenario':<18} {'old ' + metric:>14} {'new ' + metric:>14} {'change':>8}", file=sys.stderr)
+    for target, name, old, new, change in rows:
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{target:<10} {name:<18} {old:>14} {new:>14} {change:>+8.1%}{flag}", file=sys.stderr)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    targets = [t for t in args.target.split(",") if t]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        sys.exit(f"Unknown target(s): {', '.join(sorted(unknown))}")
+    scenarios = [s for s in SCENARIOS if not args.only or s.name in args.only.split(",")]
+
+    # One JSON log line per request would dominate the measurement
+    os.environ.setdefault("REQUEST_LOG", "0")
+    # The benchmark clients would otherwise be throttled like scrapers
+    os.environ.setdefault("RATE_LIMIT_STORE", "off")
+    tmp = tempfile.mkdtemp(prefix="dscl-bench-")
+    try:
+        uri = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ["ASSET_DIR"] = os.path.join(tmp, "assets")
+        dataset = build_database(uri, challenges=args.challenges, users=args.users,
+                                 completions_per_user=args.completions_per_user,
+                                 pathways=args.pathways, seed=args.seed)
+        output = {
+            "meta": {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "dataset": dataset,
+                "requests": args.requests,
+                "gunicorn": {"workers": args.workers, "threads": args.threads, "clients": args.clients},
+            },
+            "results": {},
+        }
+        for target in targets:
+            if target == "client":
+                output["results"]["client"] = run_client(scenarios, dataset, args.requests, args.warmup, args.seed)
+            else:
+                env = dict(os.environ, DATABASE_URL=uri)
+                output["results"]["gunicorn"] = run_gunicorn(scenarios, dataset, args.requests, args.warmup, args.seed,
+                                                             env, args.workers, args.threads, args.clients)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows, regressed = compare(json.load(f), output, args.threshold, args.metric)
+        print_comparison(rows, args.threshold, args.metric)
+        if regressed:
+            sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the DSCL API per endpoint.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    r = sub.add_parser("run", help="Build a synthetic database and time every scenario")
+    r.add_argument("--target", default="client", help="Comma-separated: client, gunicorn")
+    r.add_argument("--only", help="Comma-separated scenario names (default: all)")
+    r.add_argument("--challenges", type=int, default=1000)
+    r.add_argument("--users", type=int, default=200)
+    r.add_argument("--completions-per-user", type=int, default=20)
+    r.add_argument("--pathways", type=int, default=20)
+    r.add_argument("--seed", type=int, default=0)
+    r.add_argument("--requests", type=int, default=200, help="Timed requests per scenario")
+    r.add_argument("--warmup", type=int, default=20, help="Untimed requests per scenario")
+    r.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    r.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    r.add_argument("--clients", type=int, default=8, help="Concurrent clients against gunicorn")
+    r.add_argument("-o", "--output", help="Also write the JSON result to this file")
+    r.add_argument("--baseline", help="Result file to compare against; exit 1 on regression")
+    r.add_argument("--threshold", type=float, default=0.15, help="Allowed relative slowdown (0.15 = 15%%)")
+    r.add_argument("--metric", choices=METRICS, default="p95_ms")
+
+    c = sub.add_parser("compare", help="Compare two result files")
+    c.add_argument("baseline")
+    c.add_argument("current")
+    c.add_argument("--threshold", type=float, default=0.15)
+    c.add_argument("--metric", choices=METRICS, default="p95_ms")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows, regressed = compare(baseline, current, args.threshold, args.metric)
+        print_comparison(rows, args.threshold, args.metric)
+        sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
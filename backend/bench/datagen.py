@@ -0,0 +1,176 @@
+# backend/bench/datagen.py
+
+"""
+Synthetic catalogue generator for benchmarks.
+
+Challenges are shaped after the real seed data: each synthetic row copies
+the field lengths, difficulty and tag counts of a randomly picked row from
+seed_data_real.csv (read with seed_data.load_challenges_from_csv), with text
+drawn from the real vocabulary and tags from the real tag pools. A fixed
+seed gives the same database every run, so results compare across commits.
+
+    python -m bench.datagen /tmp/bench.db --challenges 10000 --users 500
+"""
+
+import json
+import os
+import random
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_CSV = os.path.join(BACKEND_DIR, "seed_data_real.csv")
+TEXT_FIELDS = ("description", "dataset_description", "overview", "task", "outcomes", "sample_sol")
+# Rows per executemany when inserting users/completions/pathways
+CHUNK = 5000
+
+# Credentials of the generated accounts (shared with bench.loadtest)
+ADMIN_USERNAME = "admin"
+ADMIN_PASSWORD = "admin"
+LEARNER_PASSWORD = "learner"
+
+
+def learner_name(i):
+    return f"learner{i}"
+
+
+class CatalogueShapes:
+    """Field lengths, vocabulary and tag pools taken from the real seed CSV."""
+
+    def __init__(self, csv_path=SEED_CSV):
+        from seed_data import load_challenges_from_csv
+        from models import split_tags
+
+        self.rows = [r for r in load_challenges_from_csv(csv_path) if r["title"]]
+        self.words = sorted({w for r in self.rows for f in TEXT_FIELDS for w in r[f].split()}) or ["data"]
+        self.subcategories = sorted({t for r in self.rows for t in split_tags(r["subcategory"])}) or ["General"]
+        self.technologies = sorted({t for r in self.rows for t in split_tags(r["technology"])}) or ["pandas"]
+        self._split_tags = split_tags
+
+    def text_like(self, rng, value):
+        """Random words from the vocabulary, about as long as value."""
+        out, length = [], 0
+        while length < len(value):
+            word = rng.choice(self.words)
+            out.append(word)
+            length += len(word) + 1
+        return " ".join(out)
+
+    def tags_like(self, rng, value, pool, limit):
+        count = max(1, len(self._split_tags(value)))
+        tags = rng.sample(pool, min(count, len(pool)))
+        while len(", ".join(tags)) > limit:
+            tags.pop()
+        return ", ".join(tags)
+
+    def challenge(self, rng, i):
+        """One synthetic challenge dict, shaped like a random real row."""
+        template = rng.choice(self.rows)
+        row = {
+            "title": f"{template['title']} #{i}",
+            "difficulty": template["difficulty"] or "Easy",
+            "subcategory": self.tags_like(rng, template["subcategory"], self.subcategories, 100),
+            "technology": self.tags_like(rng, template["technology"], self.technologies, 200),
+            "dataset_url": template["dataset_url"],
+            # Inline data: images would be copied into the asset store once per row
+            "image_1": "" if template["image_1"].startswith("data:") else template["image_1"],
+            "image_2": "" if template["image_2"].startswith("data:") else template["image_2"],
+        }
+        for field in TEXT_FIELDS:
+            row[field] = self.text_like(rng, template[field])
+        row["dataset_description"] = row["dataset_description"][:500]
+        return row
+
+
+def populate(challenges=1000, users=100, completions_per_user=20, pathways=20, seed=0):
+    """
+    Fill the current app's (empty, migrated) database with a synthetic catalogue:
+    challenges (through the bulk importer, so tags and the search index are
+    built as in production), one admin plus learners, completions and pathways.
+    Must be called inside an app context. Returns a summary dict.
+    """
+    from models import db, Challenge, User, CompletedChallenge, Pathway, PathwayChallenge, password_hash_method
+    from catalogue_io import import_challenges
+    from similarity import rebuild_similarity_index
+
+    rng = random.Random(seed)
+    shapes = CatalogueShapes()
+    lines = (json.dumps(shapes.challenge(rng, i)) for i in range(1, challenges + 1))
+    import_challenges(lines, "ndjson", batch_size=1000)
+    challenge_ids = [row[0] for row in db.session.execute(db.select(Challenge.id).order_by(Challenge.id))]
+
+    # Hash once per password; every learner shares the same credentials
+    method = password_hash_method()
+    learner_hash = generate_password_hash(LEARNER_PASSWORD, **({"method": method} if method else {}))
+    admin_hash = generate_password_hash(ADMIN_PASSWORD, **({"method": method} if method else {}))
+    db.session.execute(insert(User.__table__), [{"username": ADMIN_USERNAME, "password_hash": admin_hash, "user_type": "admin"}])
+    for start in range(0, users, CHUNK):
+        db.session.execute(insert(User.__table__), [
+            {"username": learner_name(i), "password_hash": learner_hash, "user_type": "guest"}
+            for i in range(start, min(start + CHUNK, users))
+        ])
+    user_ids = [row[0] for row in db.session.execute(db.select(User.id).where(User.user_type != "admin"))]
+
+    completions = []
+    for user_id in user_ids:
+        for challenge_id in rng.sample(challenge_ids, min(completions_per_user, len(challenge_ids))):
+            completions.append({"user_id": user_id, "challenge_id": challenge_id})
+            if len(completions) >= CHUNK:
+                db.session.execute(insert(CompletedChallenge.__table__), completions)
+                completions = []
+    if completions:
+        db.session.execute(insert(CompletedChallenge.__table__), completions)
+
+    for p in range(pathways):
+        pathway = Pathway(name=f"Pathway {p + 1}")
+        db.session.add(pathway)
+        db.session.flush()
+        members = rng.sample(challenge_ids, min(rng.randint(3, 10), len(challenge_ids)))
+        if members:
+            db.session.execute(insert(PathwayChallenge.__table__), [
+                {"pathway_id": pathway.id, "challenge_id": cid, "position": pos} for pos, cid in enumerate(members)
+            ])
+    db.session.commit()
+    rebuild_similarity_index()
+    return {"challenges": len(challenge_ids), "users": len(user_ids), "pathways": pathways,
+            "completions_per_user": completions_per_user, "seed": seed}
+
+
+def build_database(uri, **kwargs):
+    """Create, migrate and populate a database at uri; returns the populate() summary."""
+    import sys
+    os.environ["DATABASE_URL"] = uri
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    from app import create_app
+    from models import db
+    from migrations import run_migrations
+
+    app = create_app()
+    with app.app_context():
+        run_migrations()
+        summary = populate(**kwargs)
+        db.engine.dispose()
+    return summary
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic DSCL database.")
+    parser.add_argument("path", help="SQLite file to create")
+    parser.add_argument("--challenges", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--completions-per-user", type=int, default=20)
+    parser.add_argument("--pathways", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if os.path.exists(args.path):
+        parser.error(f"{args.path} already exists")
+    summary = build_database(f"sqlite:///{os.path.abspath(args.path)}", challenges=args.challenges, users=args.users,
+                             completions_per_user=args.completions_per_user, pathways=args.pathways, seed=args.seed)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# backend/bench/importtime.py
+
+"""
+Import-time budget check for the cold-start path.
+
+Imports a module (by default wsgi, which also runs create_app) in a fresh
+interpreter under `python -X importtime`, prints the slowest imports and
+exits with status 1 when the total exceeds the budget or when a module that
+must stay off the startup path (FORBIDDEN: network clients, optional heavy
+libraries, seeding scripts) was imported:
+
+    python -m bench.importtime --budget-ms 1500 --top 15
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from bench.loadtest import BACKEND_DIR
+
+# Top-level packages that must not be imported by starting the app
+FORBIDDEN = ("requests", "seed_data", "PIL", "pygments", "bench")
+
+
+def parse_importtime(output):
+    """
+    Parse -X importtime output into a list of (module, self us, cumulative us, depth),
+    in the order the interpreter reported them.
+    """
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # the header line
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(parts[0]), int(parts[1]), depth))
+    return entries
+
+
+def measure(module, env=None):
+    """Import module in a fresh interpreter from the backend directory; returns parse_importtime() entries."""
+    env = dict(os.environ if env is None else env)
+    # Keep the app off the real database: importing wsgi creates the app
+    env.setdefault("DATABASE_URL", "sqlite://")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=BACKEND_DIR,
+                            env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def check(entries, budget_ms):
+    """Returns (total ms, forbidden modules imported, within budget)."""
+    total_ms = sum(cumulative for _, _, cumulative, depth in entries if depth == 0) / 1000
+    forbidden = sorted({name for name, _, _, _ in entries if name.split(".")[0] in FORBIDDEN})
+    return round(total_ms, 1), forbidden, total_ms <= budget_ms and not forbidden
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the app's import time against a budget.")
+    parser.add_argument("--module", default="wsgi", help="Module to import (default: wsgi)")
+    parser.add_argument("--budget-ms", type=float, default=1500, help="Allowed total import time in ms")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list (by self time)")
+    args = parser.parse_args()
+
+    entries = measure(args.module)
+    total_ms, forbidden, ok = check(entries, args.budget_ms)
+    for name, self_us, cumulative_us, _ in sorted(entries, key=lambda e: e[1], reverse=True)[:args.top]:
+        print(f"{self_us / 1000:>8.1f} ms self {cumulative_us / 1000:>8.1f} ms cumulative  {name}")
+    print(f"import {args.module}: {total_ms} ms (budget {args.budget_ms:g} ms)")
+    if forbidden:
+        print(f"Imported at startup but must not be: {', '.join(forbidden)}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
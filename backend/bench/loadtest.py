@@ -0,0 +1,182 @@
+# backend/bench/loadtest.py
+
+"""
+Load-test the production serving profile (gunicorn gthread + tuned SQLite).
+
+For each worker count, starts gunicorn on a seeded throwaway database and
+drives it with client threads running a mixed workload: catalogue reads,
+learner completion writes and admin challenge edits, all at once. Prints
+throughput and latency per worker count as JSON, so the scaling can be seen
+(and compared with SQLITE_JOURNAL_MODE=DELETE to see the WAL effect).
+
+    python -m bench.loadtest --workers 1,2,4 --clients 16 --duration 10
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from bench.datagen import ADMIN_PASSWORD, ADMIN_USERNAME, LEARNER_PASSWORD, build_database, learner_name
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Share of a learner's requests that mark/unmark completions (the rest are reads)
+COMPLETION_WRITE_SHARE = 0.15
+# Share of the admin client's requests that edit a challenge (the rest are reads)
+ADMIN_WRITE_SHARE = 0.2
+
+
+def seed_database(uri, challenges, learners):
+    """Create the schema and fill it with synthetic challenges and users."""
+    build_database(uri, challenges=challenges, users=learners, completions_per_user=0, pathways=5)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(port, workers, threads, env):
+    """Start gunicorn and wait until it answers; returns the process."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+         "--workers", str(workers), "--threads", str(threads),
+         "--bind", f"127.0.0.1:{port}", "wsgi:app"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/pathways", timeout=1)
+            return proc
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("gunicorn did not become ready within 30 seconds")
+
+
+def stop(proc):
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+class Client(threading.Thread):
+    """One simulated user issuing requests back to back until the deadline."""
+
+    def __init__(self, base, username, password, challenges, deadline, is_admin):
+        super().__init__(daemon=True)
+        self.base = base
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        self.username = username
+        self.password = password
+        self.challenges = challenges
+        self.deadline = deadline
+        self.is_admin = is_admin
+        self.latencies = {"read": [], "completion_write": [], "admin_write": []}
+        self.errors = 0
+        self.rng = random.Random(username)
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+        with self.opener.open(req, timeout=30) as response:
+            response.read()
+
+    def run(self):
+        self.request("POST", "/api/login", {"username": self.username, "password": self.password})
+        while time.monotonic() < self.deadline:
+            roll = self.rng.random()
+            cid = self.rng.randint(1, self.challenges)
+            if self.is_admin and roll < ADMIN_WRITE_SHARE:
+                kind, method, path, body = "admin_write", "PUT", f"/api/admin/challenges/{cid}", {"title": f"Edited {time.time()}"}
+            elif not self.is_admin and roll < COMPLETION_WRITE_SHARE:
+                kind, body = "completion_write", None
+                method = self.rng.choice(["POST", "DELETE"])
+                path = f"/api/completed-challenges/{cid}"
+            else:
+                kind, method, body = "read", "GET", None
+                path = self.rng.choice(["/api/challenges?view=summary", f"/api/challenges/{cid}", "/api/pathways"])
+            start = time.perf_counter()
+            try:
+                self.request(method, path, body)
+                self.latencies[kind].append(time.perf_counter() - start)
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                self.errors += 1
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    return round(statistics.quantiles(values, n=100)[q - 1] * 1000, 2) if len(values) > 1 else round(values[0] * 1000, 2)
+
+
+def run_round(port, clients, learners, challenges, duration):
+    deadline = time.monotonic() + duration
+    base = f"http://127.0.0.1:{port}"
+    # One admin editing alongside the learners
+    threads = [Client(base, ADMIN_USERNAME, ADMIN_PASSWORD, challenges, deadline, is_admin=True)]
+    threads += [Client(base, learner_name(i % learners), LEARNER_PASSWORD, challenges, deadline, is_admin=False)
+                for i in range(clients - 1)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    result = {"errors": sum(t.errors for t in threads)}
+    total = 0
+    for kind in ("read", "completion_write", "admin_write"):
+        values = [v for t in threads for v in t.latencies[kind]]
+        total += len(values)
+        result[kind] = {"count": len(values), "p50_ms": percentile(values, 50), "p95_ms": percentile(values, 95)}
+    result["requests_per_s"] = round(total / duration, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test gunicorn + SQLite under mixed reads and writes.")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated gunicorn worker counts")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per gunicorn worker")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent client threads")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per worker count")
+    parser.add_argument("--challenges", type=int, default=500)
+    parser.add_argument("--learners", type=int, default=8)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="dscl-load-")
+    try:
+        uri = f"sqlite:///{os.path.join(tmp, 'load.db')}"
+        seed_database(uri, args.challenges, args.learners)
+        env = dict(os.environ, DATABASE_URL=uri, ASSET_DIR=os.path.join(tmp, "assets"))
+        # Measure the server, not the per-client throttling
+        env.setdefault("RATE_LIMIT_STORE", "off")
+        results = {}
+        for workers in [int(w) for w in args.workers.split(",")]:
+            port = free_port()
+            proc = start_gunicorn(port, workers, args.threads, env)
+            try:
+                results[workers] = run_round(port, args.clients, args.learners, args.challenges, args.duration)
+            finally:
+                stop(proc)
+        print(json.dumps({"journal_mode": env.get("SQLITE_JOURNAL_MODE", "WAL"), "workers": results}, indent=2))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# backend/cache.py
+
+"""
+In-process response cache for the read-mostly catalogue endpoints.
+
+Responses are cached per (endpoint, view args, normalized query args,
+catalogue version). The catalogue version is a counter in the database that
+every admin write bumps, so a write makes all older entries unreachable (they
+age out of the LRU) in every worker, not only the one that handled it.
+Workers re-read the counter at most every CATALOGUE_VERSION_TTL seconds.
+
+Each cached response carries a strong ETag, so a client that sends
+If-None-Match gets a 304 without the route being run at all.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, Response
+from sqlalchemy import text
+from models import db
+
+
+class ResponseCache:
+    """Thread-safe LRU cache bounded by entry count and total body size."""
+
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        size = len(entry.body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old.body)
+            self._entries[key] = entry
+            self.total_bytes += size
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted.body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachedResponse:
+    """The parts of a 200 response needed to replay it, plus its ETag."""
+
+    # Response headers worth keeping alongside the body
+    KEPT_HEADERS = ("X-Next-After-Id", "X-Missing-Ids")
+
+    def __init__(self, body, mimetype, headers):
+        self.body = body
+        self.mimetype = mimetype
+        self.headers = headers
+        self.etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    @classmethod
+    def from_response(cls, response):
+        headers = {h: response.headers[h] for h in cls.KEPT_HEADERS if h in response.headers}
+        return cls(response.get_data(), response.mimetype, headers)
+
+    def to_response(self):
+        """Build a response for the current request, answering 304 when the ETag matches."""
+        if request.if_none_match.contains(self.etag):
+            response = Response(status=304)
+        else:
+            response = Response(self.body, mimetype=self.mimetype, headers=self.headers)
+        response.set_etag(self.etag)
+        response.headers["Cache-Control"] = current_app.config["CATALOGUE_CACHE_CONTROL"]
+        return response
+
+
+# ── Catalogue version ──────────────────────────────
+
+
+class CatalogueVersion:
+    """This worker's view of the catalogue version counter, refreshed at most once per TTL."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._value = None
+        self._read_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._value is not None and now - self._read_at < self.ttl:
+                return self._value
+        value = db.session.execute(text("SELECT version FROM catalogue_version WHERE id = 1")).scalar() or 0
+        with self._lock:
+            self._value = value
+            self._read_at = now
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+
+
+def create_version_table(conn):
+    """Create the single-row catalogue_version table (kept out of the models so drop_all() leaves it alone)."""
+    conn.execute(text("CREATE TABLE IF NOT EXISTS catalogue_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL)"))
+    conn.execute(text("INSERT INTO catalogue_version (id, version) SELECT 1, 0 "
+                      "WHERE NOT EXISTS (SELECT 1 FROM catalogue_version WHERE id = 1)"))
+
+
+def catalogue_version():
+    """Return the current catalogue version as seen by this worker."""
+    return current_app.extensions["catalogue_version"].get()
+
+
+def bump_catalogue_version():
+    """
+    Increment the catalogue version on the current session; call it before
+    committing any write that changes challenge or pathway responses.
+    """
+    db.session.execute(text("UPDATE catalogue_version SET version = version + 1 WHERE id = 1"))
+    # Make this worker re-read the version on its next request
+    current_app.extensions["catalogue_version"].invalidate()
+
+
+# ── Flask integration ──────────────────────────────
+
+
+def init_cache(app):
+    """Attach a ResponseCache to the app, sized from its config."""
+    app.config.setdefault("RESPONSE_CACHE_MAX_ENTRIES", 256)
+    app.config.setdefault("RESPONSE_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+    app.config.setdefault("CATALOGUE_VERSION_TTL", 1.0)
+    app.config.setdefault("CATALOGUE_CACHE_CONTROL", "public, max-age=0, must-revalidate")
+    app.extensions["response_cache"] = ResponseCache(
+        app.config["RESPONSE_CACHE_MAX_ENTRIES"], app.config["RESPONSE_CACHE_MAX_BYTES"]
+    )
+    app.extensions["catalogue_version"] = CatalogueVersion(app.config["CATALOGUE_VERSION_TTL"])
+
+
+def cache_key(view_args, extra=None):
+    """Key for the current request: endpoint, view args, sorted query args and the optional extra part."""
+    args = tuple(sorted((k, tuple(v)) for k, v in request.args.lists()))
+    return (request.endpoint, tuple(sorted(view_args.items())), args, catalogue_version(), extra)
+
+
+def cached_response(view=None, *, key_extra=None):
+    """
+    Cache a catalogue GET route. Only 200 responses are stored; anything else
+    (400, 404, ...) is returned as-is and recomputed next time.
+    key_extra, if given, is called per request and its result becomes part of
+    the cache key, for responses that also depend on data other than the
+    catalogue (e.g. a time window for completion counts).
+    """
+    if view is None:
+        return lambda view: cached_response(view, key_extra=key_extra)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Full-catalogue requests are answered from precompressed snapshots (see snapshots.py)
+        snapshots = current_app.extensions.get("snapshots")
+        if snapshots is not None:
+            response = snapshots.respond()
+            if response is not None:
+                return response
+        cache = current_app.extensions["response_cache"]
+        key = cache_key(kwargs, key_extra() if key_extra else None)
+        entry = cache.get(key)
+        if entry is None:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            entry = CachedResponse.from_response(response)
+            cache.put(key, entry)
+        return entry.to_response()
+    return wrapper
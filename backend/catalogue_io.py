@@ -0,0 +1,370 @@
+# backend/catalogue_io.py
+
+"""
+Streaming bulk import and export of the challenge catalogue.
+
+Imports read CSV or NDJSON row by row, validate each row and upsert in
+batches keyed on the challenge title: every batch is one transaction made of
+a single IN lookup plus executemany INSERT/UPDATE statements, so a large file
+never sits in memory and nothing else (users, completions) is touched.
+Tag tables, the search index, the stored renderings and the catalogue
+version are kept in sync.
+
+Partial updates (the admin PATCH endpoints) go through apply_patches(): one
+UPDATE per distinct set of columns, guarded by the challenge version, so a
+write based on a stale copy changes nothing and is reported as a conflict.
+
+Exports walk the table by id in fixed-size chunks and yield CSV or NDJSON
+text, so they can be streamed straight into an HTTP response.
+
+    python catalogue_io.py import challenges.csv --dry-run
+    python catalogue_io.py export challenges.ndjson
+"""
+
+import csv
+import io
+import json
+from itertools import groupby
+from sqlalchemy import bindparam, insert, select, update
+from models import db, Challenge, ChallengeSubcategory, ChallengeTechnology, split_tags
+from assets import decode_image, image_reference, store_image
+from cache import bump_catalogue_version
+from changes import record_changes
+import render
+import search
+import similarity
+
+FORMATS = ("csv", "ndjson")
+# Columns an import may set (id is assigned by the database; title is the natural key)
+IMPORT_FIELDS = tuple(f for f in Challenge.FIELDS if f != "id")
+REQUIRED_FIELDS = ("title", "difficulty", "subcategory")
+# Columns that may be NULL; CSV has no NULL, so an empty cell means NULL for these
+NULLABLE_FIELDS = frozenset(c.name for c in Challenge.__table__.columns if c.nullable)
+# Columns that may hold an inline data: URI image, moved to the asset store on write
+IMAGE_FIELDS = ("image_1", "image_2")
+# Column length limits, taken from the model
+MAX_LENGTHS = {c.name: c.type.length for c in Challenge.__table__.columns if getattr(c.type, "length", None)}
+DEFAULT_BATCH_SIZE = 500
+# Most challenges one PATCH request may update
+MAX_PATCH_BATCH = 1000
+# Columns whose change means rewriting the tag rows and search entries
+DERIVED_FIELDS = frozenset(("technology", "subcategory") + search.FTS_COLUMNS)
+# Cap on per-row entries in the report so a huge import returns a bounded response
+MAX_REPORTED_ROWS = 1000
+
+
+def iter_rows(stream, fmt):
+    """Yield (line number, dict) pairs from a text stream without reading it all."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "ndjson":
+        for line_num, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_num, None
+                continue
+            yield line_num, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+
+
+def validate_row(row, partial=False):
+    """
+    Clean one input row. Returns (values, error): values holds only the
+    import fields present in the row, error is a message or None.
+    With partial, required fields may be absent but not emptied. Empty
+    nullable fields become None, matching what the CSV export writes for NULL.
+    Inline images are decoded into assets.InlineImage values but not written
+    (see column_values() and store_images()).
+    """
+    if row is None:
+        return None, "Row is not a JSON object"
+    values = {}
+    for field in IMPORT_FIELDS:
+        if field in row:
+            value = row[field]
+            if value is not None and not isinstance(value, str):
+                return None, f"{field} must be a string"
+            value = value.strip() if isinstance(value, str) else value
+            values[field] = None if value == "" and field in NULLABLE_FIELDS else value
+    for field in REQUIRED_FIELDS:
+        if (field in values or not partial) and not values.get(field):
+            return None, f"Missing required field: {field}"
+    for field, limit in MAX_LENGTHS.items():
+        if values.get(field) and len(values[field]) > limit:
+            return None, f"{field} is longer than {limit} characters"
+    try:
+        for field in IMAGE_FIELDS:
+            if field in values:
+                values[field] = decode_image(values[field])
+    except ValueError as e:
+        return None, str(e)
+    return values, None
+
+
+class ImportReport:
+    """Counts and per-row details of an import (or dry run)."""
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.counts = {"inserted": 0, "updated": 0, "unchanged": 0, "errors": 0}
+        self.rows = []
+
+    def add(self, kind, line, title=None, **details):
+        self.counts[kind] += 1
+        if kind != "unchanged" and len(self.rows) < MAX_REPORTED_ROWS:
+            self.rows.append({"line": line, "action": kind, "title": title, **details})
+
+    def to_dict(self):
+        # Validation errors are recorded before their batch is applied, so restore file order
+        return {"dry_run": self.dry_run, **self.counts, "rows": sorted(self.rows, key=lambda r: r["line"]),
+                "rows_truncated": sum(v for k, v in self.counts.items() if k != "unchanged") > len(self.rows)}
+
+
+def column_values(values):
+    """Validated values as written to the table: inline images become their asset references."""
+    return {field: image_reference(value) for field, value in values.items()}
+
+
+def store_images(rows):
+    """
+    Write the inline images of validated rows to the asset store. Called only
+    once the rows are known to be written, so dry runs and conflicts leave no files.
+    """
+    for values in rows:
+        for field in IMAGE_FIELDS:
+            if field in values:
+                store_image(values[field])
+
+
+def sync_derived(rows):
+    """Rewrite tag rows and search entries for fully-populated challenge dicts."""
+    if not rows:
+        return
+    ids = [r["id"] for r in rows]
+    for tag_class, column in ((ChallengeTechnology, "technology"), (ChallengeSubcategory, "subcategory")):
+        tag_class.query.filter(tag_class.challenge_id.in_(ids)).delete(synchronize_session=False)
+        tags = [{"challenge_id": r["id"], "name": name} for r in rows for name in split_tags(r.get(column))]
+        if tags:
+            db.session.execute(insert(tag_class.__table__), tags)
+    search.index_rows(rows)
+
+
+def apply_batch(batch, report):
+    """
+    Upsert one batch of (line, values) pairs inside the current transaction.
+    Inline images are stored only for written rows, and not on a dry run.
+    """
+    table = Challenge.__table__
+    titles = list({values["title"] for _, values in batch})
+    existing = {}
+    for row in db.session.execute(select(table).where(table.c.title.in_(titles))).mappings():
+        existing.setdefault(row["title"], []).append(dict(row))
+
+    inserts, updates, touched, written, replaced, seen = [], [], [], [], [], set()
+    for line, validated in batch:
+        values = column_values(validated)
+        title = values["title"]
+        matches = existing.get(title, [])
+        if title in seen:
+            report.add("errors", line, title, error="Duplicate title in this batch")
+        elif len(matches) > 1:
+            report.add("errors", line, title, error="Title matches more than one existing challenge")
+        elif not matches:
+            inserts.append(values)
+            written.append(validated)
+            report.add("inserted", line, title)
+        else:
+            current = matches[0]
+            # Rows imported before empty cells meant NULL may still hold ""
+            changed = sorted(f for f, v in values.items()
+                             if v != current[f] and not (v is None and current[f] == ""))
+            if changed:
+                updates.append({"_id": current["id"], **values})
+                touched.append({**current, **values})
+                written.append(validated)
+                replaced.extend((f, current[f]) for f in changed if f in render.RENDERED_FIELDS and current[f])
+                report.add("updated", line, title, fields=changed)
+            else:
+                report.add("unchanged", line, title)
+        seen.add(title)
+
+    if inserts:
+        db.session.execute(insert(table), [{f: v.get(f) for f in IMPORT_FIELDS} for v in inserts])
+        new_titles = [v["title"] for v in inserts]
+        touched.extend(dict(r) for r in db.session.execute(select(table).where(table.c.title.in_(new_titles))).mappings())
+    # executemany needs identical keys per statement, so group updates by the columns they set
+    updates.sort(key=lambda u: sorted(u))
+    for _, group in groupby(updates, key=lambda u: tuple(sorted(u))):
+        # SET columns are taken from the parameter keys
+        db.session.execute(update(table).where(table.c.id == bindparam("_id"))
+                           .values(version=table.c.version + 1), list(group))
+    sync_derived(touched)
+    render.store_rendered(touched)
+    render.drop_unused(replaced)
+    record_changes("challenge", [r["id"] for r in touched])
+    if not report.dry_run:
+        store_images(written)
+    return bool(inserts or updates)
+
+
+def apply_patches(patches):
+    """
+    Apply [(id, expected version, values)] inside the current transaction,
+    each as UPDATE ... SET <values>, version = version + 1 WHERE id = ? AND
+    version = ?, batched per distinct set of columns. When any challenge is
+    missing or no longer at its expected version, rolls back and returns the
+    conflicts as [{"id", "version"}] with the current version (None when
+    deleted); otherwise stores the inline images and the renderings of new
+    text and returns []. Renderings of the replaced text are left to
+    render.render_all().
+    """
+    table = Challenge.__table__
+    stmt = (update(table).where(table.c.id == bindparam("_id"), table.c.version == bindparam("_version"))
+            .values(version=table.c.version + 1))
+    # Without a reliable executemany rowcount, fall back to one statement per row
+    sane_rowcount = db.session.get_bind().dialect.supports_sane_multi_rowcount
+    params = sorted(({"_id": cid, "_version": version, **column_values(values)} for cid, version, values in patches),
+                    key=lambda p: sorted(p))
+    matched = 0
+    for _, group in groupby(params, key=lambda p: tuple(sorted(p))):
+        group = list(group)
+        if sane_rowcount or len(group) == 1:
+            matched += db.session.execute(stmt, group).rowcount
+        else:
+            matched += sum(db.session.execute(stmt, p).rowcount for p in group)
+    ids = [cid for cid, _, _ in patches]
+    if matched != len(patches):
+        db.session.rollback()
+        current = dict(db.session.execute(select(table.c.id, table.c.version).where(table.c.id.in_(ids))).all())
+        conflicts = [{"id": cid, "version": current.get(cid)} for cid, version, _ in patches
+                     if current.get(cid) != version]
+        # A concurrent writer may have rolled back since; report every row rather than none
+        return conflicts or [{"id": cid, "version": current.get(cid)} for cid in ids]
+
+    derived = [cid for cid, _, values in patches if DERIVED_FIELDS & values.keys()]
+    if derived:
+        columns = [table.c.id] + [table.c[f] for f in sorted(DERIVED_FIELDS)]
+        sync_derived([dict(r) for r in db.session.execute(select(*columns).where(table.c.id.in_(derived))).mappings()])
+    rendered = [cid for cid, _, values in patches if values.keys() & set(render.RENDERED_FIELDS)]
+    if rendered:
+        columns = [table.c[f] for f in render.RENDERED_FIELDS]
+        render.store_rendered([dict(r) for r in db.session.execute(
+            select(*columns).where(table.c.id.in_(rendered))).mappings()])
+    record_changes("challenge", ids)
+    store_images(values for _, _, values in patches)
+    return []
+
+
+def import_challenges(stream, fmt, dry_run=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Stream rows from a text stream and upsert them by title, one transaction per batch.
+    With dry_run every batch is rolled back, so the report is a diff of what would change.
+    Must be called inside an app context. Returns an ImportReport.
+    """
+    report = ImportReport(dry_run)
+
+    def flush(batch):
+        try:
+            changed = apply_batch(batch, report)
+            if dry_run:
+                db.session.rollback()
+            else:
+                if changed:
+                    bump_catalogue_version()
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    batch = []
+    for line, row in iter_rows(stream, fmt):
+        values, error = validate_row(row)
+        if error:
+            report.add("errors", line, (row or {}).get("title"), error=error)
+            continue
+        batch.append((line, values))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return report
+
+
+def export_challenges(fmt, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yield the whole catalogue as CSV or NDJSON text, one chunk per batch.
+    Uses keyset pagination on id so memory stays flat regardless of size.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    table = Challenge.__table__
+    columns = [table.c[f] for f in Challenge.FIELDS]
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(Challenge.FIELDS)
+        yield buffer.getvalue()
+
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(*columns).where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            break
+        buffer = io.StringIO()
+        if fmt == "csv":
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow([row[f] if row[f] is not None else "" for f in Challenge.FIELDS])
+        else:
+            for row in rows:
+                buffer.write(json.dumps(dict(row), ensure_ascii=False) + "\n")
+        yield buffer.getvalue()
+        last_id = rows[-1]["id"]
+
+
+def format_from_path(path, default="csv"):
+    return "ndjson" if path.endswith((".ndjson", ".jsonl")) else default
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description="Bulk import/export the challenge catalogue.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Upsert challenges from a CSV or NDJSON file (matched on title)")
+    imp.add_argument("path")
+    imp.add_argument("--format", choices=FORMATS)
+    imp.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    imp.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    exp = sub.add_parser("export", help="Write the catalogue to a CSV or NDJSON file ('-' for stdout)")
+    exp.add_argument("path")
+    exp.add_argument("--format", choices=FORMATS)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        fmt = args.format or format_from_path(args.path)
+        if args.command == "import":
+            with open(args.path, newline="", encoding="utf-8") as f:
+                report = import_challenges(f, fmt, dry_run=args.dry_run, batch_size=args.batch_size)
+            if not args.dry_run and (report.counts["inserted"] or report.counts["updated"]):
+                similarity.rebuild_similarity_index()
+            print(json.dumps(report.to_dict(), indent=2))
+        else:
+            out = sys.stdout if args.path == "-" else open(args.path, "w", newline="", encoding="utf-8")
+            try:
+                for chunk in export_challenges(fmt):
+                    out.write(chunk)
+            finally:
+                if out is not sys.stdout:
+                    out.close()
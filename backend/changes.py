@@ -0,0 +1,50 @@
+# backend/changes.py
+
+"""
+Change sequence for the delta-sync feed (GET /api/changes?since=<seq>).
+
+Every catalogue write records the challenges and pathways it created,
+updated or deleted in catalogue_changes, in the same transaction, under a
+new sequence number. Only the latest change per object is kept: a newer
+change replaces the older row, and a deleted object is left with a single
+tombstone row. Clients keep the highest seq they have applied and ask for
+what came after it; since=0 returns the whole catalogue.
+
+Sequence numbers must become visible in order, or a client could read seq
+11 before a slower transaction holding seq 10 commits and never see 10.
+On PostgreSQL, where sequence values are handed out before commit, the
+writing transaction therefore locks catalogue_changes against other writers
+(readers are not blocked) until it commits; SQLite already allows a single
+writer at a time.
+"""
+
+from sqlalchemy import delete, insert, text, update
+from models import db, CatalogueChange, Pathway
+
+KINDS = ("challenge", "pathway")
+
+
+def record_changes(kind, ids, deleted=False):
+    """Record that the given challenges or pathways were written (or deleted) in the current transaction."""
+    ids = sorted(set(ids))
+    if not ids:
+        return
+    table = CatalogueChange.__table__
+    if db.session.get_bind().dialect.name == "postgresql":
+        # Held until commit, so seqs are assigned and committed in the same order
+        db.session.execute(text(f"LOCK TABLE {table.name} IN EXCLUSIVE MODE"))
+    db.session.execute(delete(table).where(table.c.kind == kind, table.c.object_id.in_(ids)))
+    db.session.execute(insert(table), [{"kind": kind, "object_id": i, "deleted": deleted} for i in ids])
+
+
+def touch_pathways(ids):
+    """
+    Record pathways whose membership changed without an UPDATE of their own
+    row (which is what sets updated_at), e.g. when a member challenge is deleted.
+    """
+    ids = sorted(set(ids))
+    if not ids:
+        return
+    db.session.execute(update(Pathway.__table__).where(Pathway.id.in_(ids))
+                       .values(updated_at=db.func.current_timestamp()))
+    record_changes("pathway", ids)
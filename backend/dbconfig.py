@@ -0,0 +1,129 @@
+# backend/dbconfig.py
+
+"""
+Engine configuration for the production serving profile.
+
+SQLite defaults (rollback journal, no busy timeout, a fresh connection per
+checkout) make readers and writers serialize on the database lock and fail
+fast with "database is locked" under concurrency. For file-backed SQLite
+databases this module:
+
+  - pools connections (QueuePool) so each request does not reopen the file
+  - applies WAL journal mode, busy_timeout, synchronous=NORMAL, mmap_size
+    and foreign_keys=ON through a connect-event hook, so every pooled
+    connection gets them
+
+All values can be overridden from the environment (see SQLITE_PRAGMAS and
+engine_options()).
+
+For a server database (PostgreSQL, shared by several backend replicas) the
+pool size, overflow, checkout timeout, pre-ping and recycle age come from
+the environment, and insert_ignore() gives the dialect's own
+"INSERT ... ON CONFLICT DO NOTHING".
+"""
+
+import os
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+# Databases whose SQL the backend speaks (insert_ignore(), full-text search, change-log locking)
+SUPPORTED_BACKENDS = ("sqlite", "postgresql")
+# PRAGMA name -> (environment variable, default)
+SQLITE_PRAGMAS = {
+    "journal_mode": ("SQLITE_JOURNAL_MODE", "WAL"),
+    "busy_timeout": ("SQLITE_BUSY_TIMEOUT_MS", "5000"),
+    "synchronous": ("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": ("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    # Off by default in SQLite; the schema's ON DELETE CASCADE relies on it
+    "foreign_keys": ("SQLITE_FOREIGN_KEYS", "ON"),
+}
+
+
+def database_uri():
+    """
+    DATABASE_URL, defaulting to a local SQLite file. postgres:// (as issued by
+    hosting providers) is accepted. Raises ValueError at startup for any
+    other database than SQLite or PostgreSQL.
+    """
+    uri = os.environ.get("DATABASE_URL", "sqlite:///instance/challenges.db")
+    if uri.startswith("postgres://"):
+        # SQLAlchemy 1.4 only knows the postgresql:// scheme
+        uri = "postgresql://" + uri[len("postgres://"):]
+    backend = make_url(uri).get_backend_name()
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(f"DATABASE_URL must be an SQLite or PostgreSQL URL, not {backend!r}")
+    return uri
+
+
+def pool_options():
+    """Pool settings shared by file-backed SQLite and server databases."""
+    return {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+    }
+
+
+def is_file_sqlite(uri):
+    """True for an SQLite URI that points at a file (not an in-memory database)."""
+    url = make_url(uri)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def engine_options(uri):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the given database URI.
+    In-memory SQLite keeps Flask-SQLAlchemy's defaults (a single shared connection).
+    """
+    if make_url(uri).get_backend_name() != "sqlite":
+        return {
+            **pool_options(),
+            # Test each connection on checkout, so one dropped by the server or a failover is replaced
+            "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") != "0",
+            # Reopen connections before the server or a proxy in between closes them as idle
+            "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        }
+    if not is_file_sqlite(uri):
+        return {}
+    return {
+        "poolclass": QueuePool,
+        **pool_options(),
+        # Pooled connections are handed between gthread worker threads
+        "connect_args": {"check_same_thread": False},
+    }
+
+
+def sqlite_pragmas():
+    """The PRAGMA values to apply, after environment overrides."""
+    return {name: os.environ.get(var, default) for name, (var, default) in SQLITE_PRAGMAS.items()}
+
+
+def install_sqlite_pragmas(engine):
+    """Register a connect hook that applies the tuning PRAGMAs to every new SQLite connection."""
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def insert_ignore(table, bind):
+    """
+    An INSERT into table that skips rows whose primary or unique key already
+    exists, instead of failing the transaction, on bind's dialect.
+    """
+    dialect = bind.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    raise NotImplementedError(f"insert_ignore() does not support {dialect}")
@@ -0,0 +1,46 @@
+# backend/gunicorn.conf.py
+
+"""
+Gunicorn settings for the production serving profile.
+
+gthread workers suit this app: requests are short and mostly wait on SQLite,
+so a few processes with several threads each give good throughput without
+multiplying memory. Tune with WEB_CONCURRENCY and GUNICORN_THREADS.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+keepalive = 5
+# Recycle workers occasionally to bound memory growth
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = 500
+
+# Rate limiting is off by default. When enabling it under gunicorn use
+# RATE_LIMIT_STORE=sqlite so buckets are shared between workers, and read the
+# proxy requirements in ratelimit.py first
+# Workers mmap the catalogue snapshots prebuilt by the master (see snapshots.py)
+os.environ.setdefault("SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "snapshots"))
+
+
+def on_starting(server):
+    """
+    Apply pending migrations (a single schema_version check when up to date) and
+    prebuild snapshots once, in the master, before workers fork.
+    """
+    from app import create_app
+    from models import db
+    from migrations import run_migrations
+
+    app = create_app()
+    with app.app_context():
+        run_migrations()
+        # Render and compress the catalogue snapshots once, before any request arrives
+        app.extensions["snapshots"].build_all()
+        # Workers must open their own connections, not inherit the master's
+        db.engine.dispose()
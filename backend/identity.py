@@ -0,0 +1,133 @@
+# backend/identity.py
+
+"""
+Cheap per-request authentication for Flask-Login.
+
+Instead of loading the User row on every authenticated request, the session
+cookie (already signed with SECRET_KEY) carries an identity claim with the
+user's id, username and role. While the claim is younger than
+IDENTITY_CLAIM_TTL seconds, current_user is rebuilt from it with no database
+access. Older claims are refreshed from a small TTL-bounded in-process
+identity cache, and only a cache miss reads the users table.
+
+Changes to a User row evict it from this worker's cache straight away; other
+workers and outstanding claims pick the change up within their TTLs.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context, session
+from flask_login import UserMixin
+from sqlalchemy import event
+from models import db, User
+
+# Session key holding the identity claim
+CLAIM_KEY = "identity"
+
+
+class SessionUser(UserMixin):
+    """The authenticated user as seen by request handlers: id, username and role only."""
+
+    def __init__(self, id, username, user_type):
+        self.id = id
+        self.username = username
+        self.user_type = user_type
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.user_type)
+
+
+class IdentityCache:
+    """Thread-safe user id -> SessionUser cache with a TTL and a size bound."""
+
+    def __init__(self, ttl=60, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            identity, stored_at = entry
+            if time.monotonic() - stored_at >= self.ttl:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return identity
+
+    def put(self, identity):
+        with self._lock:
+            self._entries[identity.id] = (identity, time.monotonic())
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def init_identity(app):
+    """Attach the identity cache and the login hashing limiter to the app, configured from app.config."""
+    app.config.setdefault("IDENTITY_CACHE_TTL", 60)
+    app.config.setdefault("IDENTITY_CLAIM_TTL", 300)
+    app.config.setdefault("LOGIN_HASH_CONCURRENCY", 2)
+    app.config.setdefault("LOGIN_QUEUE_TIMEOUT", 5.0)
+    app.extensions["identity_cache"] = IdentityCache(app.config["IDENTITY_CACHE_TTL"])
+    # Password checks are CPU-bound; cap how many run at once per worker so a
+    # burst of logins queues (bounded by LOGIN_QUEUE_TIMEOUT) instead of
+    # slowing every request in the process
+    app.extensions["login_hash_slots"] = threading.BoundedSemaphore(app.config["LOGIN_HASH_CONCURRENCY"])
+
+
+def issue_claim(identity):
+    """Store a fresh identity claim in the (signed) session cookie."""
+    session[CLAIM_KEY] = {
+        "id": identity.id,
+        "username": identity.username,
+        "user_type": identity.user_type,
+        "iat": int(time.time()),
+    }
+
+
+def clear_claim():
+    session.pop(CLAIM_KEY, None)
+
+
+def load_identity(user_id):
+    """
+    Flask-Login user_loader: resolve the session's user id to a SessionUser,
+    trying the session claim, then the identity cache, then the database.
+    """
+    user_id = int(user_id)
+    claim = session.get(CLAIM_KEY)
+    if claim and claim.get("id") == user_id and time.time() - claim.get("iat", 0) < current_app.config["IDENTITY_CLAIM_TTL"]:
+        return SessionUser(user_id, claim["username"], claim["user_type"])
+
+    cache = current_app.extensions["identity_cache"]
+    identity = cache.get(user_id)
+    if identity is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        identity = SessionUser.from_user(user)
+        cache.put(identity)
+    issue_claim(identity)
+    return identity
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_identity(mapper, connection, target):
+    """Drop a changed or deleted user from this worker's identity cache."""
+    if has_app_context() and "identity_cache" in current_app.extensions:
+        current_app.extensions["identity_cache"].invalidate(target.id)
@@ -0,0 +1,302 @@
+# backend/linkcheck.py
+
+"""
+Dataset link health checker.
+
+Probes every distinct challenge dataset_url and stores the outcome in the
+dataset_links table, which GET /api/admin/challenges reports as each
+challenge's link_status. Probes run from an asyncio event loop with at most
+LINKCHECK_CONCURRENCY requests in flight, at most LINKCHECK_PER_HOST per
+host and LINKCHECK_HOST_DELAY seconds between request starts to one host, so
+Kaggle and Google Drive are not hammered. Each probe is a HEAD (GET when the
+server refuses HEAD) carrying the ETag/Last-Modified of the previous check,
+so unchanged datasets answer 304. Timeouts, 429 and 5xx are retried with
+exponential backoff (honouring Retry-After) up to LINKCHECK_RETRIES times.
+
+A link is "ok" (2xx/304), "broken" (any other 4xx: gone or not public) or
+"error" (no answer, or still failing after the retries). Run it from a
+scheduled job:
+
+    python linkcheck.py
+
+or from the admin API with POST /api/admin/links/check. Either way a run
+first takes the "linkcheck" row of job_leases, so only one run at a time
+probes the hosts, whichever worker, replica or cron job starts it; the
+lease expires after LINKCHECK_LEASE_SECONDS if its holder dies.
+"""
+
+import asyncio
+import contextlib
+import datetime
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from urllib.parse import urlsplit
+from flask import current_app
+from sqlalchemy import delete, select, update
+from dbconfig import insert_ignore
+from models import db, Challenge, DatasetLink, JobLease
+
+USER_AGENT = "DSCL-linkcheck/1.0"
+# Responses that are retried with backoff
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+# Responses to HEAD meaning "ask again with GET"
+HEAD_REFUSED = {403, 405, 501}
+# Longest Retry-After honoured between attempts, in seconds
+MAX_RETRY_AFTER = 60
+# job_leases row held while a check runs
+LEASE_NAME = "linkcheck"
+
+
+def probe(url, method="HEAD", etag=None, last_modified=None, timeout=10):
+    """
+    Send one request to url without reading the body.
+    Returns (HTTP status or None, response headers, error message or None).
+    """
+    headers = {"User-Agent": USER_AGENT}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    if method == "GET":
+        # Only the headers are needed; a server honouring Range sends one byte
+        headers["Range"] = "bytes=0-0"
+    req = urllib.request.Request(url, method=method, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status, response.headers, None
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, None
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        return None, {}, str(getattr(e, "reason", e))[:200]
+
+
+def content_size(headers):
+    """Full size of the resource from Content-Range (ranged GET) or Content-Length, or None."""
+    total = (headers.get("Content-Range") or "").rpartition("/")[2]
+    value = total if total.isdigit() else headers.get("Content-Length")
+    return int(value) if value and value.isdigit() else None
+
+
+def retry_delay(attempt, backoff, headers):
+    """Seconds to wait before retry number attempt (0-based): Retry-After, else jittered exponential."""
+    retry_after = (headers.get("Retry-After") or "").strip()
+    if retry_after.isdigit():
+        return min(int(retry_after), MAX_RETRY_AFTER)
+    return backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+def classify(status):
+    if status is None or status in RETRY_STATUSES:
+        return "error"
+    if 200 <= status < 300 or status == 304:
+        return "ok"
+    if 400 <= status < 500:
+        return "broken"
+    return "error"
+
+
+class HostLimiter:
+    """Per-host concurrency limit and minimum spacing between request starts."""
+
+    def __init__(self, per_host, delay):
+        self.per_host = per_host
+        self.delay = delay
+        self._semaphores = {}
+        self._next_start = {}
+
+    @contextlib.asynccontextmanager
+    async def slot(self, host):
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.delay
+            await asyncio.sleep(start - now)
+            yield
+
+
+class LinkChecker:
+    """Checks a set of URLs concurrently; settings come from the LINKCHECK_* config."""
+
+    def __init__(self, concurrency=16, per_host=2, host_delay=0.5, timeout=10, retries=3, backoff=1.0):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.host_delay = host_delay
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    async def check_url(self, url, previous, hosts, slots):
+        """Probe one URL with retries. previous is the last DatasetLink for it, or None."""
+        etag = previous.etag if previous else None
+        last_modified = previous.last_modified if previous else None
+        host = urlsplit(url).hostname or ""
+        for attempt in range(self.retries + 1):
+            async with hosts.slot(host), slots:
+                started = time.perf_counter()
+                status, headers, error = await asyncio.to_thread(probe, url, "HEAD", etag, last_modified, self.timeout)
+                if status in HEAD_REFUSED:
+                    status, headers, error = await asyncio.to_thread(probe, url, "GET", etag, last_modified,
+                                                                     self.timeout)
+                latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            if status is not None and status not in RETRY_STATUSES:
+                break
+            if attempt < self.retries:
+                await asyncio.sleep(retry_delay(attempt, self.backoff, headers))
+
+        result = {
+            "status": classify(status),
+            "http_status": status,
+            "latency_ms": latency_ms,
+            "error": error,
+            "size": content_size(headers),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+        }
+        if status == 304 and previous is not None:
+            # Unchanged: a 304 carries no size, and may omit the validators
+            result["size"] = previous.size
+            result["etag"] = result["etag"] or previous.etag
+            result["last_modified"] = result["last_modified"] or previous.last_modified
+        return url, result
+
+    async def check_all(self, urls, previous):
+        """Check every URL; previous maps URL -> DatasetLink. Returns URL -> result dict."""
+        hosts = HostLimiter(self.per_host, self.host_delay)
+        slots = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self.check_url(url, previous.get(url), hosts, slots) for url in urls))
+        return dict(results)
+
+
+def catalogue_urls():
+    """Distinct http(s) dataset URLs of the catalogue."""
+    rows = db.session.query(Challenge.dataset_url).filter(Challenge.dataset_url.isnot(None)).distinct()
+    return sorted(url for (url,) in rows if url.startswith(("http://", "https://")))
+
+
+def run_link_check():
+    """
+    Check every dataset URL and store the results (inside an app context).
+    Links no longer used by any challenge are dropped. Returns {status: count}.
+    """
+    config = current_app.config
+    checker = LinkChecker(config["LINKCHECK_CONCURRENCY"], config["LINKCHECK_PER_HOST"], config["LINKCHECK_HOST_DELAY"],
+                          config["LINKCHECK_TIMEOUT"], config["LINKCHECK_RETRIES"], config["LINKCHECK_BACKOFF"])
+    urls = catalogue_urls()
+    previous = {link.url: link for link in DatasetLink.query.all()}
+    results = asyncio.run(checker.check_all(urls, previous))
+
+    checked_at = datetime.datetime.utcnow()
+    for url, result in results.items():
+        link = previous.get(url) or DatasetLink(url=url)
+        for key, value in result.items():
+            setattr(link, key, value)
+        link.checked_at = checked_at
+        db.session.add(link)
+    for url, link in previous.items():
+        if url not in results:
+            db.session.delete(link)
+    db.session.commit()
+    return dict(Counter(result["status"] for result in results.values()))
+
+
+def acquire_lease(name, seconds):
+    """
+    Take the named job lease if it is free or expired, in its own committed
+    transaction. Returns the holder id to release it with, or None when
+    another run holds it.
+    """
+    holder = uuid.uuid4().hex
+    now = datetime.datetime.utcnow()
+    expires_at = now + datetime.timedelta(seconds=seconds)
+    table = JobLease.__table__
+    with db.engine.begin() as conn:
+        taken = conn.execute(insert_ignore(table, conn),
+                             {"name": name, "holder": holder, "expires_at": expires_at}).rowcount
+        if not taken:
+            # Take over a lease its holder never released
+            taken = conn.execute(update(table).where(table.c.name == name, table.c.expires_at < now)
+                                 .values(holder=holder, expires_at=expires_at)).rowcount
+    return holder if taken else None
+
+
+def release_lease(name, holder):
+    """Give the lease back, unless it expired and another run took it over."""
+    table = JobLease.__table__
+    with db.engine.begin() as conn:
+        conn.execute(delete(table).where(table.c.name == name, table.c.holder == holder))
+
+
+def lease_held(name):
+    """True while some run holds the named lease."""
+    table = JobLease.__table__
+    with db.engine.connect() as conn:
+        return conn.execute(select(table.c.name).where(
+            table.c.name == name, table.c.expires_at >= datetime.datetime.utcnow())).first() is not None
+
+
+class BackgroundLinkCheck:
+    """Runs run_link_check() in a background thread, one run at a time across processes."""
+
+    def __init__(self, app):
+        self.app = app
+        self.last_result = None
+
+    @property
+    def running(self):
+        """Whether any process is running a check (inside an app context)."""
+        return lease_held(LEASE_NAME)
+
+    def start(self):
+        """Start a run unless one is in progress anywhere (inside an app context). Returns True if started."""
+        holder = acquire_lease(LEASE_NAME, self.app.config["LINKCHECK_LEASE_SECONDS"])
+        if holder is None:
+            return False
+        threading.Thread(target=self._run, args=(holder,), name="linkcheck", daemon=True).start()
+        return True
+
+    def _run(self, holder):
+        with self.app.app_context():
+            try:
+                self.last_result = run_link_check()
+            except Exception as e:
+                print(f"Error checking dataset links: {str(e)}")
+            finally:
+                release_lease(LEASE_NAME, holder)
+
+
+def init_linkcheck(app):
+    """Attach the background link checker to the app, configured from the environment."""
+    app.config.setdefault("LINKCHECK_CONCURRENCY", int(os.environ.get("LINKCHECK_CONCURRENCY", 16)))
+    app.config.setdefault("LINKCHECK_PER_HOST", int(os.environ.get("LINKCHECK_PER_HOST", 2)))
+    app.config.setdefault("LINKCHECK_HOST_DELAY", float(os.environ.get("LINKCHECK_HOST_DELAY", 0.5)))
+    app.config.setdefault("LINKCHECK_TIMEOUT", float(os.environ.get("LINKCHECK_TIMEOUT", 10)))
+    app.config.setdefault("LINKCHECK_RETRIES", int(os.environ.get("LINKCHECK_RETRIES", 3)))
+    app.config.setdefault("LINKCHECK_BACKOFF", float(os.environ.get("LINKCHECK_BACKOFF", 1.0)))
+    # Longer than any run: a run that dies without releasing blocks checks for this long
+    app.config.setdefault("LINKCHECK_LEASE_SECONDS", int(os.environ.get("LINKCHECK_LEASE_SECONDS", 3600)))
+    app.extensions["linkcheck"] = BackgroundLinkCheck(app)
+
+
+if __name__ == "__main__":
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        holder = acquire_lease(LEASE_NAME, app.config["LINKCHECK_LEASE_SECONDS"])
+        if holder is None:
+            raise SystemExit("A link check is already running")
+        started = time.perf_counter()
+        try:
+            counts = run_link_check()
+        finally:
+            release_lease(LEASE_NAME, holder)
+        summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items())) or "no links"
+        print(f"Checked dataset links in {time.perf_counter() - started:.1f}s: {summary}")
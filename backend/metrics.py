@@ -0,0 +1,291 @@
+# backend/metrics.py
+
+"""
+Request-level performance instrumentation.
+
+init_metrics(app) installs request hooks and SQLAlchemy cursor events that
+record, per endpoint (the URL rule, so ids do not explode the label set):
+
+  - request latency and response size histograms
+  - SQL statements per request and time spent in SQL
+  - suspected N+1 patterns: the same statement run N_PLUS_ONE_THRESHOLD or
+    more times in one request
+
+The numbers are served in Prometheus text format by routes/metrics.py and,
+when REQUEST_LOG is on, every request is also logged as one JSON line on the
+"dscl.requests" logger. Metrics are per process; under gunicorn each worker
+reports its own, so scrape them through a per-worker port or aggregate.
+
+Profiling is opt-in: with PROFILE_TOKEN set, a request carrying
+"X-Profile: <token>" runs under cProfile (pstats dump) and one carrying
+"X-Profile: <token>; flame" is sampled into collapsed stacks for
+flamegraph.pl / speedscope. Dumps land in PROFILE_DIR and the file name is
+returned in the X-Profile-Dump header.
+"""
+
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import Counter
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from models import db
+
+logger = logging.getLogger("dscl.requests")
+
+# Upper bounds of the histogram buckets (+Inf is implicit)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+# Seconds between stack samples for flame-graph profiles
+SAMPLE_INTERVAL = 0.005
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram keyed by a label tuple."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+        series["counts"][bisect_left(self.buckets, value)] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+
+class MetricsRegistry:
+    """All request metrics of this process, guarded by one lock."""
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.sql_statements = Histogram(SQL_COUNT_BUCKETS)
+        self.sql_seconds = Histogram(LATENCY_BUCKETS)
+        self.n_plus_one = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, method, status, seconds, size, sql_count, sql_seconds, n_plus_one):
+        with self._lock:
+            self.latency.observe((endpoint, method, str(status)), seconds)
+            self.response_size.observe((endpoint, method), size)
+            self.sql_statements.observe((endpoint, method), sql_count)
+            self.sql_seconds.observe((endpoint, method), sql_seconds)
+            if n_plus_one:
+                self.n_plus_one[(endpoint, method)] += 1
+
+    def render(self, extra=()):
+        """Prometheus text exposition of everything recorded so far, plus extra (name, help, type, value) gauges."""
+        lines = []
+        with self._lock:
+            _render_histogram(lines, "dscl_request_duration_seconds", "Request latency",
+                              ("endpoint", "method", "status"), self.latency)
+            _render_histogram(lines, "dscl_response_size_bytes", "Response body size",
+                              ("endpoint", "method"), self.response_size)
+            _render_histogram(lines, "dscl_sql_statements_per_request", "SQL statements executed per request",
+                              ("endpoint", "method"), self.sql_statements)
+            _render_histogram(lines, "dscl_sql_duration_seconds", "Time spent in SQL per request",
+                              ("endpoint", "method"), self.sql_seconds)
+            lines.append("# HELP dscl_n_plus_one_total Requests that repeated one SQL statement past the N+1 threshold")
+            lines.append("# TYPE dscl_n_plus_one_total counter")
+            for labels, value in sorted(self.n_plus_one.items()):
+                lines.append(f"dscl_n_plus_one_total{_labels(('endpoint', 'method'), labels)} {value}")
+        for name, help_text, kind, value in extra:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names, values):
+    pairs = ",".join(f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                     for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _render_histogram(lines, name, help_text, label_names, histogram):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, series in sorted(histogram.series.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + (float("inf"),), series["counts"]):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_labels(label_names + ('le',), labels + (le,))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(label_names, labels)} {series['sum']}")
+        lines.append(f"{name}_count{_labels(label_names, labels)} {series['count']}")
+
+
+# ── Profiling ──────────────────────────────
+
+
+class StackSampler(threading.Thread):
+    """Sample one thread's Python stack at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _profile_mode(app):
+    """The profiler requested by the X-Profile header ("cprofile" or "flame"), or None."""
+    token = app.config.get("PROFILE_TOKEN")
+    header = request.headers.get("X-Profile")
+    if not token or not header:
+        return None
+    value, _, mode = header.partition(";")
+    if value.strip() != token:
+        return None
+    return "flame" if mode.strip() == "flame" else "cprofile"
+
+
+def _write_profile(app, profiler):
+    directory = app.config["PROFILE_DIR"] or os.path.join(app.instance_path, "profiles")
+    os.makedirs(directory, exist_ok=True)
+    endpoint = (request.endpoint or "unmatched").replace(".", "-")
+    if isinstance(profiler, StackSampler):
+        name = f"{endpoint}-{uuid.uuid4().hex[:8]}.collapsed"
+        with open(os.path.join(directory, name), "w") as f:
+            f.write(profiler.collapsed())
+    else:
+        name = f"{endpoint}-{uuid.uuid4().hex[:8]}.prof"
+        profiler.dump_stats(os.path.join(directory, name))
+    return name
+
+
+# ── Flask integration ──────────────────────────────
+
+
+def _on_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _on_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    started = starts.pop()
+    stats = g.get("sql_stats") if has_app_context() else None
+    if stats is not None:
+        stats["count"] += 1
+        stats["seconds"] += time.perf_counter() - started
+        stats["statements"][statement] += 1
+
+
+def init_metrics(app):
+    """Attach the metrics registry, request hooks and SQL event listeners to the app."""
+    app.config.setdefault("N_PLUS_ONE_THRESHOLD", int(os.environ.get("N_PLUS_ONE_THRESHOLD", 10)))
+    app.config.setdefault("REQUEST_LOG", os.environ.get("REQUEST_LOG", "1") == "1")
+    app.config.setdefault("PROFILE_TOKEN", os.environ.get("PROFILE_TOKEN"))
+    app.config.setdefault("PROFILE_DIR", os.environ.get("PROFILE_DIR"))
+    app.config.setdefault("METRICS_TOKEN", os.environ.get("METRICS_TOKEN"))
+    registry = app.extensions["metrics"] = MetricsRegistry()
+
+    if app.config["REQUEST_LOG"] and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+    with app.app_context():
+        db_engine = db.engine
+    event.listen(db_engine, "before_cursor_execute", _on_before_cursor_execute)
+    event.listen(db_engine, "after_cursor_execute", _on_after_cursor_execute)
+
+    @app.before_request
+    def start_request_metrics():
+        # Kept on the request rather than g: an inner context (e.g. a snapshot
+        # render) can share this request's app context but is not this request
+        request.environ["dscl.request_started"] = time.perf_counter()
+        g.sql_stats = {"count": 0, "seconds": 0.0, "statements": Counter()}
+        mode = _profile_mode(app)
+        if mode == "flame":
+            g.profiler = StackSampler(threading.get_ident())
+            g.profiler.start()
+        elif mode == "cprofile":
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    def stop_profiler():
+        """Stop the request's profiler, if any, and write its dump. Returns the dump name or None."""
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return None
+        if isinstance(profiler, StackSampler):
+            profiler.stop()
+        else:
+            profiler.disable()
+        return _write_profile(app, profiler)
+
+    @app.after_request
+    def note_response(response):
+        dump = stop_profiler()
+        if dump is not None:
+            response.headers["X-Profile-Dump"] = dump
+        # Streamed responses have no known length; record them as 0 bytes without
+        # touching the body, which would run the whole generator before sending
+        size = 0 if response.is_streamed else response.calculate_content_length() or 0
+        g.response_metrics = (response.status_code, size)
+        return response
+
+    @app.teardown_request
+    def record_request_metrics(exc):
+        # Runs even when the view or an after_request hook raised, so the
+        # profiler is always stopped and failed requests are counted as 500s
+        started = request.environ.pop("dscl.request_started", None)
+        if started is None:
+            return
+        stop_profiler()
+        status, size = g.pop("response_metrics", (500, 0))
+
+        seconds = time.perf_counter() - started
+        stats = g.pop("sql_stats")
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        repeated = [(s, n) for s, n in stats["statements"].items() if n >= app.config["N_PLUS_ONE_THRESHOLD"]]
+        registry.record(endpoint, request.method, status, seconds, size,
+                        stats["count"], stats["seconds"], bool(repeated))
+
+        if app.config["REQUEST_LOG"]:
+            entry = {
+                "method": request.method,
+                "path": request.path,
+                "endpoint": endpoint,
+                "status": status,
+                "duration_ms": round(seconds * 1000, 2),
+                "bytes": size,
+                "sql_count": stats["count"],
+                "sql_ms": round(stats["seconds"] * 1000, 2),
+            }
+            if repeated:
+                entry["n_plus_one"] = [{"statement": " ".join(s.split())[:200], "count": n} for s, n in repeated]
+            logger.info(json.dumps(entry))
@@ -0,0 +1,283 @@
+# backend/migrations.py
+
+"""
+Ordered, idempotent schema migrations for the DSCL database.
+
+db.create_all() only creates missing tables; it never adds indexes to existing
+tables or backfills data. Each migration here runs once and is recorded in the
+schema_version table. Apply pending migrations with:
+
+    python migrations.py
+
+On an up-to-date database run_migrations() is a single SELECT and skips
+create_all(), so it is cheap to call on every start. If the model tables
+were dropped (db.drop_all() leaves schema_version behind, as it is not a
+model) every migration is applied again. A new model table is
+therefore only created on existing databases if it comes with a migration
+(an empty one will do).
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from models import db, split_tags
+import assets
+import cache
+import render
+import search
+import similarity
+
+# (version, function) pairs, in the order they must be applied
+MIGRATIONS = []
+
+
+def migration(version):
+    """Register a migration function under the given schema version."""
+    def decorator(func):
+        MIGRATIONS.append((version, func))
+        return func
+    return decorator
+
+
+def current_version(conn):
+    """Return the highest applied schema version (0 for a fresh database)."""
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY)"))
+    return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+
+def latest_version():
+    """The schema version this code expects."""
+    return max(version for version, _ in MIGRATIONS)
+
+
+def applied_version(conn):
+    """
+    Like current_version(), but read-only: 0 when the schema_version table does
+    not exist yet, or the model tables do not (e.g. after db.drop_all()).
+    """
+    try:
+        # The subquery never matches a row; it only fails when challenges is missing
+        return conn.execute(text("SELECT MAX(version) FROM schema_version "
+                                 "WHERE NOT EXISTS (SELECT 1 FROM challenges WHERE 1 = 0)")).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        return 0
+
+
+def schema_exists(conn):
+    """True when the challenges table exists; db.drop_all() removes it but not schema_version."""
+    try:
+        conn.execute(text("SELECT 1 FROM challenges WHERE 1 = 0")).all()
+        return True
+    except (OperationalError, ProgrammingError):
+        return False
+
+
+def run_migrations():
+    """
+    Create any missing tables and apply pending migrations in order.
+    Must be called inside an app context. Returns the list of versions applied.
+    """
+    # Fast path for every start after the first: one query, no table inspection
+    with db.engine.connect() as conn:
+        if applied_version(conn) >= latest_version():
+            return []
+    with db.engine.connect() as conn:
+        dropped = not schema_exists(conn)
+    db.create_all()
+    applied = []
+    with db.engine.begin() as conn:
+        version = current_version(conn)
+        if dropped and version:
+            # The tables (and the indexes and backfills migrations added to them) are gone: start over
+            conn.execute(text("DELETE FROM schema_version"))
+            version = 0
+        for target, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if target <= version:
+                continue
+            func(conn)
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": target})
+            applied.append(target)
+    return applied
+
+
+# ── Migrations ──────────────────────────────
+
+
+@migration(1)
+def normalize_challenge_tags(conn):
+    """
+    Index challenges.difficulty and build challenge_technologies /
+    challenge_subcategories from the comma-separated columns.
+    """
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_challenges_difficulty ON challenges (difficulty)"))
+    conn.execute(text("DELETE FROM challenge_technologies"))
+    conn.execute(text("DELETE FROM challenge_subcategories"))
+    rows = conn.execute(text("SELECT id, technology, subcategory FROM challenges")).fetchall()
+    technologies = [{"cid": r.id, "name": name} for r in rows for name in split_tags(r.technology)]
+    subcategories = [{"cid": r.id, "name": name} for r in rows for name in split_tags(r.subcategory)]
+    if technologies:
+        conn.execute(text("INSERT INTO challenge_technologies (challenge_id, name) VALUES (:cid, :name)"), technologies)
+    if subcategories:
+        conn.execute(text("INSERT INTO challenge_subcategories (challenge_id, name) VALUES (:cid, :name)"), subcategories)
+
+
+@migration(2)
+def add_search_index(conn):
+    """Create the FTS5 search table and index the existing challenges."""
+    search.create_search_index(conn)
+    if search.uses_fts5(conn):
+        conn.execute(text(f"DELETE FROM {search.FTS_TABLE}"))
+    search.fill_search_index(conn)
+
+
+@migration(3)
+def add_catalogue_version(conn):
+    """Create the catalogue version counter used to invalidate cached responses."""
+    cache.create_version_table(conn)
+
+
+
+@migration(4)
+def extract_inline_images(conn):
+    """Move inline data: URI images into the asset store and keep only references."""
+    rows = conn.execute(text(
+        "SELECT id, image_1, image_2 FROM challenges "
+        "WHERE image_1 LIKE 'data:%' OR image_2 LIKE 'data:%'"
+    )).fetchall()
+    for row in rows:
+        values = {"id": row.id}
+        for column in ("image_1", "image_2"):
+            try:
+                values[column] = assets.externalize_image(getattr(row, column), conn)
+            except ValueError as e:
+                # Leave undecodable values alone rather than losing them
+                print(f"Challenge {row.id} {column}: {e}")
+                values[column] = getattr(row, column)
+        conn.execute(text("UPDATE challenges SET image_1 = :image_1, image_2 = :image_2 WHERE id = :id"), values)
+
+
+
+@migration(5)
+def index_completed_challenges(conn):
+    """
+    Index completed_challenges by (user_id, completed_at). Older databases
+    created the table with raw DDL, so create_all() did not add the index.
+    """
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_completed_challenges_user_completed_at "
+        "ON completed_challenges (user_id, completed_at)"
+    ))
+
+
+
+@migration(6)
+def normalize_pathway_membership(conn):
+    """
+    Move pathways.challenge_ids (comma-separated) into pathway_challenges with
+    positions, skipping ids that no longer exist, then drop the old column.
+    """
+    columns = {c["name"] for c in inspect(conn).get_columns("pathways")}
+    if "challenge_ids" not in columns:
+        return
+    known = {row.id for row in conn.execute(text("SELECT id FROM challenges"))}
+    members = []
+    for row in conn.execute(text("SELECT id, challenge_ids FROM pathways")).fetchall():
+        ids = []
+        for part in (row.challenge_ids or "").split(","):
+            part = part.strip()
+            if part.isdigit() and int(part) in known and int(part) not in ids:
+                ids.append(int(part))
+        members.extend({"pid": row.id, "cid": cid, "pos": pos} for pos, cid in enumerate(ids))
+    conn.execute(text("DELETE FROM pathway_challenges"))
+    if members:
+        conn.execute(text(
+            "INSERT INTO pathway_challenges (pathway_id, challenge_id, position) VALUES (:pid, :cid, :pos)"
+        ), members)
+    conn.execute(text("ALTER TABLE pathways DROP COLUMN challenge_ids"))
+
+
+@migration(7)
+def build_similarity_index(conn):
+    """Compute the initial "similar challenges" lists (see similarity.py)."""
+    similarity.fill_similarity_index(conn)
+
+
+@migration(8)
+def add_dataset_links(conn):
+    """dataset_links is created by create_all(); the links are filled by the first link check."""
+
+
+@migration(9)
+def add_change_feed(conn):
+    """
+    Add updated_at to challenges and pathways, and record every existing
+    object in catalogue_changes so the feed from since=0 is a full sync.
+    """
+    for table in ("challenges", "pathways"):
+        columns = {c["name"] for c in inspect(conn).get_columns(table)}
+        if "updated_at" not in columns:
+            # SQLite cannot add a column with a CURRENT_TIMESTAMP default, so backfill instead
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP"))
+        conn.execute(text(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL"))
+    conn.execute(text("DELETE FROM catalogue_changes"))
+    for kind, table in (("challenge", "challenges"), ("pathway", "pathways")):
+        conn.execute(text(
+            f"INSERT INTO catalogue_changes (kind, object_id, deleted) SELECT :kind, id, :deleted FROM {table} ORDER BY id"
+        ), {"kind": kind, "deleted": False})
+
+
+@migration(10)
+def add_completion_stats(conn):
+    """Fill challenge_stats, daily_activity and daily_learners from the existing completions."""
+    conn.execute(text("DELETE FROM challenge_stats"))
+    conn.execute(text(
+        "INSERT INTO challenge_stats (challenge_id, completions) "
+        "SELECT challenge_id, COUNT(*) FROM completed_challenges GROUP BY challenge_id"
+    ))
+    # Removed completions left no trace, so the backfilled days only count the ones still there
+    conn.execute(text("DELETE FROM daily_learners"))
+    conn.execute(text(
+        "INSERT INTO daily_learners (day, user_id) "
+        "SELECT DISTINCT date(completed_at), user_id FROM completed_challenges WHERE completed_at IS NOT NULL"
+    ))
+    conn.execute(text("DELETE FROM daily_activity"))
+    conn.execute(text(
+        "INSERT INTO daily_activity (day, completed, uncompleted, active_learners) "
+        "SELECT date(completed_at), COUNT(*), 0, COUNT(DISTINCT user_id) FROM completed_challenges "
+        "WHERE completed_at IS NOT NULL GROUP BY date(completed_at)"
+    ))
+
+
+@migration(11)
+def add_rendered_content(conn):
+    """rendered_content is created by create_all(); renderings are stored on first use."""
+
+
+@migration(12)
+def add_challenge_version(conn):
+    """Add the optimistic-concurrency version column to challenges."""
+    columns = {c["name"] for c in inspect(conn).get_columns("challenges")}
+    if "version" not in columns:
+        conn.execute(text("ALTER TABLE challenges ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+@migration(13)
+def render_stored_content(conn):
+    """Store the renderings of every existing challenge, now that reads no longer store them."""
+    render.render_all(conn)
+
+
+@migration(14)
+def add_job_leases(conn):
+    """job_leases is created by create_all(); leases are taken on demand."""
+
+
+if __name__ == "__main__":
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        applied = run_migrations()
+        if applied:
+            print(f"Applied migrations: {', '.join(str(v) for v in applied)}")
+        else:
+            print("Database schema is up to date.")
@@ -1,9 +1,32 @@
+import functools
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
+from flask import current_app, has_app_context
 from flask_login import UserMixin
+from sqlalchemy import event
 
 db = SQLAlchemy()
 
+
+def password_hash_method():
+    """
+    The werkzeug hashing method from PASSWORD_HASH_METHOD (e.g. "pbkdf2:sha256:260000"),
+    or None to use werkzeug's default.
+    """
+    if has_app_context():
+        return current_app.config.get("PASSWORD_HASH_METHOD")
+    return None
+
+@functools.lru_cache(maxsize=8)
+def hash_method_prefix(method):
+    """
+    The method part werkzeug stores for hashes made with method, with its
+    defaults filled in: "scrypt" is stored as "scrypt:32768:8:1" and
+    "pbkdf2:sha256" as "pbkdf2:sha256:600000". Hashes once per method.
+    """
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
+
 class User(UserMixin, db.Model):
 
     __tablename__ = "users"
@@ -14,22 +37,68 @@ class User(UserMixin, db.Model):
     user_type = db.Column(db.String(200),nullable=False,default="guest")
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        method = password_hash_method()
+        if method:
+            self.password_hash = generate_password_hash(password, method=method)
+        else:
+            self.password_hash = generate_password_hash(password)
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    def needs_rehash(self):
+        """True if the stored hash was made with a different method than PASSWORD_HASH_METHOD."""
+        method = password_hash_method()
+        return bool(method) and self.password_hash.split("$", 1)[0] != hash_method_prefix(method)
+
+
+class PathwayChallenge(db.Model):
+    """
+    Ordered membership of a challenge in a pathway.
+    Indexed both ways: (pathway_id, position) to list a pathway in order and
+    (challenge_id, pathway_id) to find the pathways containing a challenge.
+    """
+    __tablename__ = "pathway_challenges"
+
+    pathway_id = db.Column(db.Integer, db.ForeignKey("pathways.id", ondelete="CASCADE"), primary_key=True)
+    challenge_id = db.Column(db.Integer, db.ForeignKey("challenges.id", ondelete="CASCADE"), primary_key=True)
+    position = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_pathway_challenges_pathway_position", "pathway_id", "position"),
+        db.Index("ix_pathway_challenges_challenge", "challenge_id", "pathway_id"),
+    )
+
 
 class Pathway(db.Model):
     """
     SQLAlchemy model for a Learning Pathway.
-    Each pathway has a name and a list of challenge IDs (stored as a comma-separated string).
+    Each pathway has a name and an ordered list of challenges (pathway_challenges).
     """
     __tablename__ = "pathways"
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
-    challenge_ids = db.Column(db.String(500), nullable=False)  # Comma-separated list of challenge IDs
+    updated_at = db.Column(db.DateTime, nullable=True, server_default=db.func.current_timestamp(),
+                           onupdate=db.func.current_timestamp())
+    memberships = db.relationship(PathwayChallenge, order_by=PathwayChallenge.position,
+                                  cascade="all, delete-orphan")
+
+    @property
+    def challenge_ids(self):
+        """The pathway's challenge ids, in order."""
+        return [m.challenge_id for m in self.memberships]
+
+    @challenge_ids.setter
+    def challenge_ids(self, ids):
+        # Reuse existing rows so unchanged members keep their primary keys
+        existing = {m.challenge_id: m for m in self.memberships}
+        members = []
+        for position, cid in enumerate(ids):
+            member = existing.get(cid) or PathwayChallenge(challenge_id=cid)
+            member.position = position
+            members.append(member)
+        self.memberships = members
 
     def to_dict(self):
         """
@@ -38,11 +107,60 @@ class Pathway(db.Model):
         return {
             "id": self.id,
             "name": self.name,
-            "challengeIds": [int(cid) for cid in self.challenge_ids.split(",") if cid.strip()]
+            "challengeIds": self.challenge_ids
         }
 # backend/models.py
 
 
+class Asset(db.Model):
+    """
+    An image in the content-addressed asset store (see assets.py).
+    The bytes live on disk; the row records what is needed to serve them.
+    """
+    __tablename__ = "assets"
+
+    hash = db.Column(db.String(64), primary_key=True)  # SHA-256 of the content
+    content_type = db.Column(db.String(100), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.current_timestamp())
+
+
+def split_tags(value):
+    """
+    Split a comma-separated tag string (e.g. "sklearn, pandas") into unique,
+    lower-cased tag names in their original order.
+    """
+    if not value:
+        return []
+    return list(dict.fromkeys(t.strip().lower() for t in value.split(",") if t.strip()))
+
+
+class ChallengeTechnology(db.Model):
+    """
+    Normalized technology tag for a challenge, one row per (challenge, tag).
+    Built from Challenge.technology so filters can use an index instead of LIKE.
+    """
+    __tablename__ = "challenge_technologies"
+
+    challenge_id = db.Column(db.Integer, db.ForeignKey("challenges.id", ondelete="CASCADE"), primary_key=True)
+    name = db.Column(db.String(100), primary_key=True)
+
+    __table_args__ = (db.Index("ix_challenge_technologies_name", "name", "challenge_id"),)
+
+
+class ChallengeSubcategory(db.Model):
+    """
+    Normalized subcategory tag for a challenge, one row per (challenge, tag).
+    Built from Challenge.subcategory so filters can use an index instead of LIKE.
+    """
+    __tablename__ = "challenge_subcategories"
+
+    challenge_id = db.Column(db.Integer, db.ForeignKey("challenges.id", ondelete="CASCADE"), primary_key=True)
+    name = db.Column(db.String(100), primary_key=True)
+
+    __table_args__ = (db.Index("ix_challenge_subcategories_name", "name", "challenge_id"),)
+
+
 class Challenge(db.Model):
     """
     SQLAlchemy model for a Challenge.
@@ -53,7 +171,7 @@ class Challenge(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
-    difficulty = db.Column(db.String(50), nullable=False)
+    difficulty = db.Column(db.String(50), nullable=False, index=True)
     subcategory = db.Column(db.String(100), nullable=False)
     technology = db.Column(db.String(200), nullable=True)  
     dataset_url = db.Column(db.String(500), nullable=True)
@@ -64,11 +182,34 @@ class Challenge(db.Model):
     image_1 = db.Column(db.Text, nullable=True)
     image_2 = db.Column(db.Text, nullable=True)
     sample_sol = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True, server_default=db.func.current_timestamp(),
+                           onupdate=db.func.current_timestamp())
+    # Incremented by every update; the admin PATCH endpoints use it as the ETag
+    # and only write when the client's version is still current
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
 
-    def to_dict(self):
+    # Normalized copies of the comma-separated technology/subcategory columns,
+    # kept in sync by the attribute listeners below
+    technology_tags = db.relationship(ChallengeTechnology, cascade="all, delete-orphan")
+    subcategory_tags = db.relationship(ChallengeSubcategory, cascade="all, delete-orphan")
+
+    # Columns that may be requested through ?fields= on the list endpoint
+    FIELDS = (
+        "id", "title", "description", "difficulty", "subcategory", "technology",
+        "dataset_url", "dataset_description", "overview", "task", "outcomes",
+        "image_1", "image_2", "sample_sol",
+    )
+    # Lightweight projection used by the catalogue cards (?view=summary)
+    SUMMARY_FIELDS = ("id", "title", "description", "difficulty", "subcategory", "technology")
+
+    def to_dict(self, fields=None):
         """
         Serialize the Challenge object to a dictionary for API responses.
+        If fields is given, only those keys are included (avoids touching
+        deferred columns that were not loaded).
         """
+        if fields is not None:
+            return {f: getattr(self, f) for f in fields}
         return {
             "id": self.id,
             "title": self.title,
@@ -85,3 +226,158 @@ class Challenge(db.Model):
             "image_2" : self.image_2,
             "sample_sol" : self.sample_sol 
         }
+
+
+def _rebuild_tags(collection, tag_class, value):
+    """Return the tag rows for value, reusing rows that already exist so their keys are kept."""
+    existing = {t.name: t for t in collection}
+    return [existing.get(name) or tag_class(name=name) for name in split_tags(value)]
+
+
+@event.listens_for(Challenge.technology, "set")
+def _sync_technology_tags(target, value, oldvalue, initiator):
+    target.technology_tags = _rebuild_tags(target.technology_tags, ChallengeTechnology, value)
+
+
+@event.listens_for(Challenge.subcategory, "set")
+def _sync_subcategory_tags(target, value, oldvalue, initiator):
+    target.subcategory_tags = _rebuild_tags(target.subcategory_tags, ChallengeSubcategory, value)
+
+
+class CompletedChallenge(db.Model):
+    """
+    A challenge a user has marked as completed.
+    Indexed on (user_id, completed_at) for per-user history and progress queries.
+    """
+    __tablename__ = "completed_challenges"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    challenge_id = db.Column(db.Integer, db.ForeignKey("challenges.id", ondelete="CASCADE"), primary_key=True)
+    completed_at = db.Column(db.DateTime, server_default=db.func.current_timestamp())
+
+    __table_args__ = (db.Index("ix_completed_challenges_user_completed_at", "user_id", "completed_at"),)
+
+
+class ChallengeNeighbour(db.Model):
+    """
+    One entry of a challenge's precomputed top-k "similar challenges" list
+    (see similarity.py). rank 0 is the most similar.
+    """
+    __tablename__ = "challenge_neighbours"
+
+    challenge_id = db.Column(db.Integer, db.ForeignKey("challenges.id", ondelete="CASCADE"), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    neighbour_id = db.Column(db.Integer, db.ForeignKey("challenges.id", ondelete="CASCADE"), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+
+
+class DatasetLink(db.Model):
+    """
+    Result of the last health check of one dataset_url (see linkcheck.py).
+    Keyed by URL, as several challenges may share a dataset.
+    """
+    __tablename__ = "dataset_links"
+
+    url = db.Column(db.String(500), primary_key=True)
+    status = db.Column(db.String(20), nullable=False)  # ok, broken or error
+    http_status = db.Column(db.Integer, nullable=True)  # None when no response was received
+    size = db.Column(db.BigInteger, nullable=True)  # Content-Length, when the server sent one
+    latency_ms = db.Column(db.Float, nullable=True)
+    error = db.Column(db.String(200), nullable=True)
+    # Validators sent back as If-None-Match / If-Modified-Since on the next check
+    etag = db.Column(db.String(200), nullable=True)
+    last_modified = db.Column(db.String(100), nullable=True)
+    checked_at = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "http_status": self.http_status,
+            "size": self.size,
+            "latency_ms": self.latency_ms,
+            "error": self.error,
+            "checked_at": self.checked_at.isoformat() + "Z",
+        }
+
+
+class RenderedContent(db.Model):
+    """
+    HTML rendering of a challenge text column (see render.py), keyed by the
+    hash of the renderer version, column kind and source text.
+    """
+    __tablename__ = "rendered_content"
+
+    content_hash = db.Column(db.String(64), primary_key=True)
+    html = db.Column(db.Text, nullable=False)
+
+
+class CatalogueChange(db.Model):
+    """
+    The latest change to one challenge or pathway, for the delta-sync feed
+    (see changes.py). seq grows with every change and is never reused;
+    deleted rows are the tombstones of removed objects.
+    """
+    __tablename__ = "catalogue_changes"
+
+    seq = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # challenge or pathway
+    object_id = db.Column(db.Integer, nullable=False)
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
+    changed_at = db.Column(db.DateTime, nullable=False, server_default=db.func.current_timestamp())
+
+    __table_args__ = (
+        db.Index("ix_catalogue_changes_object", "kind", "object_id", unique=True),
+        # AUTOINCREMENT: a seq freed by replacing the newest change must not be handed out again
+        {"sqlite_autoincrement": True},
+    )
+
+
+class ChallengeStats(db.Model):
+    """
+    A challenge's current number of completions, kept up to date by the
+    completion handlers (see stats.py). Indexed for "most completed" lists.
+    """
+    __tablename__ = "challenge_stats"
+
+    challenge_id = db.Column(db.Integer, db.ForeignKey("challenges.id", ondelete="CASCADE"), primary_key=True)
+    completions = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.Index("ix_challenge_stats_completions", "completions", "challenge_id"),)
+
+
+class DailyActivity(db.Model):
+    """Completion activity of one UTC day (see stats.py)."""
+    __tablename__ = "daily_activity"
+
+    day = db.Column(db.Date, primary_key=True)
+    completed = db.Column(db.Integer, nullable=False, default=0)  # challenges marked completed
+    uncompleted = db.Column(db.Integer, nullable=False, default=0)  # completions removed
+    active_learners = db.Column(db.Integer, nullable=False, default=0)  # distinct users with activity
+
+    def to_dict(self):
+        return {
+            "day": self.day.isoformat(),
+            "completed": self.completed,
+            "uncompleted": self.uncompleted,
+            "active_learners": self.active_learners,
+        }
+
+
+class DailyLearner(db.Model):
+    """A user active on a day, so DailyActivity.active_learners counts each user once."""
+    __tablename__ = "daily_learners"
+
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+
+
+class JobLease(db.Model):
+    """
+    A time-limited claim on a background job, so one process at a time runs
+    it across gunicorn workers, replicas and cron (see linkcheck.py).
+    """
+    __tablename__ = "job_leases"
+
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(100), nullable=False)  # random id of the run holding it
+    expires_at = db.Column(db.DateTime, nullable=False)  # a crashed run frees the job after this
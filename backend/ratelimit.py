@@ -0,0 +1,232 @@
+# backend/ratelimit.py
+
+"""
+Per-client rate limiting and admission control.
+
+Rate limiting: every client (the logged-in user, otherwise the remote IP)
+has a token bucket holding up to RATE_LIMIT_CAPACITY tokens that refills at
+RATE_LIMIT_REFILL tokens per second. Each request spends its endpoint's cost
+(ENDPOINT_COSTS; password hashing and unfiltered catalogue dumps cost more)
+and gets a 429 with Retry-After when the bucket cannot pay. Buckets live in
+a pluggable store chosen by RATE_LIMIT_STORE:
+
+  - "off": no rate limiting, the default
+  - "memory": per process, for a single worker
+  - "sqlite": a small SQLite file (RATE_LIMIT_DB) shared by every gunicorn
+    worker on the host, so limits hold across workers
+
+Anonymous clients are keyed by IP, so only enable it where the backend sees
+real client addresses. In the docker-compose deployment every browser call
+is proxied by the Next.js server and server-side rendering calls the backend
+directly, so all visitors would share the frontend's bucket: enable it there
+only together with RATE_LIMIT_TRUST_PROXY=1 (Next.js forwards the browser's
+address in X-Forwarded-For) and the frontend's address in RATE_LIMIT_EXEMPT.
+
+Admission control: with MAX_CONCURRENT_REQUESTS > 0, a worker sheds requests
+beyond that many in flight with an immediate 503 + Retry-After, instead of
+letting every request slow down together.
+"""
+
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g, request
+from flask_login import current_user
+
+# Tokens spent per request, by endpoint; endpoints not listed cost DEFAULT_COST.
+# A callable receives the request args and returns the cost.
+DEFAULT_COST = 1
+ENDPOINT_COSTS = {
+    "auth.login": 10,
+    "auth.register": 10,
+    # The unfiltered, unpaginated list is the most expensive read
+    "challenges.get_challenges": lambda args: 5 if not args else 2,
+    "challenges.search": 2,
+    "admin.import_challenges": 10,
+    "admin.export_challenges": 10,
+    "admin.patch_challenges": 10,
+    # Never limited
+    "metrics.get_metrics": 0,
+    "health.health": 0,
+    "health.ready": 0,
+    "assets.get_asset": 0,
+    "static": 0,
+}
+# Endpoints answered even when the worker is saturated (monitoring and the host's liveness probe)
+ADMISSION_EXEMPT = {"metrics.get_metrics", "health.health"}
+# Seconds advertised in Retry-After when the server (not the client) is saturated
+OVERLOAD_RETRY_AFTER = 1
+
+
+def take(tokens, updated, now, cost, capacity, rate):
+    """
+    Refill a bucket to now and try to spend cost.
+    Returns (tokens left, allowed, seconds until cost is affordable).
+    """
+    if tokens is None:
+        tokens = capacity
+    else:
+        tokens = min(capacity, tokens + (now - updated) * rate)
+    cost = min(cost, capacity)
+    if tokens >= cost:
+        return tokens - cost, True, 0.0
+    return tokens, False, (cost - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Token buckets in this process, LRU-bounded to max_keys clients."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, cost, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (None, now))
+            tokens, allowed, retry_after = take(tokens, updated, now, cost, capacity, rate)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in an SQLite file, shared by all processes that open it.
+    Each update is a BEGIN IMMEDIATE read-modify-write, so concurrent workers
+    never lose a decrement.
+    """
+
+    # Roughly one call in this many also deletes buckets that have refilled completely
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Losing a few bucket updates on power failure is harmless
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key, cost, capacity, rate):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, allowed, retry_after = take(row[0] if row else None, row[1] if row else now,
+                                                now, cost, capacity, rate)
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            if random.randrange(self.PRUNE_EVERY) == 0:
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - capacity / rate,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, retry_after
+
+    def clear(self):
+        self._connection().execute("DELETE FROM buckets")
+
+
+def create_store(app):
+    """Build the bucket store named by RATE_LIMIT_STORE, or None when rate limiting is off."""
+    kind = app.config["RATE_LIMIT_STORE"]
+    if kind == "off":
+        return None
+    if kind == "memory":
+        return MemoryBucketStore()
+    if kind == "sqlite":
+        return SQLiteBucketStore(app.config["RATE_LIMIT_DB"] or os.path.join(app.instance_path, "ratelimit.db"))
+    raise ValueError(f"RATE_LIMIT_STORE must be memory, sqlite or off, not {kind!r}")
+
+
+def request_cost():
+    cost = ENDPOINT_COSTS.get(request.endpoint, DEFAULT_COST)
+    return cost(request.args) if callable(cost) else cost
+
+
+def client_key():
+    """Bucket key for the current request: the user when logged in, else the client IP."""
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    address = request.remote_addr
+    if current_app.config["RATE_LIMIT_TRUST_PROXY"]:
+        forwarded = request.headers.get("X-Forwarded-For", "")
+        address = forwarded.split(",")[0].strip() or address
+    return f"ip:{address}"
+
+
+def init_rate_limiting(app):
+    """Attach the bucket store and the admission limiter to the app and install the request hooks."""
+    # Off unless configured; see the module docstring before enabling it behind a proxy
+    app.config.setdefault("RATE_LIMIT_STORE", os.environ.get("RATE_LIMIT_STORE", "off"))
+    app.config.setdefault("RATE_LIMIT_DB", os.environ.get("RATE_LIMIT_DB"))
+    app.config.setdefault("RATE_LIMIT_CAPACITY", float(os.environ.get("RATE_LIMIT_CAPACITY", 60)))
+    app.config.setdefault("RATE_LIMIT_REFILL", float(os.environ.get("RATE_LIMIT_REFILL", 1)))
+    # Only enable behind a proxy that sets X-Forwarded-For; otherwise clients could pick their own key
+    app.config.setdefault("RATE_LIMIT_TRUST_PROXY", os.environ.get("RATE_LIMIT_TRUST_PROXY") == "1")
+    # Addresses never rate limited, e.g. the Next.js server rendering pages for many users
+    app.config.setdefault("RATE_LIMIT_EXEMPT", {a.strip() for a in os.environ.get("RATE_LIMIT_EXEMPT", "").split(",") if a.strip()})
+    app.config.setdefault("MAX_CONCURRENT_REQUESTS", int(os.environ.get("MAX_CONCURRENT_REQUESTS", 0)))
+    app.extensions["rate_limit_store"] = create_store(app)
+    limit = app.config["MAX_CONCURRENT_REQUESTS"]
+    app.extensions["admission_slots"] = threading.BoundedSemaphore(limit) if limit > 0 else None
+
+    @app.before_request
+    def admit_request():
+        slots = app.extensions["admission_slots"]
+        if slots is not None and request.endpoint not in ADMISSION_EXEMPT:
+            if not slots.acquire(blocking=False):
+                return {"error": "Server is busy, please retry"}, 503, {"Retry-After": str(OVERLOAD_RETRY_AFTER)}
+            g.admitted = True
+
+        store = app.extensions["rate_limit_store"]
+        if store is None or request.method == "OPTIONS" or request.remote_addr in app.config["RATE_LIMIT_EXEMPT"]:
+            return None
+        cost = request_cost()
+        if cost <= 0:
+            return None
+        try:
+            allowed, retry_after = store.consume(client_key(), cost, app.config["RATE_LIMIT_CAPACITY"],
+                                                 app.config["RATE_LIMIT_REFILL"])
+        except sqlite3.Error as e:
+            # Fail open: a broken limiter must not take the site down
+            print(f"Rate limiter error: {str(e)}")
+            return None
+        if not allowed:
+            return {"error": "Too many requests"}, 429, {"Retry-After": str(max(1, math.ceil(retry_after)))}
+        return None
+
+    @app.teardown_request
+    def release_admission(exc):
+        if g.pop("admitted", False):
+            app.extensions["admission_slots"].release()
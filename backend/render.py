@@ -0,0 +1,283 @@
+# backend/render.py
+
+"""
+Server-side rendering of challenge content to sanitized HTML.
+
+overview, task and outcomes are rendered as a small Markdown subset
+(paragraphs with hard line breaks, # headings, - / 1. lists, ``` fenced
+code, `code`, **bold**, *italic*, [links](https://...) and bare URLs), and
+sample_sol as a link when it is a URL, else as Python code. Fenced code is
+syntax-highlighted with Pygments when it is installed (plain <pre><code>
+otherwise). The HTML is built from escaped text, so it is safe by
+construction: no raw HTML from the source survives, and links are limited
+to http(s) and mailto.
+
+Rendered HTML is stored in the rendered_content table keyed by the SHA-256
+of (RENDERER_VERSION, field kind, source text), so identical text is
+rendered once however many challenges use it, and bumping RENDERER_VERSION
+invalidates every stored rendering. The admin update handler re-renders the
+fields it changed and drops the entries of replaced text that no other
+challenge still uses (likewise on delete); create, import and PATCH store
+the renderings of the text they write. GET /api/challenges/<id>?render=html
+only reads: anything still missing is rendered for that response alone.
+render_all() (run by a migration) fills in every challenge and removes
+entries that no text produces any more.
+"""
+
+import hashlib
+import re
+from markupsafe import escape
+from sqlalchemy import or_, select
+from models import db, Challenge, RenderedContent
+from dbconfig import insert_ignore
+
+# Bump when the rendered output changes, so stored renderings are not reused
+# (together with a migration that calls render_all())
+RENDERER_VERSION = 1
+# Challenge columns rendered by ?render=html
+RENDERED_FIELDS = ("overview", "task", "outcomes", "sample_sol")
+# Language of sample_sol when it is code rather than a link
+SOLUTION_LANGUAGE = "python"
+
+_FENCE = re.compile(r"^(`{3,}|~{3,})\s*([\w+-]*)\s*$")
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_LIST_ITEM = re.compile(r"^\s*(?:([-*+])|(\d{1,9})[.)])\s+(.*)$")
+_INLINE = re.compile(
+    r"`(?P<code>[^`]+)`"
+    r"|\[(?P<text>[^\]]+)\]\((?P<href>(?:[^()\s]|\([^()\s]*\))+)\)"
+    r"|\*\*(?P<bold>[^*]+?)\*\*"
+    r"|(?<![\w*])\*(?P<em>[^*\s](?:[^*]*[^*\s])?)\*(?![\w*])"
+    r"|(?P<url>https?://[^\s<>()\[\]]+[^\s<>()\[\].,;:!?'\"])"
+)
+_SAFE_HREF = re.compile(r"^(https?://|mailto:)", re.I)
+
+
+def content_hash(field, text):
+    """Storage key of the rendering of text in the given column."""
+    kind = "solution" if field == "sample_sol" else "markdown"
+    return hashlib.sha256(f"{RENDERER_VERSION}:{kind}:{text}".encode()).hexdigest()
+
+
+def render_field(field, text):
+    """Render one column's text to HTML."""
+    if field != "sample_sol":
+        return render_markdown(text)
+    value = text.strip()
+    if _SAFE_HREF.match(value) and not any(ch.isspace() for ch in value):
+        return f'<a href="{escape(value)}" rel="noopener noreferrer" target="_blank">{escape(value)}</a>'
+    return highlight_code(text, SOLUTION_LANGUAGE)
+
+
+def render_inline(text):
+    """Escape text and apply the inline Markdown markup."""
+    out = []
+    pos = 0
+    for m in _INLINE.finditer(text):
+        out.append(str(escape(text[pos:m.start()])))
+        pos = m.end()
+        if m.group("code") is not None:
+            out.append(f"<code>{escape(m.group('code'))}</code>")
+        elif m.group("href") is not None:
+            href = m.group("href")
+            if _SAFE_HREF.match(href):
+                out.append(f'<a href="{escape(href)}" rel="noopener noreferrer">{render_inline(m.group("text"))}</a>')
+            else:
+                out.append(render_inline(m.group("text")))
+        elif m.group("bold") is not None:
+            out.append(f"<strong>{render_inline(m.group('bold'))}</strong>")
+        elif m.group("em") is not None:
+            out.append(f"<em>{render_inline(m.group('em'))}</em>")
+        else:
+            url = escape(m.group("url"))
+            out.append(f'<a href="{url}" rel="noopener noreferrer">{url}</a>')
+    out.append(str(escape(text[pos:])))
+    return "".join(out)
+
+
+def render_markdown(text):
+    """Render the Markdown subset described in the module docstring."""
+    html = []
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    block = []
+
+    def flush():
+        if block:
+            html.append(_render_block(block))
+            block.clear()
+
+    i = 0
+    while i < len(lines):
+        fence = _FENCE.match(lines[i])
+        if fence:
+            flush()
+            end = i + 1
+            while end < len(lines) and not lines[end].startswith(fence.group(1)):
+                end += 1
+            html.append(highlight_code("\n".join(lines[i + 1:end]), fence.group(2)))
+            i = end + 1
+        elif not lines[i].strip():
+            flush()
+            i += 1
+        elif _HEADING.match(lines[i]):
+            flush()
+            heading = _HEADING.match(lines[i])
+            level = len(heading.group(1))
+            html.append(f"<h{level}>{render_inline(heading.group(2))}</h{level}>")
+            i += 1
+        else:
+            block.append(lines[i])
+            i += 1
+    flush()
+    return "\n".join(html)
+
+
+def _render_block(lines):
+    items = [_LIST_ITEM.match(line) for line in lines]
+    if items[0] and len({m.group(2) is None for m in items if m}) == 1:
+        # A list (all bullets or all numbers); lines that are not items continue the previous item
+        tag = "ol" if items[0].group(2) is not None else "ul"
+        entries = []
+        for line, m in zip(lines, items):
+            if m:
+                entries.append([m.group(3)])
+            else:
+                entries[-1].append(line.strip())
+        body = "".join(f"<li>{'<br>'.join(render_inline(part) for part in entry)}</li>" for entry in entries)
+        return f"<{tag}>{body}</{tag}>"
+    return "<p>" + "<br>\n".join(render_inline(line.strip()) for line in lines) + "</p>"
+
+
+def _pygments():
+    """
+    (highlight, get_lexer_by_name, HtmlFormatter, ClassNotFound), or None when
+    Pygments is not installed. Imported on first use to keep it off startup.
+    """
+    try:
+        from pygments import highlight
+        from pygments.formatters import HtmlFormatter
+        from pygments.lexers import get_lexer_by_name
+        from pygments.util import ClassNotFound
+    except ImportError:  # Pygments is optional; code is shown unhighlighted
+        return None
+    return highlight, get_lexer_by_name, HtmlFormatter, ClassNotFound
+
+
+def highlight_code(code, language=None):
+    """A code block, highlighted when Pygments knows the language."""
+    pygments = _pygments()
+    if pygments is not None and language:
+        highlight, get_lexer_by_name, HtmlFormatter, ClassNotFound = pygments
+        try:
+            lexer = get_lexer_by_name(language)
+        except ClassNotFound:
+            lexer = None
+        if lexer is not None:
+            return highlight(code, lexer, HtmlFormatter(cssclass="highlight")).rstrip("\n")
+    return f"<pre><code>{escape(code)}</code></pre>"
+
+
+def content_sources(challenge):
+    """
+    [(column, text)] for the non-empty rendered columns of a challenge, given
+    as a model object or a dict of columns.
+    """
+    get = challenge.get if isinstance(challenge, dict) else lambda field: getattr(challenge, field)
+    return [(field, get(field)) for field in RENDERED_FIELDS if get(field)]
+
+
+def content_hashes(challenge):
+    """{column: content hash} for the challenge's non-empty rendered columns."""
+    return {field: content_hash(field, text) for field, text in content_sources(challenge)}
+
+
+def rendered_html(challenge):
+    """
+    {column: HTML} for every rendered column (None when empty), from the
+    stored renderings. Read-only: a column with no stored rendering yet (e.g.
+    after a RENDERER_VERSION bump, until render_all() runs) is rendered for
+    this response without being stored.
+    """
+    hashes = content_hashes(challenge)
+    stored = dict(db.session.query(RenderedContent.content_hash, RenderedContent.html)
+                  .filter(RenderedContent.content_hash.in_(list(hashes.values())))) if hashes else {}
+    return {field: stored.get(hashes[field]) or render_field(field, getattr(challenge, field))
+            if field in hashes else None for field in RENDERED_FIELDS}
+
+
+def store_rendered(challenges, conn=None):
+    """
+    Render and store whatever the given challenges (model objects or dicts of
+    columns) have no stored rendering for. Called by every write path, so
+    detail views never render on the read path. conn defaults to the current session.
+    """
+    executor = conn if conn is not None else db.session
+    sources = {content_hash(field, text): (field, text)
+               for challenge in challenges for field, text in content_sources(challenge)}
+    if not sources:
+        return
+    table = RenderedContent.__table__
+    stored = set(executor.execute(select(table.c.content_hash)
+                                  .where(table.c.content_hash.in_(list(sources)))).scalars())
+    missing = [{"content_hash": key, "html": render_field(field, text)}
+               for key, (field, text) in sources.items() if key not in stored]
+    if missing:
+        bind = conn if conn is not None else db.session.get_bind()
+        executor.execute(insert_ignore(table, bind), missing)
+
+
+def drop_unused(sources):
+    """
+    Delete the stored renderings of sources ([(column, text)], from
+    content_sources()) that no challenge renders any more, on the current
+    session. Renderings are shared by every challenge with the same text,
+    so only those of text no longer in any challenge are dropped.
+    """
+    sources = list(sources)
+    if not sources:
+        return
+    candidates = {content_hash(field, text) for field, text in sources}
+    solutions = [text for field, text in sources if field == "sample_sol"]
+    markdown = [text for field, text in sources if field != "sample_sol"]
+    columns = [getattr(Challenge, field) for field in RENDERED_FIELDS]
+    used = set()
+    # Sees the caller's pending changes (autoflush), so the written challenge counts with its new text
+    for row in db.session.query(*columns).filter(or_(*(
+            column.in_(solutions if column.key == "sample_sol" else markdown) for column in columns))):
+        used.update(content_hash(field, text) for field, text in zip(RENDERED_FIELDS, row) if text)
+    hashes = list(candidates - used)
+    if hashes:
+        RenderedContent.query.filter(RenderedContent.content_hash.in_(hashes)).delete(synchronize_session=False)
+
+
+def refresh_rendered(challenge, previous_sources):
+    """
+    After an update: drop the renderings of replaced text (previous_sources,
+    from content_sources() before the change) that nothing else uses and
+    store the renderings of the new text.
+    """
+    current = set(content_sources(challenge))
+    drop_unused(source for source in previous_sources if source not in current)
+    store_rendered([challenge])
+
+
+def render_all(conn, batch_size=500):
+    """
+    Store the renderings of every challenge and delete those no challenge
+    uses any more (e.g. text replaced by a PATCH or an import). Run from a
+    migration whenever RENDERER_VERSION is bumped.
+    """
+    table = Challenge.__table__
+    columns = [table.c.id] + [table.c[field] for field in RENDERED_FIELDS]
+    used, last_id = set(), 0
+    while True:
+        rows = [dict(r) for r in conn.execute(select(*columns).where(table.c.id > last_id)
+                                              .order_by(table.c.id).limit(batch_size)).mappings()]
+        if not rows:
+            break
+        store_rendered(rows, conn)
+        used.update(key for row in rows for key in content_hashes(row).values())
+        last_id = rows[-1]["id"]
+    rendered = RenderedContent.__table__
+    unused = [key for key in conn.execute(select(rendered.c.content_hash)).scalars() if key not in used]
+    for start in range(0, len(unused), batch_size):
+        conn.execute(rendered.delete().where(rendered.c.content_hash.in_(unused[start:start + batch_size])))
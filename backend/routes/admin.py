@@ -1,6 +1,21 @@
-from flask import Blueprint, request, jsonify
+import io
+import re
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_login import login_required, current_user
-from models import db, Challenge
+import datetime
+from models import db, Challenge, ChallengeStats, CompletedChallenge, DailyActivity, DatasetLink, Pathway, PathwayChallenge
+from sqlalchemy import func, update
+from sqlalchemy.orm import selectinload
+import search
+import assets
+import catalogue_io
+import similarity
+import stats
+import render
+from cache import bump_catalogue_version
+from similarity import schedule_similarity_rebuild
+from changes import record_changes, touch_pathways
+from routes.challenges import parse_positive_int
 
 bp = Blueprint("admin", __name__)
 
@@ -20,10 +35,12 @@ def admin_required(func):
 @admin_required
 def get_all_challenges_admin():
     """
-    Admin endpoint to get all challenges with full details
+    Admin endpoint to get all challenges with full details, plus the result
+    of the last dataset link check as link_status (None until checked)
     """
-    challenges = Challenge.query.all()
-    return jsonify([c.to_dict() for c in challenges])
+    rows = db.session.query(Challenge, DatasetLink).outerjoin(DatasetLink, DatasetLink.url == Challenge.dataset_url)
+    return jsonify([{**c.to_dict(), "version": c.version, "link_status": link.to_dict() if link else None}
+                    for c, link in rows])
 
 # Create a new challenge
 @bp.route("/challenges", methods=["POST"])
@@ -40,6 +57,13 @@ def create_challenge():
         if field not in data or not data[field]:
             return {"error": f"Missing required field: {field}"}, 400
     
+    # Move inline (data:) images into the asset store
+    try:
+        image_1 = assets.externalize_image(data.get("image_1"))
+        image_2 = assets.externalize_image(data.get("image_2"))
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
     # Create new challenge
     challenge = Challenge(
         title=data["title"],
@@ -52,29 +76,83 @@ def create_challenge():
         overview=data.get("overview"),
         task=data.get("task"),
         outcomes=data.get("outcomes"),
-        image_1=data.get("image_1"),
-        image_2=data.get("image_2"),
+        image_1=image_1,
+        image_2=image_2,
         sample_sol=data.get("sample_sol")
     )
     
     try:
         db.session.add(challenge)
+        db.session.flush()  # assigns challenge.id for the search index
+        search.index_challenge(challenge)
+        render.store_rendered([challenge])
+        record_changes("challenge", [challenge.id])
+        bump_catalogue_version()
         db.session.commit()
+        schedule_similarity_rebuild()
         return jsonify(challenge.to_dict()), 201
     except Exception as e:
         db.session.rollback()
         print(f"Error creating challenge: {str(e)}")
         return {"error": "Failed to create challenge"}, 500
 
+def version_etag(version):
+    """ETag of a challenge version, as sent and expected by PUT and PATCH."""
+    return f'"v{version}"'
+
+_VERSION_ETAG = re.compile(r'^v(\d+)$')
+
+def if_match_version():
+    """
+    The challenge version named by the If-Match header. Returns (version,
+    error_response); version is None for "*" (any version).
+    """
+    if request.if_match.star_tag:
+        return None, None
+    versions = [int(m.group(1)) for m in map(_VERSION_ETAG.match, request.if_match.as_set()) if m]
+    if len(versions) != 1:
+        return None, ({"error": "If-Match must hold one challenge ETag"}, 400)
+    return versions[0], None
+
+# Get one challenge (admin view)
+@bp.route("/challenges/<int:id>", methods=["GET"])
+@admin_required
+def get_challenge_admin(id):
+    """
+    Admin endpoint returning a challenge with its version, also sent as the
+    ETag to pass back in If-Match when saving it.
+    """
+    challenge = Challenge.query.get_or_404(id)
+    response = jsonify({**challenge.to_dict(), "version": challenge.version})
+    response.headers["ETag"] = version_etag(challenge.version)
+    return response
+
 # Update a challenge
 @bp.route("/challenges/<int:id>", methods=["PUT"])
 @admin_required
 def update_challenge(id):
     """
-    Admin endpoint to update an existing challenge
+    Admin endpoint to update an existing challenge. With If-Match (the ETag
+    from GET /api/admin/challenges/<id>), returns 412 instead of overwriting
+    a challenge that changed since that version.
     """
     challenge = Challenge.query.get_or_404(id)
     data = request.json
+    expected, error = if_match_version() if request.if_match else (None, None)
+    if error:
+        return error
+    if expected is not None:
+        # Claim the version first: a concurrent writer holding the same version now matches no row
+        table = Challenge.__table__
+        claimed = db.session.execute(update(table).where(table.c.id == id, table.c.version == expected)
+                                     .values(version=table.c.version + 1)).rowcount
+        if not claimed:
+            db.session.rollback()
+            current = db.session.query(Challenge.version).filter(Challenge.id == id).scalar()
+            return ({"error": "Challenge was modified since it was loaded; reload and retry"}, 412,
+                    {"ETag": version_etag(current)})
+        db.session.refresh(challenge, ["version"])
+    rendered_sources = render.content_sources(challenge)
     
     # Update fields
     if "title" in data:
@@ -97,21 +175,145 @@ def update_challenge(id):
         challenge.task = data["task"]
     if "outcomes" in data:
         challenge.outcomes = data["outcomes"]
-    if "image_1" in data:
-        challenge.image_1 = data["image_1"]
-    if "image_2" in data:
-        challenge.image_2 = data["image_2"]
+    try:
+        if "image_1" in data:
+            challenge.image_1 = assets.externalize_image(data["image_1"])
+        if "image_2" in data:
+            challenge.image_2 = assets.externalize_image(data["image_2"])
+    except ValueError as e:
+        db.session.rollback()
+        return {"error": str(e)}, 400
     if "sample_sol" in data:
         challenge.sample_sol = data["sample_sol"]
     
+    if expected is None:
+        challenge.version = Challenge.version + 1
+    
     try:
+        search.index_challenge(challenge)
+        # Re-render changed text now rather than on the next detail view
+        render.refresh_rendered(challenge, rendered_sources)
+        record_changes("challenge", [challenge.id])
+        bump_catalogue_version()
         db.session.commit()
-        return jsonify(challenge.to_dict())
+        schedule_similarity_rebuild()
+        response = jsonify(challenge.to_dict())
+        response.headers["ETag"] = version_etag(challenge.version)
+        return response
     except Exception as e:
         db.session.rollback()
         print(f"Error updating challenge: {str(e)}")
         return {"error": "Failed to update challenge"}, 500
 
+def parse_patch(data):
+    """
+    Validate one PATCH body (challenge columns only; "id" and "version" are
+    handled by the caller). Returns (values, error_response).
+    """
+    if not isinstance(data, dict):
+        return None, ({"error": "Patch must be a JSON object"}, 400)
+    unknown = sorted(set(data) - set(catalogue_io.IMPORT_FIELDS))
+    if unknown:
+        return None, ({"error": "Unknown or read-only fields", "fields": unknown}, 400)
+    if not data:
+        return None, ({"error": "No fields to update"}, 400)
+    values, error = catalogue_io.validate_row(data, partial=True)
+    if error:
+        return None, ({"error": error}, 400)
+    return values, None
+
+def apply_patches(patches):
+    """
+    Apply validated [(id, version, values)] in one transaction.
+    Returns (changed, error_response): changed lists each challenge's new
+    version and changed fields; error_response is 412 with the conflicts.
+    """
+    try:
+        conflicts = catalogue_io.apply_patches(patches)
+        if conflicts:
+            return None, ({"error": "Challenge was modified or deleted; reload and retry",
+                           "conflicts": conflicts}, 412)
+        bump_catalogue_version()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error patching challenges: {str(e)}")
+        return None, ({"error": "Failed to update challenges"}, 500)
+    schedule_similarity_rebuild()
+    return [{"id": cid, "version": version + 1, **catalogue_io.column_values(values)}
+            for cid, version, values in patches], None
+
+# Update some fields of a challenge
+@bp.route("/challenges/<int:id>", methods=["PATCH"])
+@admin_required
+def patch_challenge(id):
+    """
+    Admin endpoint to update only the given fields of a challenge, with a
+    single UPDATE. Requires If-Match with the challenge's ETag ("v<version>",
+    from the admin list's version or a previous write; "*" for any version).
+    Returns the changed fields and the new version (also as the ETag), 412 when
+    the challenge changed since that version, 428 without If-Match.
+    """
+    if not request.if_match:
+        return {"error": "If-Match header required"}, 428
+    version, error = if_match_version()
+    if error:
+        return error
+    if version is None:
+        version = db.session.query(Challenge.version).filter(Challenge.id == id).scalar()
+        if version is None:
+            return {"error": "Challenge not found"}, 404
+    values, error = parse_patch(request.get_json(silent=True))
+    if error:
+        return error
+    changed, error = apply_patches([(id, version, values)])
+    if error:
+        body, status = error
+        if status != 412:
+            return error
+        current = body["conflicts"][0]["version"]
+        if current is None:
+            return {"error": "Challenge not found"}, 404
+        return body, 412, {"ETag": version_etag(current)}
+    response = jsonify(changed[0])
+    response.headers["ETag"] = version_etag(changed[0]["version"])
+    return response
+
+# Update some fields of many challenges
+@bp.route("/challenges", methods=["PATCH"])
+@admin_required
+def patch_challenges():
+    """
+    Admin endpoint to update many challenges in one transaction. The body is
+    a list of {"id", "version", <fields>}; every challenge is updated only
+    if it is still at that version, else nothing is written and the response
+    is 412 with the conflicting ids and their current versions (None when
+    deleted). Returns {"challenges": [{"id", "version", <changed fields>}]}.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, list) or not data:
+        return {"error": "Body must be a non-empty list of patches"}, 400
+    if len(data) > catalogue_io.MAX_PATCH_BATCH:
+        return {"error": f"At most {catalogue_io.MAX_PATCH_BATCH} challenges per request"}, 400
+    patches = []
+    for item in data:
+        if not isinstance(item, dict):
+            return {"error": "Each patch must be a JSON object"}, 400
+        item = dict(item)
+        cid, version = item.pop("id", None), item.pop("version", None)
+        if not all(isinstance(v, int) and not isinstance(v, bool) for v in (cid, version)):
+            return {"error": "Each patch needs an integer id and version"}, 400
+        values, error = parse_patch(item)
+        if error:
+            return ({**error[0], "id": cid}, error[1])
+        patches.append((cid, version, values))
+    if len({cid for cid, _, _ in patches}) != len(patches):
+        return {"error": "Each challenge may appear only once"}, 400
+    changed, error = apply_patches(patches)
+    if error:
+        return error
+    return jsonify({"challenges": changed})
+
 # Delete a challenge
 @bp.route("/challenges/<int:id>", methods=["DELETE"])
 @admin_required
@@ -122,10 +324,259 @@ def delete_challenge(id):
     challenge = Challenge.query.get_or_404(id)
     
     try:
+        # Read before the delete is flushed: the ON DELETE CASCADE removes the memberships
+        pathway_ids = [row[0] for row in db.session.query(PathwayChallenge.pathway_id).filter_by(challenge_id=id)]
         db.session.delete(challenge)
+        # Clear completions and pathway memberships explicitly too, for
+        # SQLite databases opened without PRAGMA foreign_keys
+        CompletedChallenge.query.filter_by(challenge_id=id).delete(synchronize_session=False)
+        PathwayChallenge.query.filter_by(challenge_id=id).delete(synchronize_session=False)
+        search.remove_challenge(id)
+        similarity.remove_challenge(id)
+        stats.remove_challenge(id)
+        render.drop_unused(render.content_sources(challenge))
+        # The challenge leaves a tombstone in the change feed; its pathways changed too
+        record_changes("challenge", [id], deleted=True)
+        touch_pathways(pathway_ids)
+        bump_catalogue_version()
         db.session.commit()
+        schedule_similarity_rebuild()
         return {"message": f"Challenge {id} deleted successfully"}
     except Exception as e:
         db.session.rollback()
         print(f"Error deleting challenge: {str(e)}")
         return {"error": "Failed to delete challenge"}, 500
+
+# Upload an image to the asset store
+@bp.route("/assets", methods=["POST"])
+@admin_required
+def upload_asset():
+    """
+    Admin endpoint to upload an image (multipart field "file").
+    Returns {hash, url}; the url can be used as image_1 / image_2.
+    """
+    upload = request.files.get("file")
+    if upload is None or not (upload.mimetype or "").startswith("image/"):
+        return {"error": "Missing image file: file"}, 400
+    try:
+        asset_hash = assets.store_asset(upload.read(), upload.mimetype)
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return {"error": str(e)}, 400
+    return {"hash": asset_hash, "url": assets.ASSET_URL_PREFIX + asset_hash}, 201
+
+# Bulk import challenges
+@bp.route("/challenges/import", methods=["POST"])
+@admin_required
+def import_challenges():
+    """
+    Admin endpoint to upsert challenges from a streamed CSV or NDJSON body, matched on title.
+
+    Query parameters:
+      - format: "csv" (default) or "ndjson"
+      - dry_run: "1" to report the diff without writing anything
+      - batch_size: rows per transaction (default catalogue_io.DEFAULT_BATCH_SIZE)
+    """
+    fmt = request.args.get("format", "csv")
+    if fmt not in catalogue_io.FORMATS:
+        return {"error": f"format must be one of: {', '.join(catalogue_io.FORMATS)}"}, 400
+    dry_run = request.args.get("dry_run") in ("1", "true")
+    try:
+        batch_size = int(request.args.get("batch_size", catalogue_io.DEFAULT_BATCH_SIZE))
+    except ValueError:
+        return {"error": "batch_size must be an integer"}, 400
+    if not 1 <= batch_size <= 5000:
+        return {"error": "batch_size must be between 1 and 5000"}, 400
+
+    stream = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+    try:
+        report = catalogue_io.import_challenges(stream, fmt, dry_run=dry_run, batch_size=batch_size)
+    except UnicodeDecodeError:
+        return {"error": "Import must be UTF-8 encoded"}, 400
+    except Exception as e:
+        print(f"Error importing challenges: {str(e)}")
+        return {"error": "Failed to import challenges"}, 500
+    if not dry_run and (report.counts["inserted"] or report.counts["updated"]):
+        schedule_similarity_rebuild()
+    return jsonify(report.to_dict())
+
+# Bulk export challenges
+@bp.route("/challenges/export", methods=["GET"])
+@admin_required
+def export_challenges():
+    """
+    Admin endpoint to stream the whole catalogue as CSV or NDJSON (?format=, default ndjson).
+    """
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in catalogue_io.FORMATS:
+        return {"error": f"format must be one of: {', '.join(catalogue_io.FORMATS)}"}, 400
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(
+        stream_with_context(catalogue_io.export_challenges(fmt)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=challenges.{fmt}"},
+    )
+
+def parse_pathway_challenge_ids(data):
+    """
+    Validate the "challengeIds" list of a pathway body: unique integer ids that all exist.
+    Returns (ids, error_response); error_response is None when valid.
+    """
+    ids = data.get("challengeIds")
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return None, ({"error": "challengeIds must be a list of challenge ids"}, 400)
+    if len(set(ids)) != len(ids):
+        return None, ({"error": "challengeIds must not contain duplicates"}, 400)
+    known = {row[0] for row in db.session.query(Challenge.id).filter(Challenge.id.in_(ids))} if ids else set()
+    missing = [i for i in ids if i not in known]
+    if missing:
+        return None, ({"error": "Unknown challenge ids", "missing": missing}, 400)
+    return ids, None
+
+# Dataset link health
+@bp.route("/links", methods=["GET"])
+@admin_required
+def get_dataset_links():
+    """
+    Admin endpoint listing the last check of every dataset URL.
+    Optional ?status=ok|broken|error filter.
+    """
+    query = DatasetLink.query.order_by(DatasetLink.url)
+    if request.args.get("status"):
+        query = query.filter(DatasetLink.status == request.args["status"])
+    checker = current_app.extensions["linkcheck"]
+    return jsonify({
+        "running": checker.running,
+        "links": [{"url": link.url, **link.to_dict()} for link in query],
+    })
+
+@bp.route("/links/check", methods=["POST"])
+@admin_required
+def check_dataset_links():
+    """
+    Admin endpoint to start a dataset link check in the background.
+    Returns 202, or 409 when a check is already running.
+    """
+    if not current_app.extensions["linkcheck"].start():
+        return {"error": "A link check is already running"}, 409
+    return {"status": "started"}, 202
+
+# Completion statistics
+STATS_DEFAULT_DAYS = 30
+STATS_MAX_DAYS = 365
+
+@bp.route("/stats", methods=["GET"])
+@admin_required
+def get_stats():
+    """
+    Admin endpoint with completion statistics, read from the aggregate tables
+    (see stats.py): total completions, per-day activity for the last ?days=
+    (default 30, max 365) days, newest first, the ten most completed
+    challenges and the completions of each pathway's challenges.
+    """
+    try:
+        days = parse_positive_int(request.args, "days", STATS_MAX_DAYS) or STATS_DEFAULT_DAYS
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    since = stats.today() - datetime.timedelta(days=days - 1)
+    activity = DailyActivity.query.filter(DailyActivity.day >= since).order_by(DailyActivity.day.desc())
+    pathways = (db.session.query(Pathway.id, Pathway.name, func.coalesce(func.sum(ChallengeStats.completions), 0))
+                .outerjoin(PathwayChallenge, PathwayChallenge.pathway_id == Pathway.id)
+                .outerjoin(ChallengeStats, ChallengeStats.challenge_id == PathwayChallenge.challenge_id)
+                .group_by(Pathway.id, Pathway.name).order_by(Pathway.id))
+    return jsonify({
+        "total_completions": db.session.query(func.coalesce(func.sum(ChallengeStats.completions), 0)).scalar(),
+        "days": [day.to_dict() for day in activity],
+        "popular": [{"id": c.id, "title": c.title, "completions": completions}
+                    for c, completions in stats.popular_challenges(10)],
+        "pathways": [{"id": pid, "name": name, "completions": completions} for pid, name, completions in pathways],
+    })
+
+# Get all pathways (admin view)
+@bp.route("/pathways", methods=["GET"])
+@admin_required
+def get_all_pathways_admin():
+    """
+    Admin endpoint to list all pathways with their ordered challenge ids
+    """
+    pathways = Pathway.query.options(selectinload(Pathway.memberships)).order_by(Pathway.id).all()
+    return jsonify([p.to_dict() for p in pathways])
+
+# Create a new pathway
+@bp.route("/pathways", methods=["POST"])
+@admin_required
+def create_pathway():
+    """
+    Admin endpoint to create a pathway. Body: {"name": ..., "challengeIds": [...]}
+    """
+    data = request.json or {}
+    if not data.get("name"):
+        return {"error": "Missing required field: name"}, 400
+    ids, error = parse_pathway_challenge_ids(data)
+    if error:
+        return error
+
+    pathway = Pathway(name=data["name"], challenge_ids=ids)
+    try:
+        db.session.add(pathway)
+        db.session.flush()
+        record_changes("pathway", [pathway.id])
+        bump_catalogue_version()
+        db.session.commit()
+        return jsonify(pathway.to_dict()), 201
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating pathway: {str(e)}")
+        return {"error": "Failed to create pathway"}, 500
+
+# Update a pathway
+@bp.route("/pathways/<int:id>", methods=["PUT"])
+@admin_required
+def update_pathway(id):
+    """
+    Admin endpoint to rename a pathway and/or replace its ordered challenge list
+    """
+    pathway = Pathway.query.get_or_404(id)
+    data = request.json or {}
+    if "name" in data:
+        if not data["name"]:
+            return {"error": "name must not be empty"}, 400
+        pathway.name = data["name"]
+    if "challengeIds" in data:
+        ids, error = parse_pathway_challenge_ids(data)
+        if error:
+            db.session.rollback()
+            return error
+        pathway.challenge_ids = ids
+
+    try:
+        # Set explicitly: a membership-only change does not UPDATE the pathway row
+        pathway.updated_at = db.func.current_timestamp()
+        record_changes("pathway", [pathway.id])
+        bump_catalogue_version()
+        db.session.commit()
+        return jsonify(pathway.to_dict())
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error updating pathway: {str(e)}")
+        return {"error": "Failed to update pathway"}, 500
+
+# Delete a pathway
+@bp.route("/pathways/<int:id>", methods=["DELETE"])
+@admin_required
+def delete_pathway(id):
+    """
+    Admin endpoint to delete a pathway (its memberships go with it)
+    """
+    pathway = Pathway.query.get_or_404(id)
+    try:
+        db.session.delete(pathway)
+        record_changes("pathway", [id], deleted=True)
+        bump_catalogue_version()
+        db.session.commit()
+        return {"message": f"Pathway {id} deleted successfully"}
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error deleting pathway: {str(e)}")
+        return {"error": "Failed to delete pathway"}, 500
@@ -0,0 +1,42 @@
+from flask import Blueprint, request, send_file
+from models import db, Asset
+import os
+import assets
+
+bp = Blueprint("assets", __name__)
+
+# Assets never change once stored (the URL is the content hash), so clients may cache them forever
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# Nothing in an asset may load or run anything, even when opened as a page
+ASSET_CSP = "default-src 'none'; style-src 'unsafe-inline'; sandbox"
+
+@bp.route("/assets/<asset_hash>", methods=["GET"])
+def get_asset(asset_hash):
+    """
+    Stream a stored image. Supports Range and conditional requests.
+
+    Query parameters (optional):
+      - variant: "thumb" for a downscaled copy (falls back to the original
+        when thumbnails cannot be generated)
+    """
+    if not assets.is_asset_hash(asset_hash):
+        return {"error": "Asset not found"}, 404
+    asset = db.session.get(Asset, asset_hash)
+    if asset is None or not os.path.exists(assets.asset_path(asset_hash)):
+        return {"error": "Asset not found"}, 404
+
+    path = assets.asset_path(asset_hash)
+    etag = asset_hash
+    if request.args.get("variant") == "thumb":
+        path = assets.thumbnail_path(asset_hash) or path
+        etag = f"{asset_hash}-thumb"
+
+    # Types outside the allowlist (stored before it existed) are downloaded, never rendered
+    inline = asset.content_type in assets.ALLOWED_CONTENT_TYPES
+    response = send_file(path, mimetype=asset.content_type if inline else "application/octet-stream",
+                         as_attachment=not inline, download_name=asset_hash, conditional=True,
+                         etag=etag, max_age=IMMUTABLE_MAX_AGE)
+    response.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    response.headers["Content-Security-Policy"] = ASSET_CSP
+    return response
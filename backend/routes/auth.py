@@ -1,7 +1,9 @@
 from models import Pathway
 
-from flask import Blueprint, request
+import time
+from flask import Blueprint, current_app, request
 from models import db, User
+from identity import SessionUser, clear_claim, issue_claim
 from flask_login import login_user, logout_user, login_required, current_user
 
 
@@ -40,15 +42,36 @@ def register():
 def login():
     data = request.json
     user = User.query.filter_by(username=data["username"]).first()
-    if user and user.check_password(data["password"]):
-        login_user(user)  # <-- Flask-Login stores user in session
-        return {"message": "Login successful"}
-    return {"error": "Invalid credentials"}, 401
+    if user is None:
+        return {"error": "Invalid credentials"}, 401
+
+    # Bound concurrent password hashing; shed the request if the queue is too long
+    slots = current_app.extensions["login_hash_slots"]
+    if not slots.acquire(timeout=current_app.config["LOGIN_QUEUE_TIMEOUT"]):
+        return {"error": "Too many logins in progress, please retry"}, 503, {"Retry-After": "1"}
+    start = time.perf_counter()
+    try:
+        valid = user.check_password(data["password"])
+    finally:
+        slots.release()
+    # Expose the hashing cost so login latency can be measured from the client side
+    timing = {"Server-Timing": f"hash;dur={(time.perf_counter() - start) * 1000:.1f}"}
+
+    if not valid:
+        return {"error": "Invalid credentials"}, 401, timing
+    if user.needs_rehash():
+        # Move the stored hash to the configured PASSWORD_HASH_METHOD
+        user.set_password(data["password"])
+        db.session.commit()
+    login_user(user)  # <-- Flask-Login stores user in session
+    issue_claim(SessionUser.from_user(user))
+    return {"message": "Login successful"}, 200, timing
 
 @bp.route("/logout", methods=["POST"])
 @login_required
 def logout():
     logout_user()
+    clear_claim()
     return {"message": "Logged out"}
 
 @bp.route("/me", methods=["GET"])
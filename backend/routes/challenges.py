@@ -1,52 +1,426 @@
-from models import Pathway
-
 from flask import Blueprint, request, jsonify
-from models import db, Challenge
+from sqlalchemy import func
+from sqlalchemy.orm import load_only, selectinload
+from models import db, CatalogueChange, Challenge, ChallengeNeighbour, ChallengeStats, Pathway, PathwayChallenge, ChallengeSubcategory, ChallengeTechnology, split_tags
+from search import search_challenges
+from cache import cached_response
+from changes import KINDS
+from similarity import TOP_K
+from stats import popularity_window
+from render import rendered_html
 
 bp = Blueprint("challenges", __name__)
 
+# Upper bound for ?limit= on the list endpoint
+MAX_PAGE_SIZE = 500
+# Upper bound for the number of ids accepted by ?ids= in a single request
+MAX_BATCH_IDS = 100
+# Default and maximum number of results from the search endpoint
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# Default and maximum number of results from the recommendation endpoints
+RECOMMEND_DEFAULT_LIMIT = 5
+RECOMMEND_MAX_LIMIT = 50
+# Default and maximum number of changes per page of the delta-sync feed
+CHANGES_DEFAULT_LIMIT = 500
+CHANGES_MAX_LIMIT = 2000
+
+
+def parse_fields(args):
+    """
+    Resolve the ?fields= / ?view=summary projection into a tuple of column names.
+    Returns None when the full record was requested.
+    Raises ValueError on unknown field names.
+    """
+    if args.get("view") == "summary":
+        return Challenge.SUMMARY_FIELDS
+    raw = args.get("fields")
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in Challenge.FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    # id is always returned so clients can link to the detail page / paginate
+    if "id" not in fields:
+        fields.insert(0, "id")
+    return tuple(dict.fromkeys(fields))
+
+
+def parse_ids(raw):
+    """
+    Parse a comma-separated ?ids= value into a list of unique ints, keeping request order.
+    Raises ValueError if an id is malformed or the batch is too large.
+    """
+    ids = []
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            ids.append(int(part))
+        except ValueError:
+            raise ValueError(f"Invalid challenge id: {part}")
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValueError(f"At most {MAX_BATCH_IDS} ids may be requested at once")
+    return ids
+
+
+def fetch_challenges_by_ids(ids, fields=None):
+    """
+    Load the given challenges with a single WHERE id IN (...) query.
+    Returns a dict of id -> Challenge; ids that do not exist are simply absent.
+    """
+    if not ids:
+        return {}
+    query = Challenge.query.filter(Challenge.id.in_(ids))
+    if fields is not None:
+        query = query.options(load_only(*[getattr(Challenge, f) for f in fields]))
+    return {c.id: c for c in query.all()}
+
+
+def parse_filters(args):
+    """
+    Read the facet filters from the query string.
+    Returns a dict of facet -> list of values (empty facets omitted) plus "match".
+    Raises ValueError on an unknown match mode.
+    """
+    match = args.get("match", "any")
+    if match not in ("any", "all"):
+        raise ValueError("match must be 'any' or 'all'")
+    filters = {"match": match}
+    difficulty = [d.strip() for d in args.get("difficulty", "").split(",") if d.strip()]
+    if difficulty:
+        filters["difficulty"] = difficulty
+    for facet in ("subcategory", "technology"):
+        names = split_tags(args.get(facet))
+        if names:
+            filters[facet] = names
+    return filters
+
+
+def tag_filter(tag_class, names, match):
+    """
+    Build a Challenge.id IN (...) clause against a normalized tag table.
+    "any" needs one matching tag, "all" needs every tag to be present.
+    """
+    sub = db.session.query(tag_class.challenge_id).filter(tag_class.name.in_(names))
+    if match == "all":
+        sub = sub.group_by(tag_class.challenge_id).having(func.count() == len(names))
+    return Challenge.id.in_(sub)
+
+
+def apply_filters(query, filters, exclude=None):
+    """
+    Apply parsed facet filters to a Challenge query.
+    The facet named by exclude is skipped (used when counting that facet).
+    """
+    if "difficulty" in filters and exclude != "difficulty":
+        query = query.filter(Challenge.difficulty.in_(filters["difficulty"]))
+    if "subcategory" in filters and exclude != "subcategory":
+        query = query.filter(tag_filter(ChallengeSubcategory, filters["subcategory"], filters["match"]))
+    if "technology" in filters and exclude != "technology":
+        query = query.filter(tag_filter(ChallengeTechnology, filters["technology"], filters["match"]))
+    return query
+
+
+def parse_positive_int(args, name, maximum=None, minimum=0):
+    """
+    Read an optional non-negative integer query parameter (at least minimum,
+    at most maximum), raising ValueError if malformed or out of range.
+    """
+    raw = args.get(name)
+    if raw is None or raw == "":
+        return None
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    if maximum is not None and value > maximum:
+        raise ValueError(f"{name} must be at most {maximum}")
+    return value
+
 # Get all pathways
 @bp.route("/pathways", methods=["GET"])
+@cached_response
 def get_pathways():
     """
     Returns all learning pathways as a list of {id, name, challengeIds}.
+
+    Query parameters (all optional):
+      - embed: "challenges" adds a "challenges" list to each pathway, in pathway
+        order, resolved with one IN query across all pathways
+      - fields / view: projection for the embedded challenges (defaults to summary)
+      - contains: a challenge id; only pathways that include it are returned
+        (one lookup on the pathway_challenges challenge index)
     """
-    pathways = Pathway.query.all()
-    return jsonify([p.to_dict() for p in pathways])
+    try:
+        contains = parse_positive_int(request.args, "contains")
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    # Load every pathway's ordered memberships in one extra SELECT ... IN
+    query = Pathway.query.options(selectinload(Pathway.memberships)).order_by(Pathway.id)
+    if contains is not None:
+        query = query.filter(Pathway.id.in_(
+            db.session.query(PathwayChallenge.pathway_id).filter(PathwayChallenge.challenge_id == contains)
+        ))
+    data = [p.to_dict() for p in query.all()]
+    if request.args.get("embed") != "challenges":
+        return jsonify(data)
+
+    try:
+        fields = parse_fields(request.args) or Challenge.SUMMARY_FIELDS
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    all_ids = list(dict.fromkeys(cid for p in data for cid in p["challengeIds"]))
+    found = fetch_challenges_by_ids(all_ids, fields)
+    for p in data:
+        p["challenges"] = [found[cid].to_dict(fields) for cid in p["challengeIds"] if cid in found]
+    return jsonify(data)
 # backend/routes/challenges.py
 
 
+def isoformat(value):
+    return value.isoformat() + "Z" if value is not None else None
+
+
+@bp.route("/changes", methods=["GET"])
+@cached_response
+def get_changes():
+    """
+    Delta-sync feed: the challenges and pathways created, updated or deleted
+    after change number ?since= (default 0, i.e. everything), oldest first.
+
+    Query parameters (all optional):
+      - since: the "seq" returned by the previous call
+      - limit: at most this many changes (default 500, max 2000); "more" is
+        true when there are further changes, so call again with since=seq
+
+    Returns {since, seq, more, challenges, pathways, deleted: {challenges, pathways}},
+    where challenges and pathways are full records with updated_at. A since
+    beyond the newest change (e.g. after a database restore) gets 410: the
+    client must resync from since=0.
+
+    Changes become visible in seq order (writes to the change log are
+    serialized until commit), so a client that resumes from the seq it got
+    never skips a change committed later under a lower seq.
+    """
+    try:
+        since = parse_positive_int(request.args, "since") or 0
+        limit = parse_positive_int(request.args, "limit", maximum=CHANGES_MAX_LIMIT, minimum=1) or CHANGES_DEFAULT_LIMIT
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    changes = (CatalogueChange.query.filter(CatalogueChange.seq > since)
+               .order_by(CatalogueChange.seq).limit(limit + 1).all())
+    more = len(changes) > limit
+    changes = changes[:limit]
+    if not changes and since > (db.session.query(func.max(CatalogueChange.seq)).scalar() or 0):
+        return {"error": "since is ahead of the change feed; resync from since=0"}, 410
+
+    upserted = {kind: [c.object_id for c in changes if c.kind == kind and not c.deleted] for kind in KINDS}
+    challenges = fetch_challenges_by_ids(upserted["challenge"])
+    pathways = {p.id: p for p in Pathway.query.options(selectinload(Pathway.memberships))
+                .filter(Pathway.id.in_(upserted["pathway"]))} if upserted["pathway"] else {}
+    return jsonify({
+        "since": since,
+        "seq": changes[-1].seq if changes else since,
+        "more": more,
+        "challenges": [{**challenges[i].to_dict(), "updated_at": isoformat(challenges[i].updated_at)}
+                       for i in upserted["challenge"] if i in challenges],
+        "pathways": [{**pathways[i].to_dict(), "updatedAt": isoformat(pathways[i].updated_at)}
+                     for i in upserted["pathway"] if i in pathways],
+        "deleted": {
+            "challenges": [c.object_id for c in changes if c.kind == "challenge" and c.deleted],
+            "pathways": [c.object_id for c in changes if c.kind == "pathway" and c.deleted],
+        },
+    })
+
+
+def popular_sort_window():
+    """Cache key part for get_challenges: completion counts only matter to sort=popular."""
+    return popularity_window() if request.args.get("sort") == "popular" else None
+
+
 @bp.route("/challenges", methods=["GET"])
+@cached_response(key_extra=popular_sort_window)
 def get_challenges():
     """
     Query parameters (all optional):
       - difficulty: "Easy", "Medium", "Hard"
-      - subcategory: e.g. "AI-ML", "Data-Visualization", etc.
-      - subject: e.g. "AIDI1011", "AIDI1012"
-      - technology: e.g. "Python", "R" (matches if the challenge's technology field contains this substring)
+      - subcategory: e.g. "Classification", "Data Cleaning"
+      - technology: e.g. "pandas", "sklearn"
+        Each facet accepts comma-separated values and matches whole tags
+        (case-insensitive), so "R" no longer matches "PyTorch".
+      - match: "any" (default) or "all" - whether a challenge needs one or all
+        of the requested subcategory/technology tags
+      - fields: comma-separated column names to return (e.g. "id,title,difficulty")
+      - view: "summary" returns only the columns rendered by the catalogue cards
+      - after_id: keyset cursor, only challenges with a larger id are returned
+      - limit: page size (max MAX_PAGE_SIZE); when more rows exist the next cursor
+        is sent back in the X-Next-After-Id header
+      - sort: "id" (default) or "popular", most completed first (from the
+        challenge_stats counters, up to POPULAR_CACHE_SECONDS stale); popular
+        lists take limit but not after_id
+      - ids: comma-separated challenge ids (max MAX_BATCH_IDS); returns those
+        challenges in request order, other filters are ignored and ids that
+        do not exist are listed in the X-Missing-Ids header
     """
-    difficulty = request.args.get("difficulty")
-    subcategory = request.args.get("subcategory")
-   #subject = request.args.get("subject")
-    tech = request.args.get("technology")
+    try:
+        fields = parse_fields(request.args)
+        filters = parse_filters(request.args)
+        ids = parse_ids(request.args["ids"]) if "ids" in request.args else None
+        after_id = parse_positive_int(request.args, "after_id")
+        limit = parse_positive_int(request.args, "limit", maximum=MAX_PAGE_SIZE, minimum=1)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    sort = request.args.get("sort", "id")
+    if sort not in ("id", "popular"):
+        return {"error": "sort must be 'id' or 'popular'"}, 400
+    if sort == "popular" and after_id is not None:
+        return {"error": "after_id cannot be combined with sort=popular"}, 400
 
-    query = Challenge.query
+    if ids is not None:
+        # Multi-get: one IN query, results in the order the ids were requested
+        found = fetch_challenges_by_ids(ids, fields)
+        response = jsonify([found[i].to_dict(fields) for i in ids if i in found])
+        missing = [str(i) for i in ids if i not in found]
+        if missing:
+            response.headers["X-Missing-Ids"] = ",".join(missing)
+        return response
 
-    if difficulty:
-        query = query.filter(Challenge.difficulty == difficulty)
-    if subcategory:
-        query = query.filter(Challenge.subcategory.ilike(f"%{subcategory}%"))
+    query = apply_filters(Challenge.query, filters)
+
+    if fields is not None:
+        # Only SELECT the requested columns; the large Text fields stay deferred
+        query = query.options(load_only(*[getattr(Challenge, f) for f in fields]))
+    if after_id is not None:
+        query = query.filter(Challenge.id > after_id)
+    if sort == "popular":
+        # Challenges nobody has completed yet have no counter row
+        query = (query.outerjoin(ChallengeStats, ChallengeStats.challenge_id == Challenge.id)
+                 .order_by(func.coalesce(ChallengeStats.completions, 0).desc(), Challenge.id))
+        return jsonify([c.to_dict(fields) for c in (query.limit(limit) if limit else query).all()])
+    # Stable ordering so keyset pages never skip or repeat rows
+    query = query.order_by(Challenge.id)
+
+    if limit is None:
+        results = query.all()
+        return jsonify([c.to_dict(fields) for c in results])
+
+    # Fetch one extra row to find out whether another page exists
+    results = query.limit(limit + 1).all()
+    has_more = len(results) > limit
+    results = results[:limit]
+    response = jsonify([c.to_dict(fields) for c in results])
+    if has_more:
+        response.headers["X-Next-After-Id"] = str(results[-1].id)
+    return response
+
+@bp.route("/challenges/search", methods=["GET"])
+def search():
+    """
+    Full-text search over title, description, overview, task and outcomes.
+
+    Query parameters:
+      - q: search text (required); every word must match, the last one as a prefix
+      - limit: number of results (default SEARCH_DEFAULT_LIMIT, max SEARCH_MAX_LIMIT)
 
-   # if subject:
-        #query = query.filter(Challenge.subject == subject)
-    if tech:
-        # Here we do a simple “contains” match on the comma-separated string
-        query = query.filter(Challenge.technology.ilike(f"%{tech}%"))
+    Results are ranked by bm25 and carry an HTML-escaped "title" and "snippet"
+    with matches wrapped in <mark> tags.
+    """
+    q = request.args.get("q", "").strip()
+    if not q:
+        return {"error": "Missing search query: q"}, 400
+    try:
+        limit = parse_positive_int(request.args, "limit", maximum=SEARCH_MAX_LIMIT, minimum=1) or SEARCH_DEFAULT_LIMIT
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    return jsonify(search_challenges(q, limit))
+
+# Tag table per tag facet; difficulty is a column of challenges
+FACET_TAG_TABLES = {"technology": ChallengeTechnology, "subcategory": ChallengeSubcategory}
+
+
+def count_facet(facet, filters):
+    """
+    Count challenges per value of one facet under every filter except the
+    facet's own, with one GROUP BY. Returns [{"value", "count"}], largest first.
+    """
+    tag_class = FACET_TAG_TABLES.get(facet)
+    column = tag_class.name if tag_class else Challenge.difficulty
+    query = db.session.query(column, func.count()).group_by(column)
+    if tag_class is not None and any(f in filters for f in ("difficulty", *FACET_TAG_TABLES) if f != facet):
+        # Without other filters the tag counts come straight from the (name, challenge_id) index
+        query = query.join(Challenge, Challenge.id == tag_class.challenge_id)
+    counts = apply_filters(query, filters, exclude=facet).all()
+    return [{"value": value, "count": count} for value, count in sorted(counts, key=lambda c: (-c[1], c[0]))]
+
+
+@bp.route("/challenges/facets", methods=["GET"])
+@cached_response
+def get_facets():
+    """
+    Challenge counts per difficulty, technology and subcategory for the
+    current filters, for the filter sidebar.
 
-    results = query.all()
-    return jsonify([c.to_dict() for c in results])
+    Takes the difficulty / subcategory / technology / match parameters of
+    /challenges. Each facet is counted with all filters except its own, so a
+    count says how many results selecting that value (too) would give.
+    Returns {"total": n, "difficulty": [{"value", "count"}, ...], "technology": [...], "subcategory": [...]}.
+    """
+    try:
+        filters = parse_filters(request.args)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    total = apply_filters(db.session.query(func.count(Challenge.id)), filters).scalar()
+    return jsonify({"total": total, **{facet: count_facet(facet, filters) for facet in ("difficulty", *FACET_TAG_TABLES)}})
 
 @bp.route("/challenges/<int:id>", methods=["GET"])
+@cached_response
 def get_challenge(id):
+    """
+    Query parameters (all optional):
+      - render: "html" adds an "html" object with overview, task, outcomes and
+        sample_sol rendered to sanitized HTML (None for empty columns), from
+        the stored renderings (see render.py)
+    """
+    render = request.args.get("render")
+    if render not in (None, "html"):
+        return {"error": "render must be 'html'"}, 400
     c = Challenge.query.get_or_404(id)
-    return jsonify(c.to_dict())
\ No newline at end of file
+    if render is None:
+        return jsonify(c.to_dict())
+    return jsonify({**c.to_dict(), "html": rendered_html(c)})
+
+@bp.route("/challenges/<int:id>/similar", methods=["GET"])
+def get_similar_challenges(id):
+    """
+    Challenges most similar to this one, from the precomputed index (see similarity.py).
+
+    Query parameters:
+      - limit: number of results (default RECOMMEND_DEFAULT_LIMIT, max TOP_K)
+
+    Each result is a summary card with a "score" between 0 and 1.
+    """
+    try:
+        limit = parse_positive_int(request.args, "limit", maximum=TOP_K, minimum=1) or RECOMMEND_DEFAULT_LIMIT
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    if db.session.get(Challenge, id) is None:
+        return {"error": "Challenge not found"}, 404
+    neighbours = (
+        ChallengeNeighbour.query
+        .filter(ChallengeNeighbour.challenge_id == id)
+        .order_by(ChallengeNeighbour.rank)
+        .limit(limit)
+        .all()
+    )
+    by_id = fetch_challenges_by_ids([n.neighbour_id for n in neighbours], Challenge.SUMMARY_FIELDS)
+    return jsonify([
+        {**by_id[n.neighbour_id].to_dict(Challenge.SUMMARY_FIELDS), "score": n.score}
+        for n in neighbours if n.neighbour_id in by_id
+    ])
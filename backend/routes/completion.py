@@ -1,23 +1,52 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-from models import db, Challenge, User
-from sqlalchemy import text
+from models import db, Challenge, ChallengeNeighbour, CompletedChallenge, Pathway, PathwayChallenge
+from routes.challenges import RECOMMEND_DEFAULT_LIMIT, RECOMMEND_MAX_LIMIT, fetch_challenges_by_ids, parse_positive_int
+from sqlalchemy import case, delete, exists, func, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from dbconfig import insert_ignore
+import stats
 
 bp = Blueprint("completion", __name__)
 
-# Create a completed_challenges table if it doesn't exist
-def setup_completed_challenges_table():
-    """Create the completed_challenges table if it doesn't exist"""
-    db.engine.execute(text("""
-    CREATE TABLE IF NOT EXISTS completed_challenges (
-        user_id INTEGER,
-        challenge_id INTEGER,
-        completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        PRIMARY KEY (user_id, challenge_id),
-        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-        FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE
-    )
-    """))
+# Upper bound for the number of ids in one bulk update
+MAX_BULK_IDS = 500
+
+
+def parse_id_list(data, key):
+    """Read a list of integer challenge ids from a JSON body, raising ValueError if malformed."""
+    value = data.get(key, [])
+    if not isinstance(value, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in value):
+        raise ValueError(f"{key} must be a list of challenge ids")
+    return set(value)
+
+
+def apply_completions(user_id, add, remove):
+    """
+    Insert completions for the add ids and delete those of the remove ids, in
+    the current transaction. Returns (added, removed): the ids these statements
+    actually changed, read from RETURNING where the database supports it and
+    from per-row rowcounts otherwise, so rows a concurrent request already
+    inserted or deleted are neither counted nor reported again.
+    """
+    table = CompletedChallenge.__table__
+    bind = db.session.get_bind()
+    mine = table.c.user_id == user_id
+    if bind.dialect.full_returning:
+        added = db.session.execute(
+            insert_ignore(table, bind).values([{"user_id": user_id, "challenge_id": cid} for cid in add])
+            .returning(table.c.challenge_id)).scalars().all() if add else []
+        removed = db.session.execute(
+            delete(table).where(mine, table.c.challenge_id.in_(sorted(remove)))
+            .returning(table.c.challenge_id)).scalars().all() if remove else []
+    else:
+        stmt = insert_ignore(table, bind)
+        added = [cid for cid in add
+                 if db.session.execute(stmt, {"user_id": user_id, "challenge_id": cid}).rowcount == 1]
+        removed = [cid for cid in remove
+                   if db.session.execute(delete(table).where(mine, table.c.challenge_id == cid)).rowcount == 1]
+    return sorted(added), sorted(removed)
+
 
 # Get completed challenges for the current user
 @bp.route("/completed-challenges", methods=["GET"])
@@ -27,20 +56,14 @@ def get_completed_challenges():
     Get all challenges completed by the current user
     """
     try:
-        # Query the completed_challenges table for the current user
-        result = db.engine.execute(text(
-            """
-            SELECT c.* FROM challenges c
-            JOIN completed_challenges cc ON c.id = cc.challenge_id
-            WHERE cc.user_id = :user_id
-            """), 
-            {"user_id": current_user.id}
+        challenges = (
+            Challenge.query
+            .join(CompletedChallenge, CompletedChallenge.challenge_id == Challenge.id)
+            .filter(CompletedChallenge.user_id == current_user.id)
+            .order_by(CompletedChallenge.completed_at)
+            .all()
         )
-        
-        # Convert to list of dictionaries
-        completed_challenges = [dict(row) for row in result]
-        
-        return jsonify(completed_challenges)
+        return jsonify([c.to_dict() for c in challenges])
     except Exception as e:
         print(f"Error retrieving completed challenges: {str(e)}")
         return {"error": "Failed to retrieve completed challenges"}, 500
@@ -52,24 +75,34 @@ def mark_challenge_completed(challenge_id):
     """
     Mark a challenge as completed for the current user
     """
-    # Check if challenge exists
-    challenge = Challenge.query.get_or_404(challenge_id)
-    
+    # One INSERT ... SELECT: inserts only if the challenge exists and is not already completed
+    stmt = insert(CompletedChallenge.__table__).from_select(
+        ["user_id", "challenge_id"],
+        select(literal(current_user.id), Challenge.id)
+        .where(Challenge.id == challenge_id)
+        .where(~exists().where(
+            (CompletedChallenge.user_id == current_user.id) & (CompletedChallenge.challenge_id == challenge_id)
+        )),
+    )
     try:
-        # Add entry to completed_challenges table
-        db.engine.execute(text(
-            """
-            INSERT OR IGNORE INTO completed_challenges (user_id, challenge_id)
-            VALUES (:user_id, :challenge_id)
-            """),
-            {"user_id": current_user.id, "challenge_id": challenge_id}
-        )
-        
+        result = db.session.execute(stmt)
+        if result.rowcount == 1:
+            stats.record_completed(current_user.id, [challenge_id])
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request completed it first
+        db.session.rollback()
         return {"message": f"Challenge {challenge_id} marked as completed"}, 201
     except Exception as e:
+        db.session.rollback()
         print(f"Error marking challenge as completed: {str(e)}")
         return {"error": "Failed to mark challenge as completed"}, 500
 
+    # Nothing inserted: either already completed, or the challenge does not exist
+    if result.rowcount == 0 and db.session.get(Challenge, challenge_id) is None:
+        return {"error": "Challenge not found"}, 404
+    return {"message": f"Challenge {challenge_id} marked as completed"}, 201
+
 # Remove a challenge from completed list
 @bp.route("/completed-challenges/<int:challenge_id>", methods=["DELETE"])
 @login_required
@@ -77,20 +110,149 @@ def unmark_challenge_completed(challenge_id):
     """
     Remove a challenge from the user's completed list
     """
-    # Check if challenge exists
-    challenge = Challenge.query.get_or_404(challenge_id)
-    
     try:
-        # Remove entry from completed_challenges table
-        db.engine.execute(text(
-            """
-            DELETE FROM completed_challenges
-            WHERE user_id = :user_id AND challenge_id = :challenge_id
-            """),
-            {"user_id": current_user.id, "challenge_id": challenge_id}
-        )
-        
-        return {"message": f"Challenge {challenge_id} unmarked as completed"}, 200
+        deleted = CompletedChallenge.query.filter_by(
+            user_id=current_user.id, challenge_id=challenge_id
+        ).delete(synchronize_session=False)
+        if deleted:
+            stats.record_uncompleted(current_user.id, [challenge_id])
+        db.session.commit()
     except Exception as e:
+        db.session.rollback()
         print(f"Error unmarking challenge: {str(e)}")
         return {"error": "Failed to unmark challenge"}, 500
+
+    if deleted == 0 and db.session.get(Challenge, challenge_id) is None:
+        return {"error": "Challenge not found"}, 404
+    return {"message": f"Challenge {challenge_id} unmarked as completed"}, 200
+
+# Apply many completion changes at once
+@bp.route("/completed-challenges", methods=["PUT"])
+@login_required
+def update_completed_challenges():
+    """
+    Bulk update the current user's completed challenges in one transaction.
+    Body: {"add": [challenge ids], "remove": [challenge ids]}
+    Returns the ids this request changed. Unknown ids reject the whole request.
+    """
+    data = request.json or {}
+    try:
+        add = parse_id_list(data, "add")
+        remove = parse_id_list(data, "remove")
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    if add & remove:
+        return {"error": "The same challenge cannot be added and removed"}, 400
+    if len(add) + len(remove) > MAX_BULK_IDS:
+        return {"error": f"At most {MAX_BULK_IDS} challenges may be changed at once"}, 400
+
+    try:
+        if add:
+            known = {row[0] for row in db.session.query(Challenge.id).filter(Challenge.id.in_(add))}
+            missing = sorted(add - known)
+            if missing:
+                return {"error": "Unknown challenge ids", "missing": missing}, 400
+        # Only the ids that look like changes are written; what the writes report is what counts
+        current = {row[0] for row in db.session.query(CompletedChallenge.challenge_id).filter(
+            CompletedChallenge.user_id == current_user.id, CompletedChallenge.challenge_id.in_(add | remove))}
+        added, removed = apply_completions(current_user.id, add - current, remove & current)
+        # Completion counters and daily activity move in the same transaction (see stats.py)
+        stats.record_completed(current_user.id, added)
+        stats.record_uncompleted(current_user.id, removed)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error updating completed challenges: {str(e)}")
+        return {"error": "Failed to update completed challenges"}, 500
+    return {"added": added, "removed": removed}
+
+# Dashboard summary for the current user
+@bp.route("/progress", methods=["GET"])
+@login_required
+def get_progress():
+    """
+    Everything a learner's dashboard needs in one response:
+    completed ids, overall counts and per-pathway completion percentages.
+    """
+    completed_ids = [row[0] for row in db.session.query(CompletedChallenge.challenge_id)
+                     .filter(CompletedChallenge.user_id == current_user.id)
+                     .order_by(CompletedChallenge.completed_at)]
+    total = db.session.query(func.count(Challenge.id)).scalar()
+
+    # Per-pathway totals and completed counts in one aggregate query
+    rows = (
+        db.session.query(
+            Pathway.id,
+            Pathway.name,
+            func.count(PathwayChallenge.challenge_id),
+            func.count(CompletedChallenge.challenge_id),
+        )
+        .outerjoin(PathwayChallenge, PathwayChallenge.pathway_id == Pathway.id)
+        .outerjoin(CompletedChallenge, (CompletedChallenge.challenge_id == PathwayChallenge.challenge_id)
+                   & (CompletedChallenge.user_id == current_user.id))
+        .group_by(Pathway.id, Pathway.name)
+        .order_by(Pathway.id)
+        .all()
+    )
+    pathways = [
+        {
+            "id": pid,
+            "name": name,
+            "completed": done,
+            "total": size,
+            "percent": round(100 * done / size, 1) if size else 0.0,
+        }
+        for pid, name, size, done in rows
+    ]
+    return {
+        "completedIds": completed_ids,
+        "completed": len(completed_ids),
+        "total": total,
+        "pathways": pathways,
+    }
+
+# Recommend what to do next
+@bp.route("/recommendations", methods=["GET"])
+@login_required
+def get_recommendations():
+    """
+    Suggest challenges the current user has not completed yet.
+
+    Candidates are the precomputed neighbours of the user's completed
+    challenges, ranked by summed similarity. Users with too little history
+    get easy challenges first ("reason": "starter").
+
+    Query parameters:
+      - limit: number of results (default RECOMMEND_DEFAULT_LIMIT, max RECOMMEND_MAX_LIMIT)
+    """
+    try:
+        limit = parse_positive_int(request.args, "limit", maximum=RECOMMEND_MAX_LIMIT, minimum=1) or RECOMMEND_DEFAULT_LIMIT
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    completed = select(CompletedChallenge.challenge_id).where(CompletedChallenge.user_id == current_user.id)
+    score = func.sum(ChallengeNeighbour.score)
+    ranked = (
+        db.session.query(ChallengeNeighbour.neighbour_id, score)
+        .filter(ChallengeNeighbour.challenge_id.in_(completed))
+        .filter(ChallengeNeighbour.neighbour_id.notin_(completed))
+        .group_by(ChallengeNeighbour.neighbour_id)
+        .order_by(score.desc(), ChallengeNeighbour.neighbour_id)
+        .limit(limit)
+        .all()
+    )
+    picks = [(cid, round(total, 6), "similar") for cid, total in ranked]
+    if len(picks) < limit:
+        easiest_first = case({"Easy": 0, "Medium": 1, "Hard": 2}, value=Challenge.difficulty, else_=3)
+        starters = (
+            db.session.query(Challenge.id)
+            .filter(Challenge.id.notin_(completed))
+            .filter(Challenge.id.notin_([cid for cid, _, _ in picks]))
+            .order_by(easiest_first, Challenge.id)
+            .limit(limit - len(picks))
+        )
+        picks.extend((cid, None, "starter") for cid, in starters)
+    by_id = fetch_challenges_by_ids([cid for cid, _, _ in picks], Challenge.SUMMARY_FIELDS)
+    return jsonify([
+        {**by_id[cid].to_dict(Challenge.SUMMARY_FIELDS), "score": total, "reason": reason}
+        for cid, total, reason in picks if cid in by_id
+    ])
@@ -0,0 +1,41 @@
+import time
+from flask import Blueprint, current_app
+from sqlalchemy.exc import SQLAlchemyError
+from models import db
+from migrations import applied_version, latest_version
+
+bp = Blueprint("health", __name__)
+
+@bp.route("/health", methods=["GET"])
+def health():
+    """Liveness: the worker is serving requests. Does not touch the database."""
+    return {"status": "ok"}
+
+@bp.route("/ready", methods=["GET"])
+def ready():
+    """
+    Readiness: 200 once the database answers and its schema is current, else 503.
+    Reports how long after process start the worker first became ready and
+    whether that was within READY_BUDGET_SECONDS.
+    """
+    try:
+        with db.engine.connect() as conn:
+            version = applied_version(conn)
+    except SQLAlchemyError as e:
+        print(f"Readiness check failed: {str(e)}")
+        return {"status": "unavailable", "error": "Database unavailable"}, 503
+    expected = latest_version()
+    if version < expected:
+        return {"status": "starting", "schema_version": version, "expected_schema_version": expected}, 503
+
+    startup = current_app.extensions["startup"]
+    if startup["ready_after"] is None:
+        startup["ready_after"] = round(time.monotonic() - startup["started"], 3)
+    budget = current_app.config["READY_BUDGET_SECONDS"]
+    return {
+        "status": "ready",
+        "schema_version": version,
+        "ready_after_seconds": startup["ready_after"],
+        "budget_seconds": budget,
+        "within_budget": startup["ready_after"] <= budget,
+    }
@@ -0,0 +1,21 @@
+from flask import Blueprint, current_app, request, Response
+
+bp = Blueprint("metrics", __name__)
+
+@bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Prometheus text exposition of this worker's request metrics (see metrics.py).
+    When METRICS_TOKEN is set, requires "Authorization: Bearer <token>".
+    """
+    token = current_app.config.get("METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return {"error": "Unauthorized"}, 401
+    cache = current_app.extensions["response_cache"]
+    extra = (
+        ("dscl_response_cache_hits_total", "Response cache hits", "counter", cache.hits),
+        ("dscl_response_cache_misses_total", "Response cache misses", "counter", cache.misses),
+        ("dscl_response_cache_bytes", "Bytes held by the response cache", "gauge", cache.total_bytes),
+    )
+    body = current_app.extensions["metrics"].render(extra)
+    return Response(body, mimetype="text/plain; version=0.0.4")
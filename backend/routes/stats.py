@@ -0,0 +1,28 @@
+from flask import Blueprint, request, jsonify
+from cache import cached_response
+from models import Challenge
+from routes.challenges import parse_positive_int
+from stats import popular_challenges, popularity_window
+
+bp = Blueprint("stats", __name__)
+
+POPULAR_DEFAULT_LIMIT = 10
+POPULAR_MAX_LIMIT = 50
+
+@bp.route("/stats/popular", methods=["GET"])
+@cached_response(key_extra=popularity_window)
+def get_popular():
+    """
+    The most completed challenges, most completed first, as summary records
+    with a "completions" count. Read from the challenge_stats counters and
+    cached for up to POPULAR_CACHE_SECONDS.
+
+    Query parameters (all optional):
+      - limit: number of challenges (default 10, max 50)
+    """
+    try:
+        limit = parse_positive_int(request.args, "limit", maximum=POPULAR_MAX_LIMIT, minimum=1) or POPULAR_DEFAULT_LIMIT
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    return jsonify([{**c.to_dict(Challenge.SUMMARY_FIELDS), "completions": completions}
+                    for c, completions in popular_challenges(limit)])
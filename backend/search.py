@@ -0,0 +1,315 @@
+# backend/search.py
+
+"""
+Full-text search over challenges.
+
+On SQLite the index is a separate FTS5 table (challenges_fts) whose rowid is
+the challenge id. It is maintained incrementally: the admin handlers and the
+seeder call index_challenge() / remove_challenge() in the same transaction as
+the write. To rebuild it from scratch, or to benchmark it against the old
+ilike-style scan on a synthetic corpus:
+
+    python search.py rebuild
+    python search.py bench --size 50000
+
+On PostgreSQL the index is a GIN expression index over a weighted tsvector
+of the same columns (pg_document()). PostgreSQL keeps it up to date itself, so
+the maintenance functions do nothing there, and results are ranked with
+ts_rank_cd and highlighted with ts_headline instead of bm25/snippet.
+"""
+
+import html
+import re
+from sqlalchemy import text
+from models import db
+
+FTS_TABLE = "challenges_fts"
+# Indexed columns, in FTS column order
+FTS_COLUMNS = ("title", "description", "overview", "task", "outcomes")
+# bm25 weight per column: a hit in the title counts far more than one in the task text
+FTS_WEIGHTS = (10.0, 5.0, 2.0, 1.0, 1.0)
+
+# PostgreSQL: text search configuration, tsvector weight class per column and
+# the ts_rank_cd weights for classes D, C, B, A (FTS_WEIGHTS scaled to 1.0)
+PG_CONFIG = "english"
+PG_CLASSES = ("A", "B", "C", "D", "D")
+PG_RANK_WEIGHTS = "{0.1, 0.2, 0.5, 1.0}"
+PG_INDEX = "ix_challenges_search"
+
+
+def pg_document(alias=""):
+    """The indexed tsvector expression; queries must repeat it exactly for the index to be used."""
+    prefix = f"{alias}." if alias else ""
+    return " || ".join(
+        f"setweight(to_tsvector('{PG_CONFIG}', coalesce({prefix}{column}, '')), '{weight}')"
+        for column, weight in zip(FTS_COLUMNS, PG_CLASSES)
+    )
+
+
+# Private-use characters mark highlights inside FTS output, so the text can be
+# HTML-escaped before the markers are turned into <mark> tags
+_MARK_START = "\ue000"
+_MARK_END = "\ue001"
+# PostgreSQL's parser treats <...> as HTML tags and ts_headline drops them, so
+# angle brackets go through it as these characters and come back escaped
+_ANGLES = "\ue002\ue003"
+
+
+def uses_fts5(bind):
+    """True when bind (a connection, engine or session) is SQLite, which uses the FTS5 table."""
+    if hasattr(bind, "get_bind"):
+        bind = bind.get_bind()
+    return bind.dialect.name == "sqlite"
+
+
+def create_search_index(conn):
+    """Create the FTS5 table (SQLite) or the tsvector expression index (PostgreSQL) if missing."""
+    if not uses_fts5(conn):
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON challenges USING GIN (({pg_document()}))"))
+        return
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        f"USING fts5({', '.join(FTS_COLUMNS)}, tokenize='porter unicode61')"
+    ))
+
+
+def fill_search_index(conn):
+    """Copy every challenge into an empty search index in one INSERT ... SELECT."""
+    if not uses_fts5(conn):
+        return
+    conn.execute(text(
+        f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) "
+        f"SELECT id, {', '.join(FTS_COLUMNS)} FROM challenges"
+    ))
+
+
+def rebuild_search_index():
+    """Drop and repopulate the search index from the challenges table. Returns rows indexed."""
+    with db.engine.begin() as conn:
+        if not uses_fts5(conn):
+            conn.execute(text(f"REINDEX INDEX {PG_INDEX}"))
+            return conn.execute(text("SELECT COUNT(*) FROM challenges")).scalar()
+        conn.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+        create_search_index(conn)
+        fill_search_index(conn)
+        return conn.execute(text(f"SELECT COUNT(*) FROM {FTS_TABLE}")).scalar()
+
+
+def index_challenge(challenge):
+    """
+    Insert or replace one challenge in the search index.
+    Runs on the current session so it commits (or rolls back) with the write.
+    """
+    values = {c: getattr(challenge, c) for c in FTS_COLUMNS}
+    values["id"] = challenge.id
+    index_rows([values])
+
+
+def index_rows(rows):
+    """
+    Insert or replace many challenges in the search index with two executemany
+    statements. Each row is a dict with "id" and the FTS_COLUMNS.
+    """
+    if not rows or not uses_fts5(db.session):
+        return
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), [{"id": r["id"]} for r in rows])
+    db.session.execute(text(
+        f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) "
+        f"VALUES (:id, {', '.join(':' + c for c in FTS_COLUMNS)})"
+    ), [{"id": r["id"], **{c: r.get(c) for c in FTS_COLUMNS}} for r in rows])
+
+
+def remove_challenge(challenge_id):
+    """Remove one challenge from the search index (on the current session)."""
+    if not uses_fts5(db.session):
+        return
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": challenge_id})
+
+
+def build_match_query(q):
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+    Every word must match (implicit AND); the last word is a prefix so
+    search-as-you-type works. Returns None if q has no searchable words.
+    """
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def build_tsquery(q):
+    """The PostgreSQL counterpart of build_match_query(): a to_tsquery() expression."""
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+    return " & ".join(words) + ":*"
+
+
+def _markup(value):
+    """HTML-escape FTS output and convert the highlight markers to <mark> tags."""
+    escaped = html.escape(value or "").replace(_ANGLES[0], "&lt;").replace(_ANGLES[1], "&gt;")
+    return escaped.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def search_challenges(q, limit=20):
+    """
+    Run a ranked full-text search.
+    Returns a list of dicts with the card fields, an HTML-safe highlighted
+    title and a snippet from the best matching column.
+    """
+    if not uses_fts5(db.session):
+        return _search_postgresql(q, limit)
+    match = build_match_query(q)
+    if match is None:
+        return []
+    weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+    rows = db.session.execute(text(
+        f"""
+        SELECT c.id, c.difficulty, c.subcategory, c.technology,
+               highlight({FTS_TABLE}, 0, :start, :end) AS title,
+               snippet({FTS_TABLE}, -1, :start, :end, '…', 16) AS snippet,
+               bm25({FTS_TABLE}, {weights}) AS rank
+        FROM {FTS_TABLE}
+        JOIN challenges c ON c.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH :match
+        ORDER BY rank
+        LIMIT :limit
+        """
+    ), {"match": match, "start": _MARK_START, "end": _MARK_END, "limit": limit})
+    return _results(rows)
+
+
+def _search_postgresql(q, limit):
+    """search_challenges() on PostgreSQL: tsvector match, ts_rank_cd ranking and ts_headline highlights."""
+    query = build_tsquery(q)
+    if query is None:
+        return []
+    marks = f"StartSel={_MARK_START}, StopSel={_MARK_END}"
+    rows = db.session.execute(text(
+        f"""
+        SELECT c.id, c.difficulty, c.subcategory, c.technology,
+               ts_headline('{PG_CONFIG}', translate(coalesce(c.title, ''), '<>', :angles), q,
+                           :title_options) AS title,
+               ts_headline('{PG_CONFIG}', translate(concat_ws(' ', {', '.join('c.' + col for col in FTS_COLUMNS[1:])}),
+                                                    '<>', :angles), q, :snippet_options) AS snippet,
+               -ts_rank_cd('{PG_RANK_WEIGHTS}', {pg_document('c')}, q) AS rank
+        FROM challenges c, to_tsquery('{PG_CONFIG}', :query) q
+        WHERE ({pg_document('c')}) @@ q
+        ORDER BY rank, c.id
+        LIMIT :limit
+        """
+    ), {
+        "query": query,
+        "angles": _ANGLES,
+        "title_options": f"{marks}, HighlightAll=true",
+        "snippet_options": f"{marks}, MaxWords=16, MinWords=8, MaxFragments=1, FragmentDelimiter=…",
+        "limit": limit,
+    })
+    return _results(rows)
+
+
+def _results(rows):
+    return [
+        {
+            "id": r.id,
+            "title": _markup(r.title),
+            "difficulty": r.difficulty,
+            "subcategory": r.subcategory,
+            "technology": r.technology,
+            "snippet": _markup(r.snippet),
+            "rank": r.rank,
+        }
+        for r in rows
+    ]
+
+
+def benchmark(size, queries=50, seed=0):
+    """
+    Compare FTS5 search with the previous ilike scan on a synthetic corpus.
+    Builds a throwaway SQLite database, so it never touches real data.
+    """
+    import os
+    import random
+    import tempfile
+    import time
+    from app import create_app
+    from migrations import run_migrations
+
+    rng = random.Random(seed)
+    vocabulary = [
+        "regression", "classification", "clustering", "outliers", "imputation",
+        "pandas", "sklearn", "tensorflow", "titanic", "housing", "sentiment",
+        "forecast", "images", "recommender", "anomaly", "features", "metrics",
+        "pipeline", "visualization", "statistics", "network", "tabular", "text",
+    ] + [f"term{i}" for i in range(2000)]
+
+    def sentence(n):
+        return " ".join(rng.choice(vocabulary) for _ in range(n))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app = create_app()
+        with app.app_context():
+            run_migrations()
+            rows = [
+                {"title": sentence(4), "description": sentence(20), "difficulty": "Easy",
+                 "subcategory": "Statistics", "overview": sentence(80), "task": sentence(60),
+                 "outcomes": sentence(30)}
+                for _ in range(size)
+            ]
+            with db.engine.begin() as conn:
+                conn.execute(text(
+                    "INSERT INTO challenges (title, description, difficulty, subcategory, overview, task, outcomes) "
+                    "VALUES (:title, :description, :difficulty, :subcategory, :overview, :task, :outcomes)"
+                ), rows)
+            start = time.perf_counter()
+            rebuild_search_index()
+            build_seconds = time.perf_counter() - start
+
+            terms = [rng.choice(vocabulary[:23]) + " " + rng.choice(vocabulary) for _ in range(queries)]
+            start = time.perf_counter()
+            for q in terms:
+                search_challenges(q)
+            fts_ms = (time.perf_counter() - start) * 1000 / queries
+
+            start = time.perf_counter()
+            for q in terms:
+                clauses = []
+                params = {}
+                for i, word in enumerate(q.split()):
+                    params[f"w{i}"] = f"%{word}%"
+                    clauses.append("(" + " OR ".join(f"{c} LIKE :w{i}" for c in FTS_COLUMNS) + ")")
+                db.session.execute(text(
+                    f"SELECT id FROM challenges WHERE {' AND '.join(clauses)} LIMIT 20"
+                ), params).fetchall()
+            ilike_ms = (time.perf_counter() - start) * 1000 / queries
+            db.session.remove()
+            db.engine.dispose()
+
+    return {"size": size, "queries": queries, "index_build_s": round(build_seconds, 2),
+            "fts_ms_per_query": round(fts_ms, 3), "ilike_ms_per_query": round(ilike_ms, 3)}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Manage the challenge full-text search index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="Rebuild the FTS index from the challenges table")
+    bench = sub.add_parser("bench", help="Benchmark FTS5 against an ilike scan on synthetic data")
+    bench.add_argument("--size", type=int, default=50000, help="Number of synthetic challenges")
+    bench.add_argument("--queries", type=int, default=50, help="Number of queries to time")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        from app import create_app
+
+        app = create_app()
+        with app.app_context():
+            print(f"Indexed {rebuild_search_index()} challenges.")
+    else:
+        print(json.dumps(benchmark(args.size, args.queries), indent=2))
@@ -1,10 +1,15 @@
 # backend/seed_data.py
 
 from app import create_app
-from models import db, Challenge, Pathway
+from models import db, Pathway
+from migrations import run_migrations
+from search import rebuild_search_index
+from similarity import rebuild_similarity_index
+from cache import bump_catalogue_version
+from changes import record_changes
+from catalogue_io import import_challenges
 import csv
 import os
-import requests
 
 # URL to download seed data CSV from Google Sheets
 # If download fails, fallback to local file
@@ -12,17 +17,21 @@ import requests
 download_url = "https://docs.google.com/spreadsheets/d/1P1Q4_x8UJeU3yEiADp-JCBA6EexZJpPdpSPrEeasVNE/export?format=csv"
 local_csv = os.path.join(os.path.dirname(__file__), "seed_data_real.csv")
 
-# Try to download the CSV; if it fails, use the local file
-try:
-    response = requests.get(download_url, timeout=10)
-    response.raise_for_status()
-    with open(local_csv, "wb") as f:
-        f.write(response.content)
-    CSV_PATH = local_csv
-    print("Downloaded CSV from Google Sheets.")
-except Exception as e:
-    print(f"Could not download CSV, using local file. Reason: {e}")
-    CSV_PATH = local_csv
+def download_seed_csv():
+    """
+    Refresh the local CSV from Google Sheets and return its path.
+    If the download fails, the existing local file is used.
+    """
+    try:
+        import requests
+        response = requests.get(download_url, timeout=10)
+        response.raise_for_status()
+        with open(local_csv, "wb") as f:
+            f.write(response.content)
+        print("Downloaded CSV from Google Sheets.")
+    except Exception as e:
+        print(f"Could not download CSV, using local file. Reason: {e}")
+    return local_csv
 
 def load_challenges_from_csv(csv_path):
     """
@@ -52,44 +61,44 @@ def load_challenges_from_csv(csv_path):
     return challenges
 
 if __name__ == "__main__":
+    import sys
+
+    # --reset restores the old behaviour: drop every table (users and completions included)
+    reset = "--reset" in sys.argv
     app = create_app()
     with app.app_context():
-        db.drop_all()   # Remove old tables (so the new columns take effect)
-        db.create_all() # Recreate tables with new schema
-
-        challenges = load_challenges_from_csv(CSV_PATH)
-        for entry in challenges:
-            # Create and add Challenge objects to the DB
-            c = Challenge(
-                title=entry["title"],
-                description=entry.get("description"),
-                difficulty=entry.get("difficulty"),
-                subcategory=entry.get("subcategory"),
-                technology=entry.get("technology"),
-                dataset_url=entry.get("dataset_url"),
-                dataset_description=entry.get("dataset_description"),
-                overview=entry.get("overview"),
-                task=entry.get("task"),
-                outcomes=entry.get("outcomes"),
-                image_1=entry.get("image_1"),
-                image_2=entry.get("image_2"),
-                sample_sol=entry.get("sample_sol")
-            )
-            db.session.add(c)
+        if reset:
+            db.drop_all()
+        # Create missing tables and apply pending migrations (all of them again after --reset)
+        run_migrations()
+        if reset:
+            # drop_all() leaves the FTS table behind, so empty it to match
+            rebuild_search_index()
 
-        db.session.commit()
+        # Upsert challenges by title; users, completions and ids are preserved
+        with open(download_seed_csv(), newline='', encoding='utf-8') as f:
+            report = import_challenges(f, "csv")
+        print(f"Challenges: {report.counts['inserted']} inserted, {report.counts['updated']} updated, "
+              f"{report.counts['unchanged']} unchanged, {report.counts['errors']} rejected")
+        for row in report.rows:
+            if row["action"] == "errors":
+                print(f"  line {row['line']}: {row['error']}")
+        rebuild_similarity_index()
 
         # ── Seed Pathways Table ──────────────────────────────
         pathways = [
-            {"name": "Learn the basics of data manipulation", "challenge_ids": "1,2,3,5,6"},
-            {"name": "Learn machine learning basics", "challenge_ids": "7,8,9,10,11"},
-            {"name": "Learn to detect outliers", "challenge_ids": "2,4,13"},
-            {"name": "Build a recommender system with ML", "challenge_ids": "12,15"},
-            {"name": "Work with images", "challenge_ids": "16,17,18"},
+            {"name": "Learn the basics of data manipulation", "challenge_ids": [1, 2, 3, 5, 6]},
+            {"name": "Learn machine learning basics", "challenge_ids": [7, 8, 9, 10, 11]},
+            {"name": "Learn to detect outliers", "challenge_ids": [2, 4, 13]},
+            {"name": "Build a recommender system with ML", "challenge_ids": [12, 15]},
+            {"name": "Work with images", "challenge_ids": [16, 17, 18]},
         ]
-        for entry in pathways:
-            p = Pathway(name=entry["name"], challenge_ids=entry["challenge_ids"])
-            db.session.add(p)
-        db.session.commit()
-        print("Dropped old tables, recreated schema, and seeded from seed_data_real.csv and hardcoded pathways!")
+        # Only seed pathways into an empty table so curated edits survive a re-seed
+        if Pathway.query.count() == 0:
+            seeded = [Pathway(name=entry["name"], challenge_ids=entry["challenge_ids"]) for entry in pathways]
+            db.session.add_all(seeded)
+            db.session.flush()
+            record_changes("pathway", [p.id for p in seeded])
+            bump_catalogue_version()  # invalidate responses cached by running workers
+            db.session.commit()
         print("Database created/updated and seeded successfully!")
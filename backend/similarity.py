@@ -0,0 +1,242 @@
+# backend/similarity.py
+
+"""
+Precomputed "similar challenges" index.
+
+Each challenge gets a top-k list of neighbours stored in the
+challenge_neighbours table, so GET /api/challenges/<id>/similar and
+GET /api/recommendations are indexed lookups instead of comparing the whole
+catalogue per request. Similarity is
+
+    TEXT_WEIGHT * cosine(TF-IDF of the text fields) + TAG_WEIGHT * Jaccard(tags)
+
+where tags are the technology and subcategory tags. To keep the build far
+from O(N^2), neighbours are found through an inverted index: each term keeps
+only its MAX_POSTINGS strongest challenges, a challenge is matched on its
+QUERY_TERMS strongest terms, and terms/tags found in more than MAX_DF_RATIO
+of the catalogue are skipped. Tag overlap is then scored for the strongest
+text matches and the challenges sharing a rare tag. Weak matches are
+therefore approximate, which does not matter for a top-k list.
+
+The index is rebuilt in a background thread, debounced by
+SIMILARITY_REBUILD_DELAY seconds, after admin writes (see
+schedule_similarity_rebuild). A deleted challenge is dropped from the lists
+straight away. To rebuild by hand:
+
+    python similarity.py rebuild
+"""
+
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from flask import current_app
+from sqlalchemy import text
+from models import db, split_tags
+
+NEIGHBOURS_TABLE = "challenge_neighbours"
+# Neighbours kept per challenge
+TOP_K = 10
+TEXT_WEIGHT = 0.7
+TAG_WEIGHT = 0.3
+# Term weight per text column: words in the title say more than words in the task text
+TEXT_FIELDS = {"title": 3.0, "description": 2.0, "overview": 1.0, "task": 1.0, "outcomes": 1.0, "dataset_description": 1.0}
+# Highest-weighted terms kept per challenge vector
+MAX_TERMS = 64
+# Strongest terms of a challenge used to look for its neighbours
+QUERY_TERMS = 16
+# Challenges kept per term/tag in the inverted index
+MAX_POSTINGS = 50
+# Best text matches (times k) whose tag overlap is scored
+CANDIDATE_FACTOR = 5
+# Terms/tags found in more than this share of challenges are not used to find candidates
+MAX_DF_RATIO = 0.5
+# Below this many challenges every term is used
+MIN_CATALOGUE_FOR_DF_CUTOFF = 20
+
+_TOKEN = re.compile(r"[a-z][a-z0-9]+")
+_STOPWORDS = frozenset(
+    "the and for with this that from are you your will can how use using into our its has have was were "
+    "all any but not out their they them then than what when which who why also each other more most some "
+    "such these those been being about over only both very may".split()
+)
+
+
+def tokenize(value):
+    return [t for t in _TOKEN.findall((value or "").lower()) if t not in _STOPWORDS]
+
+
+def row_tags(row):
+    return {f"t:{t.lower()}" for t in split_tags(row.get("technology"))} | \
+           {f"s:{t.lower()}" for t in split_tags(row.get("subcategory"))}
+
+
+def compute_neighbours(rows, k=TOP_K):
+    """
+    Compute the top-k neighbours of every challenge.
+    rows are dicts with "id", the TEXT_FIELDS, "technology" and "subcategory".
+    Returns a dict of id -> [(neighbour id, score), ...], best first.
+    """
+    n = len(rows)
+    if n < 2:
+        return {r["id"]: [] for r in rows}
+    ids = [r["id"] for r in rows]
+    tags = [row_tags(r) for r in rows]
+    counts = []
+    df = Counter()
+    for r in rows:
+        tf = Counter()
+        for field, weight in TEXT_FIELDS.items():
+            for token in tokenize(r.get(field)):
+                tf[token] += weight
+        counts.append(tf)
+        df.update(tf.keys())
+
+    # Sparse, L2-normalized TF-IDF vectors truncated to their strongest terms
+    vectors = []
+    for tf in counts:
+        weights = {t: (1 + math.log(c)) * (math.log((1 + n) / (1 + df[t])) + 1) for t, c in tf.items()}
+        top = heapq.nlargest(MAX_TERMS, weights.items(), key=lambda item: item[1])
+        norm = math.sqrt(sum(w * w for _, w in top)) or 1.0
+        vectors.append({t: w / norm for t, w in top})
+
+    max_df = n * MAX_DF_RATIO if n >= MIN_CATALOGUE_FOR_DF_CUTOFF else n
+    # Impact-ordered postings: each term keeps only the challenges where it weighs most
+    postings = defaultdict(list)
+    for i, vec in enumerate(vectors):
+        for t, w in vec.items():
+            if df[t] <= max_df:
+                postings[t].append((w, i))
+    postings = {t: [(i, w) for w, i in heapq.nlargest(MAX_POSTINGS, entries)] for t, entries in postings.items()}
+    tag_df = Counter(t for ts in tags for t in ts)
+    tag_postings = defaultdict(list)
+    for i, ts in enumerate(tags):
+        for t in ts:
+            if tag_df[t] <= max_df and len(tag_postings[t]) < MAX_POSTINGS:
+                tag_postings[t].append(i)
+
+    result = {}
+    for i in range(n):
+        # Accumulate cosine contributions term by term (approximate: truncated postings)
+        cosine = defaultdict(float)
+        for t, w in heapq.nlargest(QUERY_TERMS, vectors[i].items(), key=lambda item: item[1]):
+            for j, wj in postings.get(t, ()):
+                cosine[j] += w * wj
+        cosine.pop(i, None)
+        # Tag overlap is only worked out for the best text matches and for rare-tag matches
+        candidates = set(heapq.nlargest(k * CANDIDATE_FACTOR, cosine, key=cosine.get))
+        for t in tags[i]:
+            candidates.update(tag_postings.get(t, ()))
+        candidates.discard(i)
+        scored = []
+        mine = tags[i]
+        for j in candidates:
+            shared = len(mine & tags[j])
+            union = len(mine) + len(tags[j]) - shared
+            jaccard = shared / union if union else 0.0
+            score = TEXT_WEIGHT * cosine.get(j, 0.0) + TAG_WEIGHT * jaccard
+            if score > 0:
+                scored.append((score, -ids[j], ids[j]))
+        result[ids[i]] = [(cid, round(score, 6)) for score, _, cid in heapq.nlargest(k, scored)]
+    return result
+
+
+def fill_similarity_index(conn):
+    """Recompute every neighbour list from the challenges table on conn. Returns challenges indexed."""
+    columns = ", ".join(["id", "technology", "subcategory", *TEXT_FIELDS])
+    rows = [dict(r) for r in conn.execute(text(f"SELECT {columns} FROM challenges")).mappings()]
+    neighbours = compute_neighbours(rows)
+    conn.execute(text(f"DELETE FROM {NEIGHBOURS_TABLE}"))
+    entries = [
+        {"cid": cid, "rank": rank, "nid": nid, "score": score}
+        for cid, items in neighbours.items() for rank, (nid, score) in enumerate(items)
+    ]
+    if entries:
+        conn.execute(text(
+            f"INSERT INTO {NEIGHBOURS_TABLE} (challenge_id, rank, neighbour_id, score) VALUES (:cid, :rank, :nid, :score)"
+        ), entries)
+    return len(rows)
+
+
+def rebuild_similarity_index():
+    """Recompute the whole index in one transaction. Returns challenges indexed."""
+    with db.engine.begin() as conn:
+        return fill_similarity_index(conn)
+
+
+def remove_challenge(challenge_id):
+    """Drop a challenge's list and every list entry pointing at it (on the current session)."""
+    db.session.execute(text(f"DELETE FROM {NEIGHBOURS_TABLE} WHERE challenge_id = :id OR neighbour_id = :id"),
+                       {"id": challenge_id})
+
+
+# ── Background rebuilds ──────────────────────────────
+
+
+class BackgroundRebuilder:
+    """
+    Debounced background rebuilds: schedule() marks the index stale and makes
+    sure one thread is waiting to rebuild it, so a burst of admin writes
+    causes a single rebuild.
+    """
+
+    def __init__(self, app, delay):
+        self.app = app
+        self.delay = delay
+        self.rebuilds = 0
+        self._stale = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def schedule(self):
+        with self._lock:
+            self._stale = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="similarity-rebuild", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.delay)
+            with self._lock:
+                if not self._stale:
+                    self._thread = None
+                    return
+                self._stale = False
+            try:
+                with self.app.app_context():
+                    rebuild_similarity_index()
+                self.rebuilds += 1
+            except Exception as e:
+                print(f"Error rebuilding similarity index: {str(e)}")
+
+
+def init_similarity(app):
+    """Attach the background rebuilder to the app, configured from app.config."""
+    app.config.setdefault("SIMILARITY_REBUILD_DELAY", 2.0)
+    # False rebuilds inline in the request that changed the catalogue (tests, scripts)
+    app.config.setdefault("SIMILARITY_BACKGROUND", True)
+    app.extensions["similarity"] = BackgroundRebuilder(app, app.config["SIMILARITY_REBUILD_DELAY"])
+
+
+def schedule_similarity_rebuild():
+    """Call after committing a catalogue write that may change similarities."""
+    if current_app.config["SIMILARITY_BACKGROUND"]:
+        current_app.extensions["similarity"].schedule()
+    else:
+        rebuild_similarity_index()
+
+
+if __name__ == "__main__":
+    import sys
+    from app import create_app
+
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python similarity.py rebuild")
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        count = rebuild_similarity_index()
+        print(f"Indexed {count} challenges in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,275 @@
+# backend/snapshots.py
+
+"""
+Pre-serialized, precompressed snapshots of the anonymous catalogue responses.
+
+The full challenge list and the pathway list are the same bytes for every
+visitor until an admin changes the catalogue. For the requests named in
+SNAPSHOTS, the JSON is rendered once per catalogue version and compressed
+once with gzip and (when the brotli package is installed) brotli. Requests
+are then answered from those bytes, chosen by Accept-Encoding, without
+running the view, jsonify or a compressor.
+
+Snapshots are kept in memory per worker. With SNAPSHOT_DIR set they are also
+written to disk under SNAPSHOT_DIR/<code fingerprint>/v<version>/ and other
+workers mmap the files instead of rendering them again, so the OS page cache
+holds one copy for all of them. The fingerprint hashes the backend sources,
+so files rendered by other code are never reused. Prebuild them at
+container start so the first request after a deploy is not a cold query:
+
+    python snapshots.py build
+
+Building (also done by the gunicorn master, see gunicorn.conf.py) first
+deletes every snapshot on disk: catalogue versions restart after a database
+reset, so files left by an earlier run could otherwise be served as current.
+"""
+
+import functools
+import glob
+import gzip
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from flask import current_app, request, Response
+from cache import catalogue_version
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; snapshots are then served as gzip or identity
+    brotli = None
+
+# Snapshot name -> (endpoint, exact query args it answers)
+SNAPSHOTS = {
+    "challenges": ("challenges.get_challenges", {}),
+    "challenges-summary": ("challenges.get_challenges", {"view": "summary"}),
+    "pathways": ("challenges.get_pathways", {}),
+    "pathways-embed": ("challenges.get_pathways", {"embed": "challenges"}),
+    # The filter sidebar's counts before any filter is picked
+    "facets": ("challenges.get_facets", {}),
+}
+# Content-Encoding -> file suffix, in order of preference when the client accepts several equally
+ENCODINGS = {"br": ".br", "gzip": ".gz", "identity": ""}
+# Bytes per chunk when streaming an mmap'd snapshot
+CHUNK_SIZE = 256 * 1024
+# Snapshot versions kept on disk (the current one and the one before, for workers still reading it)
+KEEP_VERSIONS = 2
+
+
+@functools.lru_cache(maxsize=1)
+def code_fingerprint():
+    """Short hash of the backend's Python sources, naming the on-disk snapshot directory."""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    sources = glob.glob(os.path.join(backend_dir, "*.py")) + glob.glob(os.path.join(backend_dir, "routes", "*.py"))
+    for path in sorted(sources):
+        digest.update(os.path.relpath(path, backend_dir).encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def compress(body, encoding):
+    """Compress body with the given encoding at maximum effort (it is done once per version)."""
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    if encoding == "br":
+        return brotli.compress(body, quality=11)
+    return body
+
+
+def available_encodings():
+    return [e for e in ENCODINGS if e != "br" or brotli is not None]
+
+
+class Snapshot:
+    """One rendered response body in every available encoding, for one catalogue version."""
+
+    def __init__(self, version, variants):
+        self.version = version
+        self.variants = variants  # encoding -> bytes or read-only mmap
+        self.etag = hashlib.blake2b(variants["identity"], digest_size=16).hexdigest()
+
+    def etag_for(self, encoding):
+        # Each encoding is a different representation, so it needs its own strong ETag
+        return self.etag if encoding == "identity" else f"{self.etag}-{encoding}"
+
+    def negotiate(self, accept_encodings):
+        """Pick the encoding with the highest client quality; ties go to ENCODINGS order."""
+        best, best_quality = "identity", 0
+        for encoding in ENCODINGS:
+            if encoding not in self.variants or encoding == "identity":
+                continue
+            quality = accept_encodings[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def to_response(self):
+        encoding = self.negotiate(request.accept_encodings)
+        etags = [self.etag_for(e) for e in self.variants]
+        if any(request.if_none_match.contains(tag) for tag in etags):
+            response = Response(status=304)
+        else:
+            body = self.variants[encoding]
+            if isinstance(body, mmap.mmap):
+                response = Response(_chunks(body), mimetype="application/json", direct_passthrough=True)
+                response.content_length = len(body)
+            else:
+                response = Response(body, mimetype="application/json")
+            if encoding != "identity":
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(self.etag_for(encoding))
+        response.headers["Cache-Control"] = current_app.config["CATALOGUE_CACHE_CONTROL"]
+        response.vary.add("Accept-Encoding")
+        return response
+
+
+def _chunks(buffer):
+    for start in range(0, len(buffer), CHUNK_SIZE):
+        yield buffer[start:start + CHUNK_SIZE]
+
+
+def snapshot_name():
+    """The SNAPSHOTS entry answering the current request exactly, or None."""
+    if any(len(values) > 1 for _, values in request.args.lists()):
+        return None
+    args = request.args.to_dict()
+    for name, (endpoint, expected) in SNAPSHOTS.items():
+        if request.endpoint == endpoint and args == expected:
+            return name
+    return None
+
+
+def render(app, name):
+    """Run the snapshot's view outside any request and return its JSON body."""
+    endpoint, args = SNAPSHOTS[name]
+    view = app.view_functions[endpoint]
+    # Skip the response cache wrapper: snapshots are cached here
+    view = getattr(view, "__wrapped__", view)
+    with app.test_request_context(query_string=args):
+        response = app.make_response(view())
+    if response.status_code != 200:
+        raise RuntimeError(f"Snapshot {name} rendered status {response.status_code}")
+    return response.get_data()
+
+
+def _write_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class SnapshotStore:
+    """This worker's snapshots, one per name, rebuilt when the catalogue version moves on."""
+
+    def __init__(self, app):
+        self.app = app
+        self.directory = app.config["SNAPSHOT_DIR"]
+        self.builds = 0
+        self._snapshots = {}
+        self._locks = {name: threading.Lock() for name in SNAPSHOTS}
+
+    def get(self, name, version):
+        snapshot = self._snapshots.get(name)
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        # One build per name at a time; concurrent requests wait for it instead of rendering too
+        with self._locks[name]:
+            snapshot = self._snapshots.get(name)
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._load(name, version) or self._build(name, version)
+                self._snapshots[name] = snapshot
+            return snapshot
+
+    @property
+    def build_dir(self):
+        """Where this code's snapshots live on disk."""
+        return os.path.join(self.directory, code_fingerprint())
+
+    def _paths(self, name, version):
+        base = os.path.join(self.build_dir, f"v{version}", f"{name}.json")
+        return {encoding: base + suffix for encoding, suffix in ENCODINGS.items()}
+
+    def _load(self, name, version):
+        if not self.directory:
+            return None
+        variants = {}
+        for encoding, path in self._paths(name, version).items():
+            if encoding not in available_encodings():
+                continue
+            try:
+                with open(path, "rb") as f:
+                    variants[encoding] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return None
+        return Snapshot(version, variants)
+
+    def _build(self, name, version):
+        body = render(self.app, name)
+        variants = {encoding: compress(body, encoding) for encoding in available_encodings()}
+        self.builds += 1
+        if self.directory:
+            paths = self._paths(name, version)
+            os.makedirs(os.path.dirname(paths["identity"]), exist_ok=True)
+            for encoding in variants:
+                _write_atomic(paths[encoding], variants[encoding])
+            self._prune(version)
+        return Snapshot(version, variants)
+
+    def _prune(self, version):
+        """Delete snapshot directories older than the last KEEP_VERSIONS versions."""
+        for entry in os.listdir(self.build_dir):
+            if entry.startswith("v") and entry[1:].isdigit() and int(entry[1:]) <= version - KEEP_VERSIONS:
+                shutil.rmtree(os.path.join(self.build_dir, entry), ignore_errors=True)
+
+    def clear(self):
+        self._snapshots.clear()
+
+    def respond(self):
+        """Answer the current request from a snapshot, or return None if it has none."""
+        name = snapshot_name()
+        if name is None:
+            return None
+        return self.get(name, catalogue_version()).to_response()
+
+    def build_all(self):
+        """
+        Delete every snapshot on disk and render them all for the current
+        version. Run at startup, before workers serve. Returns the names built.
+        """
+        if self.directory and os.path.isdir(self.directory):
+            for entry in os.listdir(self.directory):
+                shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+        self.clear()
+        version = catalogue_version()
+        for name in SNAPSHOTS:
+            self.get(name, version)
+        return list(SNAPSHOTS)
+
+
+def init_snapshots(app):
+    """Attach a SnapshotStore to the app, configured from app.config."""
+    app.config.setdefault("SNAPSHOT_DIR", os.environ.get("SNAPSHOT_DIR"))
+    app.extensions["snapshots"] = SnapshotStore(app)
+
+
+if __name__ == "__main__":
+    import sys
+    from app import create_app
+
+    if sys.argv[1:] != ["build"]:
+        sys.exit("usage: python snapshots.py build")
+    app = create_app()
+    if not app.config["SNAPSHOT_DIR"]:
+        sys.exit("Set SNAPSHOT_DIR so the workers can use the prebuilt snapshots.")
+    with app.app_context():
+        names = app.extensions["snapshots"].build_all()
+    print(f"Built snapshots: {', '.join(names)} in {app.config['SNAPSHOT_DIR']}")
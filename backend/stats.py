@@ -0,0 +1,131 @@
+# backend/stats.py
+
+"""
+Completion aggregates, maintained incrementally.
+
+challenge_stats holds each challenge's current number of completions and
+daily_activity one row per UTC day (completions marked and removed, distinct
+active learners, the latter deduplicated through daily_learners). The
+completion handlers call record_completed() / record_uncompleted() in the
+same transaction as their write, so the stats endpoints read a handful of
+precomputed rows instead of counting completed_challenges.
+
+reconcile_stats() recounts challenge_stats (and the active learners of the
+recent days) from the source tables, repairing any drift, e.g. from a
+completion written outside the handlers. Run it from a scheduled job:
+
+    python stats.py reconcile
+"""
+
+import datetime
+import time
+from sqlalchemy import delete, func, insert, update
+from dbconfig import insert_ignore
+from models import db, Challenge, ChallengeStats, CompletedChallenge, DailyActivity, DailyLearner
+
+# Days of daily_learners kept; older days only keep their active_learners count
+LEARNER_RETENTION_DAYS = 7
+# How long cached popularity rankings are served before the counters are read again
+POPULAR_CACHE_SECONDS = 60
+
+
+def today():
+    """The current UTC day (completed_at timestamps are UTC as well)."""
+    return datetime.datetime.utcnow().date()
+
+
+def popularity_window():
+    """Cache key part for responses ranked by completions: changes every POPULAR_CACHE_SECONDS."""
+    return int(time.time() // POPULAR_CACHE_SECONDS)
+
+
+def popular_challenges(limit):
+    """(Challenge, completions) pairs for the most completed challenges, most completed first."""
+    return (db.session.query(Challenge, ChallengeStats.completions)
+            .join(ChallengeStats, ChallengeStats.challenge_id == Challenge.id)
+            .filter(ChallengeStats.completions > 0)
+            .order_by(ChallengeStats.completions.desc(), Challenge.id)
+            .limit(limit).all())
+
+
+def record_completed(user_id, challenge_ids):
+    """Count completions of challenge_ids just inserted for user_id (on the current session)."""
+    if not challenge_ids:
+        return
+    stats = ChallengeStats.__table__
+    db.session.execute(insert_ignore(stats, db.session.get_bind()),
+                       [{"challenge_id": cid, "completions": 0} for cid in challenge_ids])
+    db.session.execute(update(stats).where(stats.c.challenge_id.in_(challenge_ids))
+                       .values(completions=stats.c.completions + 1))
+    _record_day(user_id, completed=len(challenge_ids))
+
+
+def record_uncompleted(user_id, challenge_ids):
+    """Count completions of challenge_ids just deleted for user_id (on the current session)."""
+    if not challenge_ids:
+        return
+    stats = ChallengeStats.__table__
+    db.session.execute(update(stats).where(stats.c.challenge_id.in_(challenge_ids), stats.c.completions > 0)
+                       .values(completions=stats.c.completions - 1))
+    _record_day(user_id, uncompleted=len(challenge_ids))
+
+
+def _record_day(user_id, completed=0, uncompleted=0):
+    day = today()
+    bind = db.session.get_bind()
+    daily = DailyActivity.__table__
+    db.session.execute(insert_ignore(daily, bind),
+                       {"day": day, "completed": 0, "uncompleted": 0, "active_learners": 0})
+    # Counts as a new active learner only if this user was not yet recorded today
+    first_today = db.session.execute(insert_ignore(DailyLearner.__table__, bind),
+                                     {"day": day, "user_id": user_id}).rowcount == 1
+    db.session.execute(update(daily).where(daily.c.day == day).values(
+        completed=daily.c.completed + completed,
+        uncompleted=daily.c.uncompleted + uncompleted,
+        active_learners=daily.c.active_learners + (1 if first_today else 0),
+    ))
+
+
+def remove_challenge(challenge_id):
+    """Drop a deleted challenge's counter (on the current session)."""
+    db.session.execute(delete(ChallengeStats.__table__).where(ChallengeStats.challenge_id == challenge_id))
+
+
+def reconcile_stats():
+    """
+    Recount challenge_stats from completed_challenges and the recent days'
+    active learners from daily_learners, and prune old daily_learners rows.
+    Commits. Returns the number of counters that were corrected.
+    """
+    counts = dict(db.session.query(CompletedChallenge.challenge_id, func.count())
+                  .group_by(CompletedChallenge.challenge_id))
+    current = dict(db.session.query(ChallengeStats.challenge_id, ChallengeStats.completions))
+    wrong = [cid for cid in counts.keys() | current.keys() if counts.get(cid, 0) != current.get(cid, 0)]
+    stats = ChallengeStats.__table__
+    if wrong:
+        db.session.execute(delete(stats).where(stats.c.challenge_id.in_(wrong)))
+        rows = [{"challenge_id": cid, "completions": counts[cid]} for cid in wrong if cid in counts]
+        if rows:
+            db.session.execute(insert(stats), rows)
+
+    learners = dict(db.session.query(DailyLearner.day, func.count()).group_by(DailyLearner.day))
+    corrected = len(wrong)
+    for day in DailyActivity.query.filter(DailyActivity.day.in_(list(learners))):
+        if day.active_learners != learners[day.day]:
+            day.active_learners = learners[day.day]
+            corrected += 1
+    cutoff = today() - datetime.timedelta(days=LEARNER_RETENTION_DAYS)
+    db.session.execute(delete(DailyLearner.__table__).where(DailyLearner.day < cutoff))
+    db.session.commit()
+    return corrected
+
+
+if __name__ == "__main__":
+    import sys
+    from app import create_app
+
+    if sys.argv[1:] != ["reconcile"]:
+        sys.exit("usage: python stats.py reconcile")
+    app = create_app()
+    with app.app_context():
+        print(f"Corrected {reconcile_stats()} counters.")
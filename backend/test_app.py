@@ -1,5 +1,107 @@
+import base64
+import csv
+import gzip
+import io
+import hashlib
+import json
+import os
+import pstats
+import re
+import sys
+import tempfile
+import threading
+import time
+import types
 import unittest
-from app import app
+import unittest.mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode
+
+# Run the suite against a throwaway in-memory database and asset directory.
+# Set TEST_DATABASE_URL (e.g. a PostgreSQL container, see run_test_matrix.sh) to
+# run it against a server database instead; its public schema is wiped per test.
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL", "sqlite://")
+os.environ["ASSET_DIR"] = tempfile.mkdtemp(prefix="dscl-assets-")
+# The rate limiting tests use per-process buckets (the limiter is off by default)
+os.environ["RATE_LIMIT_STORE"] = "memory"
+# Cheap password hashing keeps the auth tests fast
+os.environ["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:1000"
+
+from app import create_app
+from sqlalchemy import event, inspect, text
+from werkzeug.security import generate_password_hash
+from models import db, Challenge, Pathway, ChallengeTechnology, User
+from migrations import MIGRATIONS, latest_version, run_migrations
+from search import rebuild_search_index
+from cache import ResponseCache, CachedResponse, catalogue_version
+
+app = create_app()
+# Rebuild the similar-challenges index inline so tests see it straight away
+app.config["SIMILARITY_BACKGROUND"] = False
+SQLITE = app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite")
+
+
+def reset_database():
+    """Throw the test database away: dispose the in-memory SQLite engine, or empty the server's schema."""
+    db.session.remove()
+    if SQLITE:
+        db.engine.dispose()
+        return
+    with db.engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+
+
+class StubDatasetHandler(BaseHTTPRequestHandler):
+    """Stand-in for the dataset hosts: /ok (ETag "v1"), /gone (404), /flaky (503 once), /nohead (HEAD 405)."""
+    requests = []
+    flaky_calls = 0
+
+    def do_HEAD(self):
+        cls = StubDatasetHandler
+        cls.requests.append((self.command, self.path, self.headers.get("If-None-Match")))
+        if self.path == "/ok":
+            if self.headers.get("If-None-Match") == '"v1"':
+                return self.reply(304)
+            return self.reply(200, {"ETag": '"v1"', "Content-Length": "1234"})
+        if self.path == "/flaky":
+            cls.flaky_calls += 1
+            return self.reply(503 if cls.flaky_calls == 1 else 200, {"Content-Length": "0"})
+        if self.path == "/nohead":
+            return self.reply(405 if self.command == "HEAD" else 206, {"Content-Range": "bytes 0-0/99"})
+        self.reply(404)
+
+    do_GET = do_HEAD
+
+    def reply(self, status, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if "Content-Length" not in (headers or {}):
+            self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def make_challenge(**overrides):
+    """Build a Challenge with sensible defaults for the tests."""
+    data = {
+        "title": "Missing Values",
+        "description": "Deal with missing values.",
+        "difficulty": "Easy",
+        "subcategory": "Data Cleaning",
+        "technology": "sklearn, pandas",
+        "overview": "A long overview.",
+        "task": "Step 1: impute.",
+        "outcomes": "Clean data.",
+        "image_1": "https://example.com/cover.png",
+        "sample_sol": "print('hi')",
+    }
+    data.update(overrides)
+    return Challenge(**data)
+
 
 class ChallengeApiTestCase(unittest.TestCase):
     """
@@ -7,8 +109,28 @@ class ChallengeApiTestCase(unittest.TestCase):
     Tests list and detail endpoints for expected responses and types.
     """
     def setUp(self):
-        """Set up test client before each test."""
+        """Set up test client and a fresh, fully migrated database before each test."""
         self.client = app.test_client()
+        with app.app_context():
+            reset_database()
+            run_migrations()
+        app.extensions["response_cache"].clear()
+        app.extensions["catalogue_version"].invalidate()
+        app.extensions["identity_cache"].clear()
+        app.extensions["rate_limit_store"].clear()
+        app.extensions["snapshots"].clear()
+
+    def login_admin(self):
+        """Register an admin user and log the test client in as them."""
+        self.client.post('/api/register', json={"username": "admin", "password": "pw", "user_type": "admin"})
+        self.client.post('/api/login', json={"username": "admin", "password": "pw"})
+
+    def seed(self, count):
+        """Insert count challenges titled "Challenge 1".."Challenge N"."""
+        with app.app_context():
+            for i in range(1, count + 1):
+                db.session.add(make_challenge(title=f"Challenge {i}"))
+            db.session.commit()
 
     def test_challenges_list(self):
         """Test that /api/challenges returns a list and status 200."""
@@ -25,5 +147,1113 @@ class ChallengeApiTestCase(unittest.TestCase):
         if response.status_code == 200:
             self.assertIsInstance(response.json, dict)
 
+    def test_summary_view_omits_large_fields(self):
+        """Test that ?view=summary only returns the card columns."""
+        self.seed(2)
+        response = self.client.get('/api/challenges?view=summary')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json[0]), set(Challenge.SUMMARY_FIELDS))
+
+    def test_fields_projection(self):
+        """Test that ?fields= returns the requested columns plus id, and rejects unknown ones."""
+        self.seed(1)
+        response = self.client.get('/api/challenges?fields=title,difficulty')
+        self.assertEqual(response.json, [{"id": 1, "title": "Challenge 1", "difficulty": "Easy"}])
+        response = self.client.get('/api/challenges?fields=title,password')
+        self.assertEqual(response.status_code, 400)
+
+    def test_keyset_pagination(self):
+        """Test that after_id/limit walk the catalogue without gaps or repeats."""
+        self.seed(5)
+        seen = []
+        url = '/api/challenges?fields=id&limit=2'
+        while True:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(c["id"] for c in response.json)
+            cursor = response.headers.get("X-Next-After-Id")
+            if not cursor:
+                break
+            url = f'/api/challenges?fields=id&limit=2&after_id={cursor}'
+        self.assertEqual(seen, [1, 2, 3, 4, 5])
+        self.assertEqual(self.client.get('/api/challenges?limit=0').status_code, 400)
+        self.assertEqual(self.client.get('/api/challenges?limit=0').json["error"], "limit must be at least 1")
+        self.assertEqual(self.client.get('/api/changes?since=0').status_code, 200)
+    def test_batch_fetch_by_ids(self):
+        """Test that ?ids= keeps request order and reports missing ids."""
+        self.seed(3)
+        response = self.client.get('/api/challenges?ids=3,1,99&fields=title')
+        self.assertEqual([c["id"] for c in response.json], [3, 1])
+        self.assertEqual(response.headers.get("X-Missing-Ids"), "99")
+        too_many = ",".join(str(i) for i in range(1, 200))
+        self.assertEqual(self.client.get(f'/api/challenges?ids={too_many}').status_code, 400)
+
+    def test_pathways_embed_challenges(self):
+        """Test that ?embed=challenges inlines each pathway's challenges in order."""
+        self.seed(3)
+        with app.app_context():
+            db.session.add(Pathway(name="Basics", challenge_ids=[3, 1]))
+            db.session.commit()
+        response = self.client.get('/api/pathways?embed=challenges')
+        pathway = response.json[0]
+        self.assertEqual([c["id"] for c in pathway["challenges"]], [3, 1])
+        self.assertEqual(set(pathway["challenges"][0]), set(Challenge.SUMMARY_FIELDS))
+        self.assertNotIn("challenges", self.client.get('/api/pathways').json[0])
+    def test_tag_filters_match_whole_tags(self):
+        """Test exact, multi-value any/all filtering on the normalized tag tables."""
+        with app.app_context():
+            db.session.add(make_challenge(title="Torch", technology="PyTorch, numpy"))
+            db.session.add(make_challenge(title="Pandas", technology="pandas, numpy", subcategory="Statistics"))
+            db.session.add(make_challenge(title="R", technology="R", difficulty="Hard"))
+            db.session.commit()
+
+        def titles(query):
+            return [c["title"] for c in self.client.get(f'/api/challenges?fields=title&{query}').json]
+
+        self.assertEqual(titles('technology=r'), ["R"])
+        self.assertEqual(titles('technology=pytorch,pandas'), ["Torch", "Pandas"])
+        self.assertEqual(titles('technology=pytorch,numpy&match=all'), ["Torch"])
+        self.assertEqual(titles('subcategory=Statistics'), ["Pandas"])
+        self.assertEqual(titles('difficulty=Easy,Hard&technology=numpy'), ["Torch", "Pandas"])
+        self.assertEqual(self.client.get('/api/challenges?match=some').status_code, 400)
+
+    def test_frontend_subcategory_tabs_match_whole_tags(self):
+        """Test every subcategory tab of the home page against the real catalogue's tags."""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with open(os.path.join(root, "frontend", "src", "app", "page.js")) as f:
+            source = f.read()
+        block = source[source.index("const SUBCATEGORIES = ["):]
+        tabs = re.findall(r'\{ key: "([^"]+)", label: "([^"]+)" \}', block[:block.index("];")])
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "seed_data_real.csv")) as f:
+            subcategories = [row["subcategory"] for row in csv.DictReader(f)]
+        with app.app_context():
+            for i, subcategory in enumerate(subcategories):
+                db.session.add(make_challenge(title=f"Challenge {i}", subcategory=subcategory))
+            db.session.commit()
+        for key, label in tabs:
+            if key == "All":
+                continue
+            # Each tab shows what its label matched as a substring before tags were normalized
+            expected = sum(label.lower() in s.lower() for s in subcategories)
+            params = urlencode({"subcategory": key})
+            self.assertEqual((label, len(self.client.get(f'/api/challenges?{params}').json)), (label, expected))
+            self.assertGreater(expected, 0)
+
+    def test_tags_follow_updates(self):
+        """Test that changing the technology column rewrites its tag rows."""
+        self.seed(1)
+        with app.app_context():
+            challenge = db.session.get(Challenge, 1)
+            challenge.technology = "pandas, keras"
+            db.session.commit()
+            names = sorted(t.name for t in ChallengeTechnology.query.filter_by(challenge_id=1))
+        self.assertEqual(names, ["keras", "pandas"])
+
+    def test_migration_backfills_tags(self):
+        """Test that the tag migration builds the tables from existing rows."""
+        with app.app_context():
+            db.session.execute(text(
+                "INSERT INTO challenges (title, difficulty, subcategory, technology) "
+                "VALUES ('Old', 'Easy', 'Outliers, Data Cleaning', 'pandas, sklearn')"))
+            db.session.execute(text("DROP TABLE IF EXISTS schema_version"))
+            db.session.commit()
+            self.assertEqual(ChallengeTechnology.query.count(), 0)
+            self.assertIn(1, run_migrations())
+            self.assertEqual(ChallengeTechnology.query.count(), 2)
+            self.assertEqual(run_migrations(), [])
+    def test_migrations_rebuild_schema_after_drop_all(self):
+        """Test that run_migrations after db.drop_all() (seed_data.py --reset) recreates the tables and reapplies migrations."""
+        with app.app_context():
+            db.drop_all()
+            self.assertEqual(run_migrations(), sorted(version for version, _ in MIGRATIONS))
+            tables = inspect(db.engine).get_table_names()
+            self.assertTrue({"challenges", "users", "pathways", "catalogue_changes"} <= set(tables))
+            indexes = {index["name"] for index in inspect(db.engine).get_indexes("challenges")}
+            self.assertIn("ix_challenges_difficulty", indexes)
+            self.assertEqual(run_migrations(), [])
+        self.login_admin()
+        self.assertEqual(self.client.post('/api/admin/challenges', json={
+            "title": "After reset", "difficulty": "Easy", "subcategory": "X"}).status_code, 201)
+
+    def test_search_ranks_and_highlights(self):
+        """Test that search ranks title hits first and returns escaped, highlighted snippets."""
+        with app.app_context():
+            db.session.add(make_challenge(title="Outlier hunting", overview="Find <b>odd</b> points."))
+            db.session.add(make_challenge(title="Housing prices", task="Remove each outlier first."))
+            db.session.commit()
+            rebuild_search_index()
+        results = self.client.get('/api/challenges/search?q=outlier').json
+        self.assertEqual([r["title"] for r in results], ["<mark>Outlier</mark> hunting", "Housing prices"])
+        self.assertIn("<mark>outlier</mark>", results[1]["snippet"])
+        results = self.client.get('/api/challenges/search?q=odd').json
+        self.assertIn("&lt;b&gt;<mark>odd</mark>&lt;/b&gt;", results[0]["snippet"])
+        self.assertEqual(self.client.get('/api/challenges/search?q=').status_code, 400)
+
+    def test_search_index_follows_admin_writes(self):
+        """Test that admin create/update/delete keep the search index in sync."""
+        self.login_admin()
+        created = self.client.post('/api/admin/challenges', json={
+            "title": "Sentiment basics", "difficulty": "Easy", "subcategory": "NLP"}).json
+
+        def search_ids(q):
+            return [r["id"] for r in self.client.get(f'/api/challenges/search?q={q}').json]
+
+        self.assertEqual(search_ids("sentiment"), [created["id"]])
+        self.client.put(f'/api/admin/challenges/{created["id"]}', json={"title": "Tweet moods"})
+        self.assertEqual(search_ids("sentiment"), [])
+        self.assertEqual(search_ids("tweet"), [created["id"]])
+        self.client.delete(f'/api/admin/challenges/{created["id"]}')
+        self.assertEqual(search_ids("tweet"), [])
+    def test_etag_and_not_modified(self):
+        """Test that catalogue responses carry an ETag and answer If-None-Match with 304."""
+        self.seed(1)
+        first = self.client.get('/api/challenges/1')
+        etag = first.headers["ETag"]
+        self.assertIn("must-revalidate", first.headers["Cache-Control"])
+        second = self.client.get('/api/challenges/1', headers={"If-None-Match": etag})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b"")
+
+    def test_admin_write_invalidates_cache(self):
+        """Test that an admin update bumps the catalogue version and changes the ETag."""
+        self.seed(1)
+        self.login_admin()
+        etag = self.client.get('/api/challenges').headers["ETag"]
+        self.client.put('/api/admin/challenges/1', json={"title": "Renamed"})
+        response = self.client.get('/api/challenges', headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json[0]["title"], "Renamed")
+
+    def test_response_cache_is_bounded(self):
+        """Test LRU eviction by entry count and by total size."""
+        cache = ResponseCache(max_entries=2, max_bytes=10)
+        cache.put("a", CachedResponse(b"aaaa", "application/json", {}))
+        cache.put("b", CachedResponse(b"bbbb", "application/json", {}))
+        cache.get("a")
+        cache.put("c", CachedResponse(b"cccc", "application/json", {}))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        cache.put("d", CachedResponse(b"dddddddd", "application/json", {}))
+        self.assertEqual(len(cache), 1)
+        self.assertLessEqual(cache.total_bytes, 10)
+    def test_inline_images_move_to_asset_store(self):
+        """Test that a data: URI becomes an asset reference served with Range and immutable caching."""
+        self.login_admin()
+        payload = b"\x89PNG fake image bytes"
+        data_uri = "data:image/png;base64," + base64.b64encode(payload).decode()
+        created = self.client.post('/api/admin/challenges', json={
+            "title": "Images", "difficulty": "Easy", "subcategory": "Vision", "image_1": data_uri}).json
+        self.assertTrue(created["image_1"].startswith("/api/assets/"))
+
+        response = self.client.get(created["image_1"])
+        self.assertEqual(response.data, payload)
+        self.assertEqual(response.mimetype, "image/png")
+        self.assertIn("immutable", response.headers["Cache-Control"])
+        partial = self.client.get(created["image_1"], headers={"Range": "bytes=0-3"})
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.data, payload[:4])
+        self.assertEqual(self.client.get('/api/assets/' + "0" * 64).status_code, 404)
+
+        bad = self.client.post('/api/admin/challenges', json={
+            "title": "Bad", "difficulty": "Easy", "subcategory": "Vision", "image_1": "data:text/html,<p>"})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_svg_assets_are_rejected_and_never_rendered(self):
+        """Test that SVG uploads are refused and assets are served with nosniff, a sandbox CSP, legacy types as downloads."""
+        import assets
+        self.login_admin()
+        svg = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'
+        upload = self.client.post('/api/admin/assets', data={"file": (io.BytesIO(svg), "x.svg", "image/svg+xml")})
+        self.assertEqual(upload.status_code, 400)
+        inline = self.client.post('/api/admin/challenges', json={
+            "title": "Svg", "difficulty": "Easy", "subcategory": "Vision",
+            "image_1": "data:image/svg+xml;base64," + base64.b64encode(svg).decode()})
+        self.assertEqual(inline.status_code, 400)
+
+        png = self.client.post('/api/admin/assets', data={"file": (io.BytesIO(b"\x89PNG"), "x.png", "image/png")}).json
+        response = self.client.get(png["url"])
+        self.assertEqual(response.headers["X-Content-Type-Options"], "nosniff")
+        self.assertIn("sandbox", response.headers["Content-Security-Policy"])
+        self.assertTrue(response.headers["Content-Disposition"].startswith("inline"))
+
+        # An SVG stored before the allowlist existed is only ever downloaded
+        with app.app_context():
+            legacy = hashlib.sha256(svg).hexdigest()
+            os.makedirs(os.path.dirname(assets.asset_path(legacy)), exist_ok=True)
+            with open(assets.asset_path(legacy), "wb") as f:
+                f.write(svg)
+            db.session.execute(text("INSERT INTO assets (hash, content_type, size) VALUES (:h, 'image/svg+xml', :s)"),
+                               {"h": legacy, "s": len(svg)})
+            db.session.commit()
+        response = self.client.get('/api/assets/' + legacy)
+        self.assertEqual(response.mimetype, "application/octet-stream")
+        self.assertTrue(response.headers["Content-Disposition"].startswith("attachment"))
+
+    def test_failed_thumbnails_fall_back_without_leaving_files(self):
+        """Test that a thumbnail whose save fails or whose image is a decompression bomb serves the original."""
+        import assets
+
+        class DecompressionBombError(Exception):
+            pass
+
+        class FailingImage:
+            format = "PNG"
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def thumbnail(self, size):
+                pass
+
+            def save(self, f, format):
+                f.write(b"partial")
+                raise OSError("disk full")
+
+        def bomb(path):
+            raise DecompressionBombError("too many pixels")
+        self.login_admin()
+        png = self.client.post('/api/admin/assets', data={"file": (io.BytesIO(b"\x89PNG thumb"), "t.png", "image/png")}).json
+        with app.app_context():
+            directory = os.path.dirname(assets.asset_path(png["hash"]))
+        for open_image in (lambda path: FailingImage(), bomb):
+            pillow = types.SimpleNamespace(open=open_image, DecompressionBombError=DecompressionBombError)
+            with unittest.mock.patch.object(assets, "_pillow_image", return_value=pillow):
+                response = self.client.get(png["url"] + "?variant=thumb")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data, b"\x89PNG thumb")
+            self.assertEqual(os.listdir(directory), [png["hash"]])
+
+    def test_migration_extracts_inline_images(self):
+        """Test that the image migration rewrites existing inline images to references."""
+        data_uri = "data:image/gif;base64," + base64.b64encode(b"GIF89a").decode()
+        with app.app_context():
+            db.session.add(make_challenge(image_1=data_uri, image_2="https://example.com/a.png"))
+            db.session.execute(text("DELETE FROM schema_version WHERE version >= 4"))
+            db.session.commit()
+            self.assertEqual(run_migrations()[0], 4)
+            challenge = db.session.get(Challenge, 1)
+            self.assertTrue(challenge.image_1.startswith("/api/assets/"))
+            self.assertEqual(challenge.image_2, "https://example.com/a.png")
+    def count_queries(self, func):
+        """Run func and return how many SQL statements it executed."""
+        statements = []
+        with app.app_context():
+            engine = db.engine
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            func()
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        return len(statements)
+
+    def test_me_served_from_session_claim(self):
+        """Test that /api/me and admin checks do not touch the database after login."""
+        self.login_admin()
+        response = self.client.get('/api/me')
+        self.assertEqual(response.json, {"username": "admin", "user_type": "admin"})
+        self.assertEqual(self.count_queries(lambda: self.client.get('/api/me')), 0)
+        self.assertEqual(self.count_queries(lambda: self.client.get('/api/admin/challenges')), 1)
+
+    def test_login_rehashes_to_configured_method(self):
+        """Test that login reports hashing time and upgrades hashes made with another method."""
+        with app.app_context():
+            user = User(username="old", password_hash=generate_password_hash("pw", method="pbkdf2:sha256:2000"))
+            db.session.add(user)
+            db.session.commit()
+        response = self.client.post('/api/login', json={"username": "old", "password": "pw"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("hash;dur=", response.headers["Server-Timing"])
+        with app.app_context():
+            stored = User.query.filter_by(username="old").first().password_hash
+        self.assertTrue(stored.startswith("pbkdf2:sha256:1000$"))
+
+    def test_short_hash_method_names_do_not_rehash_every_login(self):
+        """Test that methods werkzeug expands when storing ("scrypt", "pbkdf2:sha256") match their own hashes."""
+        with app.app_context():
+            try:
+                for method in ("scrypt", "pbkdf2:sha256", "pbkdf2"):
+                    app.config["PASSWORD_HASH_METHOD"] = method
+                    user = User(username="u")
+                    user.set_password("pw")
+                    self.assertFalse(user.needs_rehash(), method)
+                app.config["PASSWORD_HASH_METHOD"] = "scrypt"
+                self.assertTrue(user.needs_rehash())
+            finally:
+                app.config["PASSWORD_HASH_METHOD"] = os.environ["PASSWORD_HASH_METHOD"]
+
+    def test_mark_and_unmark_completion(self):
+        """Test single mark/unmark, idempotency and 404 for unknown challenges."""
+        self.seed(2)
+        self.login_admin()
+        self.assertEqual(self.client.post('/api/completed-challenges/1').status_code, 201)
+        self.assertEqual(self.client.post('/api/completed-challenges/1').status_code, 201)
+        self.assertEqual(self.client.post('/api/completed-challenges/99').status_code, 404)
+        self.assertEqual([c["id"] for c in self.client.get('/api/completed-challenges').json], [1])
+        self.assertEqual(self.client.delete('/api/completed-challenges/1').status_code, 200)
+        self.assertEqual(self.client.get('/api/completed-challenges').json, [])
+
+    def test_bulk_completion_and_progress(self):
+        """Test the bulk set-diff update and the per-pathway progress summary."""
+        self.seed(4)
+        with app.app_context():
+            db.session.add(Pathway(name="Basics", challenge_ids=[1, 2, 3, 4]))
+            db.session.commit()
+        self.login_admin()
+        self.client.post('/api/completed-challenges/4')
+        response = self.client.put('/api/completed-challenges', json={"add": [1, 2, 4], "remove": [3]})
+        self.assertEqual(response.json, {"added": [1, 2], "removed": []})
+        response = self.client.put('/api/completed-challenges', json={"add": [99], "remove": [4]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json["missing"], [99])
+
+        progress = self.client.get('/api/progress').json
+        self.assertEqual(sorted(progress["completedIds"]), [1, 2, 4])
+        self.assertEqual(progress["total"], 4)
+        self.assertEqual(progress["pathways"][0]["completed"], 3)
+        self.assertEqual(progress["pathways"][0]["percent"], 75.0)
+    def test_bulk_import_upserts_by_title(self):
+        """Test dry run, insert, update-by-title and row validation of the streaming import."""
+        self.seed(1)
+        self.login_admin()
+        csv_body = (
+            "title,difficulty,subcategory,technology,overview\n"
+            "Challenge 1,Hard,Data Cleaning,\"pandas, polars\",Updated overview\n"
+            "Brand new,Easy,Statistics,numpy,Fresh\n"
+            ",Easy,Statistics,numpy,No title\n"
+        )
+        dry = self.client.post('/api/admin/challenges/import?dry_run=1', data=csv_body).json
+        self.assertEqual((dry["inserted"], dry["updated"], dry["errors"]), (1, 1, 1))
+        self.assertEqual(len(self.client.get('/api/challenges').json), 1)
+
+        report = self.client.post('/api/admin/challenges/import', data=csv_body).json
+        self.assertEqual(report["rows"][0]["fields"], ["difficulty", "overview", "technology"])
+        titles = [c["title"] for c in self.client.get('/api/challenges?technology=polars').json]
+        self.assertEqual(titles, ["Challenge 1"])
+        self.assertEqual([r["title"] for r in self.client.get('/api/challenges/search?q=fresh').json], ["Brand new"])
+        again = self.client.post('/api/admin/challenges/import', data=csv_body).json
+        self.assertEqual((again["inserted"], again["updated"], again["unchanged"]), (0, 0, 2))
+
+    def test_streaming_export_round_trips(self):
+        """Test that the NDJSON export streams every challenge and can be re-imported unchanged."""
+        self.seed(3)
+        self.login_admin()
+        response = self.client.get('/api/admin/challenges/export?format=ndjson')
+        self.assertTrue(response.is_streamed)
+        lines = response.data.decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        report = self.client.post('/api/admin/challenges/import?format=ndjson', data=response.data).json
+        self.assertEqual(report["unchanged"], 3)
+
+    def test_inline_images_are_stored_only_when_written(self):
+        """Test that dry-run imports and conflicting PATCHes validate inline images without leaving files behind."""
+        import assets
+        self.seed(1)
+        self.login_admin()
+        payload = b"GIF89a stored only when written"
+        data_uri = "data:image/gif;base64," + base64.b64encode(payload).decode()
+        with app.app_context():
+            path = assets.asset_path(hashlib.sha256(payload).hexdigest())
+        row = json.dumps({"title": "Pictured", "difficulty": "Easy", "subcategory": "X", "image_1": data_uri})
+
+        dry = self.client.post('/api/admin/challenges/import?format=ndjson&dry_run=1', data=row).json
+        self.assertEqual(dry["inserted"], 1)
+        stale = self.client.patch('/api/admin/challenges/1', json={"image_1": data_uri}, headers={"If-Match": '"v7"'})
+        self.assertEqual(stale.status_code, 412)
+        self.assertFalse(os.path.exists(path))
+
+        patched = self.client.patch('/api/admin/challenges/1', json={"image_1": data_uri}, headers={"If-Match": '"v1"'})
+        self.assertEqual(patched.json["image_1"], "/api/assets/" + hashlib.sha256(payload).hexdigest())
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(self.client.get(patched.json["image_1"]).data, payload)
+        report = self.client.post('/api/admin/challenges/import?format=ndjson', data=row).json
+        self.assertEqual(report["inserted"], 1)
+        with app.app_context():
+            self.assertEqual(Challenge.query.filter_by(title="Pictured").one().image_1, patched.json["image_1"])
+
+    def test_csv_export_round_trips_nulls(self):
+        """Test that re-importing an unchanged CSV export (NULLs written as empty cells) changes nothing."""
+        self.seed(2)
+        with app.app_context():
+            db.session.add(Challenge(title="Sparse", difficulty="Easy", subcategory="Statistics"))
+            db.session.commit()
+        self.login_admin()
+        exported = self.client.get('/api/admin/challenges/export?format=csv').data
+        feed = self.client.get('/api/changes').json["seq"]
+        report = self.client.post('/api/admin/challenges/import?format=csv', data=exported).json
+        self.assertEqual((report["unchanged"], report["updated"], report["rows"]), (3, 0, []))
+        versions = {c["id"]: c["version"] for c in self.client.get('/api/admin/challenges').json}
+        self.assertEqual(set(versions.values()), {1})
+        self.assertEqual(self.client.get(f'/api/changes?since={feed}').json["challenges"], [])
+        # A new row's empty cells are stored as NULL, not ""
+        self.client.post('/api/admin/challenges/import', data="title,difficulty,subcategory,overview\nNew,Easy,X,\n")
+        with app.app_context():
+            self.assertIsNone(Challenge.query.filter_by(title="New").one().overview)
+
+    def test_export_streams_lazily_with_metrics(self):
+        """Test that recording the response size does not run the export generator before it is sent."""
+        import catalogue_io
+        produced = []
+
+        def export(fmt):
+            for i in range(3):
+                produced.append(i)
+                yield f"{i}\n"
+
+        self.login_admin()
+        with unittest.mock.patch.object(catalogue_io, "export_challenges", export):
+            response = self.client.get('/api/admin/challenges/export')
+            # stream_with_context primes the generator with its first chunk only
+            self.assertEqual(produced, [0])
+            self.assertEqual(response.get_data(as_text=True), "0\n1\n2\n")
+        self.assertEqual(produced, [0, 1, 2])
+
+    def test_pathways_contains_and_admin_crud(self):
+        """Test admin pathway CRUD validation, ?contains= lookup and membership cleanup on delete."""
+        self.seed(3)
+        self.login_admin()
+        bad = self.client.post('/api/admin/pathways', json={"name": "P", "challengeIds": [1, 99]})
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(bad.json["missing"], [99])
+        dup = self.client.post('/api/admin/pathways', json={"name": "P", "challengeIds": [1, 1]})
+        self.assertEqual(dup.status_code, 400)
+        created = self.client.post('/api/admin/pathways', json={"name": "P", "challengeIds": [3, 1]})
+        self.assertEqual(created.status_code, 201)
+        pid = created.json["id"]
+        self.assertEqual([p["id"] for p in self.client.get('/api/pathways?contains=1').json], [pid])
+        self.assertEqual(self.client.get('/api/pathways?contains=2').json, [])
+
+        updated = self.client.put(f'/api/admin/pathways/{pid}', json={"challengeIds": [2, 3]})
+        self.assertEqual(updated.json["challengeIds"], [2, 3])
+        self.client.delete('/api/admin/challenges/2')
+        self.assertEqual(self.client.get('/api/pathways').json[0]["challengeIds"], [3])
+        self.assertEqual(self.client.delete(f'/api/admin/pathways/{pid}').status_code, 200)
+        self.assertEqual(self.client.get('/api/pathways').json, [])
+
+    @unittest.skipUnless(SQLITE, "recreates the legacy table with SQLite DDL")
+    def test_migration_normalizes_legacy_pathway_column(self):
+        """Test that migration 6 moves comma-separated challenge ids into ordered memberships."""
+        self.seed(3)
+        with app.app_context():
+            with db.engine.begin() as conn:
+                conn.execute(text("DELETE FROM schema_version WHERE version >= 6"))
+                conn.execute(text("DROP TABLE pathways"))
+                conn.execute(text("CREATE TABLE pathways (id INTEGER PRIMARY KEY, name VARCHAR(100), challenge_ids TEXT)"))
+                conn.execute(text("INSERT INTO pathways VALUES (1, 'Legacy', '3, 1,99,3')"))
+            run_migrations()
+        self.assertEqual(self.client.get('/api/pathways').json[0]["challengeIds"], [3, 1])
+
+    def test_metrics_record_requests_and_flag_n_plus_one(self):
+        """Test /metrics exposition, the JSON request log and N+1 detection."""
+        self.seed(3)
+        with self.assertLogs("dscl.requests", level="INFO") as logs:
+            self.client.get('/api/challenges/1')
+        entry = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((entry["endpoint"], entry["status"]), ("/api/challenges/<int:id>", 200))
+        self.assertGreater(entry["sql_count"], 0)
+
+        # Routes cannot be added to the shared app once it has served requests, so use a fresh one
+        probe = create_app()
+        probe.config["N_PLUS_ONE_THRESHOLD"] = 3
+        with probe.app_context():
+            run_migrations()
+
+        @probe.route('/_test/n_plus_one')
+        def n_plus_one():
+            for i in range(1, 4):
+                db.session.execute(text("SELECT title FROM challenges WHERE id = :id"), {"id": i})
+            return {}
+        with self.assertLogs("dscl.requests", level="INFO") as logs:
+            probe.test_client().get('/_test/n_plus_one')
+        self.assertEqual(json.loads(logs.records[-1].getMessage())["n_plus_one"][0]["count"], 3)
+        probe_metrics = probe.test_client().get('/metrics').data.decode()
+        self.assertIn('dscl_n_plus_one_total{endpoint="/_test/n_plus_one",method="GET"} 1', probe_metrics)
+
+        body = self.client.get('/metrics').data.decode()
+        self.assertIn('dscl_request_duration_seconds_count{endpoint="/api/challenges/<int:id>",method="GET",status="200"}', body)
+
+    def test_profile_header_dumps_profile(self):
+        """Test that a request with the profiling token writes a cProfile dump."""
+        app.config["PROFILE_TOKEN"] = "secret"
+        app.config["PROFILE_DIR"] = tempfile.mkdtemp(prefix="dscl-profiles-")
+        try:
+            plain = self.client.get('/api/challenges', headers={"X-Profile": "wrong"})
+            self.assertNotIn("X-Profile-Dump", plain.headers)
+            response = self.client.get('/api/challenges', headers={"X-Profile": "secret"})
+            dump = os.path.join(app.config["PROFILE_DIR"], response.headers["X-Profile-Dump"])
+            self.assertTrue(pstats.Stats(dump).total_calls > 0)
+        finally:
+            app.config["PROFILE_TOKEN"] = None
+
+    def test_failing_request_stops_profiler_and_is_recorded(self):
+        """Test that a view raising under the profiler leaves no profiler running and still counts as a 500."""
+        probe = create_app()
+        probe.config["PROFILE_TOKEN"] = "secret"
+        probe.config["PROFILE_DIR"] = tempfile.mkdtemp(prefix="dscl-profiles-")
+        # Let the exception reach the test client, skipping the after_request hooks
+        probe.config["PROPAGATE_EXCEPTIONS"] = True
+
+        @probe.route('/_test/fail')
+        def fail():
+            raise RuntimeError("boom")
+        with self.assertRaises(RuntimeError):
+            probe.test_client().get('/_test/fail', headers={"X-Profile": "secret"})
+        self.assertIsNone(sys.getprofile())
+        body = probe.test_client().get('/metrics').data.decode()
+        self.assertIn('dscl_request_duration_seconds_count{endpoint="/_test/fail",method="GET",status="500"} 1', body)
+
+    def test_benchmark_data_and_regression_check(self):
+        """Test the synthetic catalogue generator and the benchmark regression comparison."""
+        from bench.api import compare
+        from bench.datagen import populate
+        with app.app_context():
+            summary = populate(challenges=20, users=3, completions_per_user=4, pathways=2, seed=1)
+        self.assertEqual((summary["challenges"], summary["users"]), (20, 3))
+        self.assertEqual(len(self.client.get('/api/pathways').json), 2)
+        self.client.post('/api/login', json={"username": "learner0", "password": "learner"})
+        self.assertEqual(len(self.client.get('/api/completed-challenges').json), 4)
+
+        baseline = {"results": {"client": {"detail": {"p95_ms": 10.0}, "list": {"p95_ms": 10.0}}}}
+        current = {"results": {"client": {"detail": {"p95_ms": 10.5}, "list": {"p95_ms": 13.0}}}}
+        self.assertFalse(compare(baseline, current, 0.5)[1])
+        rows, regressed = compare(baseline, current, 0.2)
+        self.assertTrue(regressed)
+        self.assertEqual(rows[1][:2], ("client", "list"))
+
+    def test_similar_challenges_and_recommendations(self):
+        """Test that similar lists and recommendations come from the precomputed index."""
+        self.login_admin()
+        specs = [
+            ("Churn with XGBoost", "Gradient boosting churn prediction", "Classification", "xgboost"),
+            ("Boosted churn model", "Tune gradient boosting for churn", "Classification", "xgboost"),
+            ("Clustering shoppers", "Segment customers with kmeans clustering", "Clustering", "sklearn"),
+            ("Kmeans segments", "Customer segmentation using kmeans clustering", "Clustering", "sklearn"),
+        ]
+        for title, description, subcategory, technology in specs:
+            self.client.post('/api/admin/challenges', json={
+                "title": title, "description": description, "difficulty": "Medium",
+                "subcategory": subcategory, "technology": technology})
+        similar = self.client.get('/api/challenges/1/similar').json
+        # Nothing links the churn challenges to the clustering ones
+        self.assertEqual([c["id"] for c in similar], [2])
+        self.assertGreater(similar[0]["score"], 0.5)
+        self.assertNotIn("overview", similar[0])
+        self.assertEqual(self.client.get('/api/challenges/99/similar').status_code, 404)
+
+        self.client.post('/api/completed-challenges/3')
+        picks = self.client.get('/api/recommendations?limit=3').json
+        self.assertEqual((picks[0]["id"], picks[0]["reason"]), (4, "similar"))
+        self.assertNotIn(3, [p["id"] for p in picks])
+        self.assertEqual(len(picks), 3)
+
+        self.client.delete('/api/admin/challenges/4')
+        self.assertNotIn(4, [c["id"] for c in self.client.get('/api/challenges/3/similar').json])
+
+    def test_similarity_rebuilds_in_background(self):
+        """Test that a burst of scheduled rebuilds is debounced into one background rebuild."""
+        from similarity import BackgroundRebuilder
+        self.seed(2)
+        rebuilder = BackgroundRebuilder(app, delay=0.05)
+        for _ in range(5):
+            rebuilder.schedule()
+        for _ in range(100):
+            if rebuilder._thread is None:
+                break
+            time.sleep(0.02)
+        self.assertEqual(rebuilder.rebuilds, 1)
+        with app.app_context():
+            self.assertEqual(db.session.execute(text("SELECT COUNT(*) FROM challenge_neighbours")).scalar(), 2)
+
+    def test_rate_limit_spends_endpoint_costs(self):
+        """Test that login costs more than a read and an empty bucket answers 429 with Retry-After."""
+        app.config["RATE_LIMIT_CAPACITY"] = 25
+        try:
+            for _ in range(2):
+                self.assertEqual(self.client.post('/api/login', json={"username": "x", "password": "y"}).status_code, 401)
+            limited = self.client.post('/api/login', json={"username": "x", "password": "y"})
+            self.assertEqual(limited.status_code, 429)
+            self.assertGreaterEqual(int(limited.headers["Retry-After"]), 1)
+            # Five tokens remain: enough for a cheap read, and /metrics is never limited
+            self.assertEqual(self.client.get('/api/challenges/1').status_code, 404)
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+        finally:
+            app.config["RATE_LIMIT_CAPACITY"] = 60
+
+    def test_rate_limiting_is_off_unless_configured(self):
+        """Test that a default deploy (all clients behind the frontend's proxy) is not rate limited."""
+        with unittest.mock.patch.dict(os.environ):
+            os.environ.pop("RATE_LIMIT_STORE")
+            self.assertIsNone(create_app().extensions["rate_limit_store"])
+
+    def test_sqlite_bucket_store_is_shared(self):
+        """Test that two SQLite stores on one file (two workers) draw from the same bucket."""
+        from ratelimit import SQLiteBucketStore
+        path = os.path.join(tempfile.mkdtemp(prefix="dscl-ratelimit-"), "buckets.db")
+        first, second = SQLiteBucketStore(path), SQLiteBucketStore(path)
+        self.assertTrue(first.consume("ip:1", 6, 10, 0.001)[0])
+        allowed, retry_after = second.consume("ip:1", 6, 10, 0.001)
+        self.assertFalse(allowed)
+        self.assertGreater(retry_after, 1000)
+        self.assertTrue(second.consume("ip:2", 6, 10, 0.001)[0])
+
+    def test_admission_control_sheds_with_503(self):
+        """Test that requests beyond the concurrency cap are shed with 503 and Retry-After."""
+        slots = threading.BoundedSemaphore(1)
+        app.extensions["admission_slots"] = slots
+        try:
+            self.assertEqual(self.client.get('/api/challenges').status_code, 200)
+            slots.acquire()  # another request in flight
+            shed = self.client.get('/api/challenges')
+            self.assertEqual(shed.status_code, 503)
+            self.assertEqual(shed.headers["Retry-After"], "1")
+            slots.release()
+        finally:
+            app.extensions["admission_slots"] = None
+
+    def test_catalogue_snapshots_negotiate_encoding(self):
+        """Test that full-catalogue responses come precompressed from one build per catalogue version."""
+        self.seed(3)
+        store = app.extensions["snapshots"]
+        builds = store.builds
+        plain = self.client.get('/api/challenges')
+        self.assertEqual(len(plain.json), 3)
+        self.assertIn("Accept-Encoding", plain.headers["Vary"])
+        gz = self.client.get('/api/challenges', headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(gz.headers["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(gz.data)), plain.json)
+        br = self.client.get('/api/challenges', headers={"Accept-Encoding": "gzip;q=0.5, br"})
+        self.assertEqual(br.headers["Content-Encoding"], "br")
+        self.assertEqual(store.builds, builds + 1)
+        not_modified = self.client.get('/api/challenges', headers={"If-None-Match": gz.headers["ETag"]})
+        self.assertEqual(not_modified.status_code, 304)
+        # Filtered requests are not snapshots
+        self.assertNotIn("Content-Encoding", self.client.get('/api/challenges?difficulty=Easy',
+                                                             headers={"Accept-Encoding": "gzip"}).headers)
+
+        self.login_admin()
+        self.client.put('/api/admin/challenges/1', json={"title": "Renamed"})
+        self.assertEqual(self.client.get('/api/challenges').json[0]["title"], "Renamed")
+        self.assertEqual(store.builds, builds + 2)
+
+    def test_snapshots_are_shared_through_disk(self):
+        """Test that a prebuilt on-disk snapshot is mmap'd by another worker instead of re-rendered."""
+        from snapshots import SnapshotStore
+        self.seed(2)
+        app.config["SNAPSHOT_DIR"] = tempfile.mkdtemp(prefix="dscl-snapshots-")
+        try:
+            builder, worker = SnapshotStore(app), SnapshotStore(app)
+            with app.app_context():
+                builder.build_all()
+                snapshot = worker.get("challenges-summary", builder.get("challenges", 0).version)
+            self.assertEqual(worker.builds, 0)
+            self.assertEqual(len(json.loads(snapshot.variants["identity"][:])), 2)
+        finally:
+            app.config["SNAPSHOT_DIR"] = None
+
+    def test_snapshots_on_disk_are_not_reused_across_code_or_restarts(self):
+        """Test that snapshots from other code are ignored and a startup build discards earlier files."""
+        import snapshots
+        self.seed(2)
+        app.config["SNAPSHOT_DIR"] = tempfile.mkdtemp(prefix="dscl-snapshots-")
+        try:
+            with app.app_context():
+                version = catalogue_version()
+                snapshots.SnapshotStore(app).build_all()
+                with unittest.mock.patch.object(snapshots, "code_fingerprint", lambda: "other-code"):
+                    other = snapshots.SnapshotStore(app)
+                    other.get("challenges", version)
+                self.assertEqual(other.builds, 1)
+
+                # A file left by an earlier run (e.g. before a database reset) at the current version
+                stale = snapshots.SnapshotStore(app)._paths("challenges", version)["identity"]
+                with open(stale, "wb") as f:
+                    f.write(b"[]")
+                snapshots.SnapshotStore(app).build_all()
+                body = snapshots.SnapshotStore(app).get("challenges", version).variants["identity"][:]
+                self.assertEqual(len(json.loads(body)), 2)
+                self.assertFalse(os.path.exists(os.path.join(app.config["SNAPSHOT_DIR"], "other-code")))
+        finally:
+            app.config["SNAPSHOT_DIR"] = None
+
+    def test_bootstrap_is_one_query_and_ready_reports_schema(self):
+        """Test that an up-to-date schema is checked with a single query and /ready follows the schema."""
+        statements = []
+        with app.app_context():
+            listener = lambda conn, cursor, statement, *args: statements.append(statement)
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                self.assertEqual(run_migrations(), [])
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+        self.assertEqual(len(statements), 1)
+
+        self.assertEqual(self.client.get('/health').status_code, 200)
+        response = self.client.get('/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["schema_version"], latest_version())
+        self.assertIn("within_budget", response.json)
+        with app.app_context():
+            with db.engine.begin() as conn:
+                conn.execute(text("DELETE FROM schema_version WHERE version = :v"), {"v": latest_version()})
+        self.assertEqual(self.client.get('/ready').status_code, 503)
+
+    def test_import_path_avoids_io_and_heavy_modules(self):
+        """Test that importing the WSGI app pulls in none of the modules kept off the startup path."""
+        from bench.importtime import check, measure, parse_importtime
+        sample = "import time: self [us] | cumulative | imported package\n" \
+                 "import time:       100 |        100 |   os\nimport time:       200 |        300 | app\n"
+        self.assertEqual(parse_importtime(sample), [("os", 100, 100, 1), ("app", 200, 300, 0)])
+        total_ms, forbidden, _ = check(measure("wsgi"), budget_ms=float("inf"))
+        self.assertEqual(forbidden, [])
+        self.assertGreater(total_ms, 0)
+
+    def test_dataset_link_check_against_stub_server(self):
+        """Test link statuses, retry on 503, GET fallback and conditional re-checks via a local server."""
+        from linkcheck import run_link_check
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubDatasetHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        StubDatasetHandler.requests, StubDatasetHandler.flaky_calls = [], 0
+        app.config.update(LINKCHECK_HOST_DELAY=0, LINKCHECK_BACKOFF=0.01)
+        try:
+            with app.app_context():
+                for name in ("ok", "gone", "flaky", "nohead"):
+                    db.session.add(make_challenge(title=name, dataset_url=f"{base}/{name}"))
+                db.session.commit()
+                self.assertEqual(run_link_check(), {"ok": 3, "broken": 1})
+                self.assertEqual(run_link_check(), {"ok": 3, "broken": 1})
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn(("HEAD", "/ok", '"v1"'), StubDatasetHandler.requests)
+        self.assertEqual(StubDatasetHandler.flaky_calls, 3)
+
+        self.login_admin()
+        statuses = {c["title"]: c["link_status"] for c in self.client.get('/api/admin/challenges').json}
+        self.assertEqual(statuses["ok"]["size"], 1234)
+        self.assertEqual(statuses["gone"]["http_status"], 404)
+        self.assertEqual(statuses["nohead"]["size"], 99)
+        self.assertEqual(statuses["flaky"]["status"], "ok")
+        links = self.client.get('/api/admin/links?status=broken').json["links"]
+        self.assertEqual([link["url"] for link in links], [f"{base}/gone"])
+
+    def test_link_check_runs_once_across_processes(self):
+        """Test that the job lease, not a per-process flag, decides whether a link check may start."""
+        from linkcheck import LEASE_NAME, acquire_lease, release_lease
+        self.login_admin()
+        with app.app_context():
+            # Another worker (or the cron job) is running a check
+            other = acquire_lease(LEASE_NAME, 60)
+            self.assertIsNotNone(other)
+            self.assertIsNone(acquire_lease(LEASE_NAME, 60))
+        self.assertEqual(self.client.post('/api/admin/links/check').status_code, 409)
+        self.assertTrue(self.client.get('/api/admin/links').json["running"])
+        with app.app_context():
+            release_lease(LEASE_NAME, other)
+
+        self.assertEqual(self.client.post('/api/admin/links/check').status_code, 202)
+        deadline = time.monotonic() + 10
+        while self.client.get('/api/admin/links').json["running"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(self.client.get('/api/admin/links').json["running"])
+        with app.app_context():
+            # A lease whose holder died is taken over once it expires
+            self.assertIsNotNone(acquire_lease(LEASE_NAME, -1))
+            self.assertIsNotNone(acquire_lease(LEASE_NAME, 60))
+
+    def test_change_feed_returns_only_newer_changes(self):
+        """Test ?since= paging, updates, tombstones and the pathways touched by a delete."""
+        self.login_admin()
+        for i in range(1, 4):
+            self.client.post('/api/admin/challenges', json={"title": f"C{i}", "difficulty": "Easy", "subcategory": "X"})
+        self.client.post('/api/admin/pathways', json={"name": "P", "challengeIds": [1, 2]})
+
+        full = self.client.get('/api/changes').json
+        self.assertEqual([c["title"] for c in full["challenges"]], ["C1", "C2", "C3"])
+        self.assertEqual(full["pathways"][0]["challengeIds"], [1, 2])
+        self.assertIsNotNone(full["challenges"][0]["updated_at"])
+        page = self.client.get('/api/changes?limit=2').json
+        self.assertTrue(page["more"])
+        self.assertEqual(len(self.client.get(f'/api/changes?since={page["seq"]}').json["challenges"]), 1)
+
+        self.client.put('/api/admin/challenges/3', json={"title": "C3 renamed"})
+        self.client.delete('/api/admin/challenges/2')
+        delta = self.client.get(f'/api/changes?since={full["seq"]}').json
+        self.assertEqual([c["title"] for c in delta["challenges"]], ["C3 renamed"])
+        self.assertEqual(delta["deleted"], {"challenges": [2], "pathways": []})
+        self.assertEqual(delta["pathways"][0]["challengeIds"], [1])
+        self.assertEqual(self.client.get(f'/api/changes?since={delta["seq"]}').json["challenges"], [])
+        self.assertEqual(self.client.get(f'/api/changes?since={delta["seq"] + 5}').status_code, 410)
+
+    def test_change_log_writes_are_serialized_on_postgresql(self):
+        """Test that recording changes on PostgreSQL locks the change log first, so seqs commit in order."""
+        from changes import record_changes
+        pg_bind = types.SimpleNamespace(dialect=types.SimpleNamespace(name="postgresql"))
+        with app.app_context(), \
+                unittest.mock.patch.object(db.session, "get_bind", return_value=pg_bind), \
+                unittest.mock.patch.object(db.session, "execute") as execute:
+            record_changes("challenge", [2, 1])
+        statements = [str(call.args[0]) for call in execute.call_args_list]
+        self.assertEqual(statements[0], "LOCK TABLE catalogue_changes IN EXCLUSIVE MODE")
+        self.assertTrue(statements[1].startswith("DELETE FROM catalogue_changes"))
+
+    def test_facet_counts_exclude_own_filter(self):
+        """Test /challenges/facets counts per facet, ignoring each facet's own filter, in one query per facet."""
+        with app.app_context():
+            db.session.add(make_challenge(title="A", difficulty="Easy", technology="pandas"))
+            db.session.add(make_challenge(title="B", difficulty="Hard", technology="pandas, sklearn"))
+            db.session.add(make_challenge(title="C", difficulty="Easy", technology="pytorch"))
+            db.session.commit()
+        facets = self.client.get('/api/challenges/facets').json
+        self.assertEqual(facets["total"], 3)
+        self.assertEqual(facets["technology"][0], {"value": "pandas", "count": 2})
+        self.assertEqual(facets["subcategory"], [{"value": "data cleaning", "count": 3}])
+
+        facets = self.client.get('/api/challenges/facets?technology=pandas&difficulty=Easy').json
+        self.assertEqual(facets["total"], 1)
+        self.assertEqual(facets["difficulty"], [{"value": "Easy", "count": 1}, {"value": "Hard", "count": 1}])
+        self.assertEqual(facets["technology"], [{"value": "pandas", "count": 1}, {"value": "pytorch", "count": 1}])
+        # The total plus one GROUP BY per facet (and possibly a catalogue version re-read)
+        self.assertLessEqual(self.count_queries(lambda: self.client.get('/api/challenges/facets?technology=sklearn')), 5)
+        self.assertEqual(self.client.get('/api/challenges/facets?match=some').status_code, 400)
+
+    def test_file_sqlite_connections_get_pragmas(self):
+        """Test that a file-backed SQLite app from create_app sets WAL, synchronous and foreign_keys on its connections."""
+        directory = tempfile.mkdtemp(prefix="dscl-db-")
+        with unittest.mock.patch.dict(os.environ, {"DATABASE_URL": f"sqlite:///{directory}/challenges.db"}):
+            probe = create_app()
+        with probe.app_context():
+            self.assertEqual(db.engine.pool.__class__.__name__, "QueuePool")
+            pragmas = {name: db.session.execute(text(f"PRAGMA {name}")).scalar()
+                       for name in ("journal_mode", "synchronous", "foreign_keys")}
+            db.session.remove()
+            db.engine.dispose()
+        # synchronous=NORMAL reads back as 1
+        self.assertEqual(pragmas, {"journal_mode": "wal", "synchronous": 1, "foreign_keys": 1})
+
+    def test_database_settings_from_environment(self):
+        """Test the pool settings for server databases and the portable insert-or-ignore."""
+        from dbconfig import engine_options, insert_ignore
+        from sqlalchemy.dialects import postgresql
+        os.environ["DB_POOL_RECYCLE"] = "600"
+        try:
+            options = engine_options("postgresql://u:p@db/dscl")
+        finally:
+            del os.environ["DB_POOL_RECYCLE"]
+        self.assertEqual((options["pool_pre_ping"], options["pool_recycle"], options["pool_size"]), (True, 600, 5))
+        self.assertEqual(engine_options("sqlite://"), {})
+
+        table = ChallengeTechnology.__table__
+        pg_bind = types.SimpleNamespace(dialect=postgresql.dialect())
+        pg = insert_ignore(table, pg_bind).compile(dialect=pg_bind.dialect)
+        self.assertIn("ON CONFLICT DO NOTHING", str(pg))
+        with app.app_context():
+            self.seed(1)
+            rows = [{"challenge_id": 1, "name": "pandas"}, {"challenge_id": 1, "name": "polars"}]
+            db.session.execute(insert_ignore(table, db.session.get_bind()), rows)
+            db.session.commit()
+            self.assertEqual(sorted(t.name for t in ChallengeTechnology.query), ["pandas", "polars", "sklearn"])
+
+        # Other databases are refused when the app starts, not on the first insert_ignore()
+        with unittest.mock.patch.dict(os.environ, {"DATABASE_URL": "mysql://u:p@db/dscl"}):
+            with self.assertRaisesRegex(ValueError, "SQLite or PostgreSQL"):
+                create_app()
+        with unittest.mock.patch.dict(os.environ, {"DATABASE_URL": "postgres://u:p@db/dscl"}):
+            from dbconfig import database_uri
+            self.assertEqual(database_uri(), "postgresql://u:p@db/dscl")
+
+    def test_completion_aggregates_and_reconcile(self):
+        """Test the counters kept by the completion handlers, the popular/stats endpoints and reconciliation."""
+        from models import ChallengeStats, CompletedChallenge
+        from stats import reconcile_stats
+        self.seed(3)
+        with app.app_context():
+            db.session.add(Pathway(name="Basics", challenge_ids=[2, 3]))
+            db.session.commit()
+        self.login_admin()
+        self.client.post('/api/completed-challenges/2')
+        self.client.post('/api/completed-challenges/2')
+        self.client.put('/api/completed-challenges', json={"add": [1, 3], "remove": []})
+        self.client.delete('/api/completed-challenges/1')
+
+        popular = self.client.get('/api/stats/popular').json
+        self.assertEqual([(c["id"], c["completions"]) for c in popular], [(2, 1), (3, 1)])
+        ranked = self.client.get('/api/challenges?sort=popular&fields=id').json
+        self.assertEqual([c["id"] for c in ranked], [2, 3, 1])
+        self.assertEqual(self.client.get('/api/challenges?sort=popular&after_id=1').status_code, 400)
+        stats = self.client.get('/api/admin/stats').json
+        self.assertEqual(stats["total_completions"], 2)
+        self.assertEqual(stats["days"][0]["completed"], 3)
+        self.assertEqual(stats["days"][0]["uncompleted"], 1)
+        self.assertEqual(stats["days"][0]["active_learners"], 1)
+        self.assertEqual(stats["pathways"], [{"id": 1, "name": "Basics", "completions": 2}])
+
+        with app.app_context():
+            # A completion written behind the handlers' back is picked up by reconciliation
+            db.session.add(CompletedChallenge(user_id=1, challenge_id=1))
+            db.session.commit()
+            self.assertEqual(reconcile_stats(), 1)
+            self.assertEqual(db.session.get(ChallengeStats, 1).completions, 1)
+            self.assertEqual(reconcile_stats(), 0)
+
+    def test_bulk_completion_counts_only_rows_it_changed(self):
+        """Test that rows a concurrent request inserted or deleted after the pre-read are not counted or reported."""
+        import routes.completion as completion
+        from models import ChallengeStats, CompletedChallenge
+        self.seed(3)
+        self.login_admin()
+        self.client.post('/api/completed-challenges/3')
+        real = completion.apply_completions
+
+        def racing(user_id, add, remove):
+            # Another request completes 1 and uncompletes 3 between the pre-read and the writes
+            db.session.add(CompletedChallenge(user_id=user_id, challenge_id=1))
+            CompletedChallenge.query.filter_by(user_id=user_id, challenge_id=3).delete()
+            db.session.flush()
+            return real(user_id, add, remove)
+        with unittest.mock.patch.object(completion, "apply_completions", side_effect=racing):
+            response = self.client.put('/api/completed-challenges', json={"add": [1, 2], "remove": [3]})
+        self.assertEqual(response.json, {"added": [2], "removed": []})
+        with app.app_context():
+            counts = {s.challenge_id: s.completions for s in ChallengeStats.query}
+        # 1 was counted by nobody here (the racing insert bypassed the handlers); 3 keeps its one completion
+        self.assertEqual(counts, {2: 1, 3: 1})
+
+    def test_rendered_html_is_sanitized_and_refreshed_on_update(self):
+        """Test ?render=html output, storage by content hash (shared across challenges) and refresh on update."""
+        import render
+        from models import RenderedContent
+        with app.app_context():
+            db.session.add(make_challenge(title="A", task="# Steps\n- load `df`\n- <script>x</script> **clean**",
+                                          sample_sol="https://colab.example.com/nb?a=1&b=2"))
+            db.session.add(make_challenge(title="B", task="# Steps\n- load `df`\n- <script>x</script> **clean**"))
+            db.session.commit()
+        html = self.client.get('/api/challenges/1?render=html').json["html"]
+        self.assertEqual(html["task"], "<h1>Steps</h1>\n<ul><li>load <code>df</code></li>"
+                                       "<li>&lt;script&gt;x&lt;/script&gt; <strong>clean</strong></li></ul>")
+        self.assertIn('href="https://colab.example.com/nb?a=1&amp;b=2"', html["sample_sol"])
+        self.assertNotIn("html", self.client.get('/api/challenges/1').json)
+        self.assertEqual(self.client.get('/api/challenges/1?render=pdf').status_code, 400)
+        solution = self.client.get('/api/challenges/2?render=html').json["html"]["sample_sol"]
+        self.assertIn('class="highlight"', solution)
+        with app.app_context():
+            # Reads never write; rows added behind the write paths' back are filled in by render_all()
+            self.assertEqual(RenderedContent.query.count(), 0)
+            with db.engine.begin() as conn:
+                render.render_all(conn)
+            # B's task is shared with A; its sample_sol (code) differs
+            self.assertEqual(RenderedContent.query.count(), 5)
+
+        self.login_admin()
+        self.client.put('/api/admin/challenges/1', json={"overview": "Now with *emphasis*"})
+        with app.app_context():
+            # The new overview is rendered by the update itself; the replaced one is B's too, so it stays
+            self.assertEqual(RenderedContent.query.count(), 6)
+        overview = self.client.get('/api/challenges/1?render=html').json["html"]["overview"]
+        self.assertEqual(overview, "<p>Now with <em>emphasis</em></p>")
+
+        # The task rendering is shared with B, so replacing or deleting A's task keeps it
+        with app.app_context():
+            shared = render.content_hash("task", db.session.get(Challenge, 2).task)
+        self.client.put('/api/admin/challenges/1', json={"task": "Something else"})
+        self.client.delete('/api/admin/challenges/1')
+        with app.app_context():
+            self.assertIsNotNone(db.session.get(RenderedContent, shared))
+            self.assertIsNone(db.session.get(RenderedContent, render.content_hash("task", "Something else")))
+
+    def test_write_paths_store_renderings_and_reads_do_not(self):
+        """Test that create, import and PATCH store renderings, and ?render=html only reads them."""
+        import render
+        from models import RenderedContent
+        self.login_admin()
+        self.client.post('/api/admin/challenges', json={
+            "title": "Made", "difficulty": "Easy", "subcategory": "X", "overview": "Made *here*"})
+        self.client.post('/api/admin/challenges/import', data="title,difficulty,subcategory,task\nImported,Easy,X,Imported task\n")
+        self.client.patch('/api/admin/challenges/1', json={"sample_sol": "print(1)"}, headers={"If-Match": '"v1"'})
+        with app.app_context():
+            keys = {row.content_hash for row in RenderedContent.query}
+        self.assertEqual(keys, {render.content_hash("overview", "Made *here*"),
+                                render.content_hash("task", "Imported task"),
+                                render.content_hash("sample_sol", "print(1)")})
+
+        self.client.post('/api/logout')
+        statements = []
+        with app.app_context():
+            listener = lambda conn, cursor, statement, *args: statements.append(statement)
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                html = self.client.get('/api/challenges/2?render=html').json["html"]
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+        self.assertEqual(html["task"], "<p>Imported task</p>")
+        self.assertTrue(all(s.lstrip().upper().startswith("SELECT") for s in statements), statements)
+
+    def test_patch_updates_changed_fields_with_if_match(self):
+        """Test single and batch PATCH: If-Match versions, 412 on conflict, derived tags and one transaction."""
+        self.seed(3)
+        self.login_admin()
+        versions = {c["id"]: c["version"] for c in self.client.get('/api/admin/challenges').json}
+        self.assertEqual(versions, {1: 1, 2: 1, 3: 1})
+        self.assertEqual(self.client.patch('/api/admin/challenges/1', json={"title": "X"}).status_code, 428)
+
+        response = self.client.patch('/api/admin/challenges/1', json={"technology": "polars"},
+                                     headers={"If-Match": '"v1"'})
+        self.assertEqual(response.json, {"id": 1, "version": 2, "technology": "polars"})
+        self.assertEqual(response.headers["ETag"], '"v2"')
+        self.assertEqual([c["id"] for c in self.client.get('/api/challenges?technology=polars').json], [1])
+        # A second admin still holding v1 no longer overwrites the first one's edit
+        stale = self.client.patch('/api/admin/challenges/1', json={"technology": "numpy"},
+                                  headers={"If-Match": '"v1"'})
+        self.assertEqual(stale.status_code, 412)
+        self.assertEqual(stale.headers["ETag"], '"v2"')
+        self.assertEqual(self.client.patch('/api/admin/challenges/1', json={"version": 5},
+                                           headers={"If-Match": '"v2"'}).status_code, 400)
+        self.assertEqual(self.client.patch('/api/admin/challenges/9', json={"title": "Y"},
+                                           headers={"If-Match": "*"}).status_code, 404)
+
+        conflict = self.client.patch('/api/admin/challenges', json=[
+            {"id": 2, "version": 1, "difficulty": "Hard"}, {"id": 1, "version": 1, "difficulty": "Hard"}])
+        self.assertEqual(conflict.status_code, 412)
+        self.assertEqual(conflict.json["conflicts"], [{"id": 1, "version": 2}])
+        self.assertEqual(self.client.get('/api/challenges/2').json["difficulty"], "Easy")
+        batch = self.client.patch('/api/admin/challenges', json=[
+            {"id": 2, "version": 1, "difficulty": "Hard"},
+            {"id": 3, "version": 1, "difficulty": "Hard", "overview": "Zebra crossing"}])
+        self.assertEqual(batch.json["challenges"][1], {"id": 3, "version": 2, "difficulty": "Hard",
+                                                       "overview": "Zebra crossing"})
+        self.assertEqual(len(self.client.get('/api/challenges?difficulty=Hard').json), 2)
+        self.assertEqual([r["id"] for r in self.client.get('/api/challenges/search?q=zebra').json], [3])
+
+        # PUT and the bulk import bump the version too
+        self.client.put('/api/admin/challenges/2', json={"title": "Renamed"})
+        self.client.post('/api/admin/challenges/import', data="title,difficulty,subcategory\nRenamed,Medium,Statistics\n")
+        versions = {c["id"]: c["version"] for c in self.client.get('/api/admin/challenges').json}
+        self.assertEqual(versions[2], 4)
+
+    def test_put_with_stale_if_match_is_rejected(self):
+        """Test the edit page's flow: load the admin view's ETag, PUT with If-Match, 412 once it is stale."""
+        self.seed(1)
+        self.login_admin()
+        loaded = self.client.get('/api/admin/challenges/1')
+        self.assertEqual(loaded.headers["ETag"], '"v1"')
+        self.assertEqual(loaded.json["version"], 1)
+
+        saved = self.client.put('/api/admin/challenges/1', json={**loaded.json, "title": "First"},
+                                headers={"If-Match": loaded.headers["ETag"]})
+        self.assertEqual(saved.status_code, 200)
+        self.assertEqual(saved.headers["ETag"], '"v2"')
+        # A second editor who loaded v1 gets a 412 instead of silently overwriting
+        stale = self.client.put('/api/admin/challenges/1', json={**loaded.json, "title": "Second"},
+                                headers={"If-Match": loaded.headers["ETag"]})
+        self.assertEqual(stale.status_code, 412)
+        self.assertEqual(stale.headers["ETag"], '"v2"')
+        current = self.client.get('/api/admin/challenges/1').json
+        self.assertEqual((current["title"], current["version"]), ("First", 2))
+        self.assertEqual(self.client.put('/api/admin/challenges/1', json={"title": "X"},
+                                         headers={"If-Match": '"2"'}).status_code, 400)
+
 if __name__ == "__main__":
     unittest.main()
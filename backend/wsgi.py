@@ -0,0 +1,14 @@
+# backend/wsgi.py
+
+"""
+WSGI entry point for production serving:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Schema setup is done once by the gunicorn master (see gunicorn.conf.py),
+not by each worker.
+"""
+
+from app import create_app
+
+app = create_app()
@@ -12,6 +12,8 @@ export default function EditChallengePage({ params }) {
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState(null);
+  // ETag of the version being edited, sent back in If-Match so a save never overwrites someone else's edit
+  const [etag, setEtag] = useState(null);
 
   // Form data
   const [formData, setFormData] = useState({
@@ -41,15 +43,15 @@ export default function EditChallengePage({ params }) {
   const fetchChallenge = useCallback(async () => {
     try {
       setIsLoading(true);
-      // This endpoint is still /api/challenges/${id} because we're using the public API to fetch challenge details
-      // If you have a separate admin endpoint with additional fields, use /api/admin/challenges/${id} instead
-      const res = await fetch(`/api/challenges/${id}`, {
+      // The admin endpoint also returns the challenge version as its ETag
+      const res = await fetch(`/api/admin/challenges/${id}`, {
         credentials: "include" // Include cookies for auth
       });
       if (!res.ok) {
         throw new Error(`Failed to fetch challenge: ${res.statusText}`);
       }
       const data = await res.json();
+      setEtag(res.headers.get("ETag") || `"v${data.version}"`);
       setFormData(data);
     } catch (err) {
       console.error("Error fetching challenge:", err);
@@ -84,12 +86,17 @@ export default function EditChallengePage({ params }) {
       const res = await fetch(`/api/admin/challenges/${id}`, {
         method: "PUT",
         headers: {
-          "Content-Type": "application/json"
+          "Content-Type": "application/json",
+          "If-Match": etag
         },
         credentials: "include", 
         body: JSON.stringify(formData)
       });
       
+      if (res.status === 412) {
+        throw new Error("This challenge was changed by someone else since you opened it. Reload the page to get the latest version, then reapply your edits.");
+      }
+
       // Handle response properly
       if (!res.ok) {
         // Try to parse error JSON but handle cases where it's not valid JSON
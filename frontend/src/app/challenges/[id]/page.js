@@ -16,9 +16,9 @@ export default async function ChallengeDetailPage({ params }) {
   const { id } = params;
   const challengeId = parseInt(id);
 
-  // Fetch challenge data from Flask API
+  // Fetch challenge data from Flask API, with the text sections pre-rendered to HTML
   const baseUrl = "http://backend:5000";
-  const res = await fetch(`${baseUrl}/api/challenges/${id}`, {
+  const res = await fetch(`${baseUrl}/api/challenges/${id}?render=html`, {
     cache: "no-store",
   });
 
@@ -42,20 +42,15 @@ export default async function ChallengeDetailPage({ params }) {
   // Parse challenge data from response
   const challenge = await res.json();
 
-  // Fetch all pathways from backend
-  const pathwaysRes = await fetch(`${baseUrl}/api/pathways`, { cache: "no-store" });
+  // Fetch only the pathways containing this challenge, with their challenges embedded
+  const pathwaysRes = await fetch(`${baseUrl}/api/pathways?contains=${challengeId}&embed=challenges`, { cache: "no-store" });
   let pathway = null;
   let pathwayChallenges = [];
   if (pathwaysRes.ok) {
     const pathways = await pathwaysRes.json();
-    pathway = pathways.find(p => p.challengeIds.includes(challengeId));
+    pathway = pathways[0] || null;
     if (pathway) {
-      // Fetch all challenges in the pathway for their titles
-      const idsParam = pathway.challengeIds.join(",");
-      const challengesRes = await fetch(`${baseUrl}/api/challenges?ids=${idsParam}`, { cache: "no-store" });
-      if (challengesRes.ok) {
-        pathwayChallenges = await challengesRes.json();
-      }
+      pathwayChallenges = pathway.challenges;
     }
   }
 
@@ -12,6 +12,8 @@ import { useLogin } from "../components/LoginContext";
 import LoginForm from "../components/LoginForm";
 
 // List of subcategories for filtering challenges
+// Keys are sent as ?subcategory= and must be whole tag values (comma-separated
+// for several); the backend matches tags exactly, not by substring
 const SUBCATEGORIES = [
   { key: "All", label: "All Topics" },
   { key: "Imputation", label: "Imputation" },
@@ -21,12 +23,12 @@ const SUBCATEGORIES = [
   { key: "Statistics", label: "Statistics" },
   { key: "Time Series", label: "Time Series" },
   { key: "Feature Importance", label: "Feature Importance" },
-  { key: "Classification", label: "Classification" },
-  { key: "Metrics", label: "Metrics" },
+  { key: "Classification,Classification Metrics", label: "Classification" },
+  { key: "Classification Metrics", label: "Metrics" },
   { key: "NLP", label: "NLP" },
   { key: "Sentiment Analysis", label: "Sentiment Analysis" },
   { key: "Clustering", label: "Clustering" },
-  { key: "Neural Nets", label: "Neural Nets" },
+  { key: "Deep Learning with Neural Nets", label: "Neural Nets" },
 ];
 
 /**
@@ -84,7 +86,8 @@ export default function HomePage() {
     setError(null);
 
     // Build query params for API
-    const params = new URLSearchParams();
+    // Cards only need the summary columns, not the full challenge content
+    const params = new URLSearchParams({ view: "summary" });
     if (difficulty !== "All") {
       params.append("difficulty", difficulty);
     }
@@ -95,9 +98,7 @@ export default function HomePage() {
       params.append("technology", technology);
     }
 
-    const url = params.toString()
-      ? `/api/challenges?${params.toString()}`
-      : `/api/challenges`;
+    const url = `/api/challenges?${params.toString()}`;
 
     // Fetch challenge data from backend
     fetch(url)
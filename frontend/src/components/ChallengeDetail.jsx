@@ -10,6 +10,9 @@ function abbreviateTitle(title) {
 }
 
 export default function ChallengeDetail({ challenge, pathway, pathwayChallenges }) {
+  // Sanitized HTML rendered by the backend (?render=html); raw text is the fallback
+  const html = challenge.html || {};
+
   const handleImageError = (e) => {
     e.target.style.display = 'none'; // Hide the image on error
   };
@@ -120,7 +123,11 @@ export default function ChallengeDetail({ challenge, pathway, pathwayChallenges
       {challenge.overview && (
         <section className="mb-6">
           <h2 className="text-2xl font-semibold mb-2 text-black">Overview</h2>
-          <p className="text-black whitespace-pre-line">{challenge.overview}</p>
+          {html.overview ? (
+            <div className="text-black rendered-content" dangerouslySetInnerHTML={{ __html: html.overview }} />
+          ) : (
+            <p className="text-black whitespace-pre-line">{challenge.overview}</p>
+          )}
         </section>
       )}
 
@@ -136,9 +143,13 @@ export default function ChallengeDetail({ challenge, pathway, pathwayChallenges
       {challenge.task && (
         <section className="mb-6">
           <h2 className="text-2xl font-semibold mb-2 text-black">Steps</h2>
-          <pre className="bg-gray-300 p-4 rounded-md overflow-x-auto whitespace-pre-wrap text-black">
-            {challenge.task}
-          </pre>
+          {html.task ? (
+            <div className="bg-gray-300 p-4 rounded-md overflow-x-auto text-black rendered-content" dangerouslySetInnerHTML={{ __html: html.task }} />
+          ) : (
+            <pre className="bg-gray-300 p-4 rounded-md overflow-x-auto whitespace-pre-wrap text-black">
+              {challenge.task}
+            </pre>
+          )}
         </section>
       )}
 
@@ -146,28 +157,41 @@ export default function ChallengeDetail({ challenge, pathway, pathwayChallenges
       {challenge.outcomes && (
         <section className="mb-6">
           <h2 className="text-2xl font-semibold mb-2 text-black">Required Outcomes</h2>
-          <pre className="bg-gray-300 p-4 rounded-md overflow-x-auto whitespace-pre-wrap text-black">
-            {challenge.outcomes}
-          </pre>
+          {html.outcomes ? (
+            <div className="bg-gray-300 p-4 rounded-md overflow-x-auto text-black rendered-content" dangerouslySetInnerHTML={{ __html: html.outcomes }} />
+          ) : (
+            <pre className="bg-gray-300 p-4 rounded-md overflow-x-auto whitespace-pre-wrap text-black">
+              {challenge.outcomes}
+            </pre>
+          )}
         </section>
       )}
 
-      {/* Sample Solution Link */}
+      {/* Sample Solution: a link, or highlighted code when the backend rendered it */}
       {challenge.sample_sol && (
         <section className="mb-8">
-          <p className="text-black">
-            <strong>
-              Only click this once you are done and wanting to check your answers:
-            </strong>{" "}
-            <a
-              href={challenge.sample_sol}
-              target="_blank"
-              rel="noopener noreferrer"
-              className="text-blue-700 hover:underline break-all"
-            >
-              {challenge.sample_sol}
-            </a>
-          </p>
+          {html.sample_sol ? (
+            <>
+              <p className="text-black mb-2">
+                <strong>Only look at this once you are done and wanting to check your answers:</strong>
+              </p>
+              <div className="text-black break-all rendered-content" dangerouslySetInnerHTML={{ __html: html.sample_sol }} />
+            </>
+          ) : (
+            <p className="text-black">
+              <strong>
+                Only click this once you are done and wanting to check your answers:
+              </strong>{" "}
+              <a
+                href={challenge.sample_sol}
+                target="_blank"
+                rel="noopener noreferrer"
+                className="text-blue-700 hover:underline break-all"
+              >
+                {challenge.sample_sol}
+              </a>
+            </p>
+          )}
         </section>
       )}
     </div>
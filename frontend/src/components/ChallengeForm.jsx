@@ -27,15 +27,18 @@ export default function ChallengeForm({ challengeId = null }) {
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [error, setError] = useState(null);
   const [success, setSuccess] = useState(null);
+  // ETag of the loaded version, sent in If-Match so saves don't overwrite concurrent edits
+  const [etag, setEtag] = useState(null);
   const [loadingData, setLoadingData] = useState(challengeId !== null);
 
   // Fetch challenge data if editing an existing challenge
   useEffect(() => {
     if (challengeId && isAdmin) {
       setLoadingData(true);
-      fetch(`/api/challenges/${challengeId}`)
+      fetch(`/api/admin/challenges/${challengeId}`, { credentials: 'include' })
         .then(response => {
           if (!response.ok) throw new Error('Failed to fetch challenge');
+          setEtag(response.headers.get('ETag'));
           return response.json();
         })
         .then(data => {
@@ -71,11 +74,17 @@ export default function ChallengeForm({ challengeId = null }) {
       
       const response = await fetch(url, {
         method,
-        headers: { 'Content-Type': 'application/json' },
+        headers: challengeId && etag
+          ? { 'Content-Type': 'application/json', 'If-Match': etag }
+          : { 'Content-Type': 'application/json' },
         credentials: 'include',
         body: JSON.stringify(formData)
       });
 
+      if (response.status === 412) {
+        throw new Error('This challenge was changed by someone else since you opened it. Reload to get the latest version.');
+      }
+
       if (!response.ok) {
         const errorData = await response.json();
         throw new Error(errorData.error || 'Failed to save challenge');